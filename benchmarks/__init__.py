@@ -0,0 +1,5 @@
+"""
+Benchmarks of the catalog
+
+Run with `python -m benchmarks.run`, see `--help` for options.
+"""
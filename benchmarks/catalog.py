@@ -0,0 +1,124 @@
+"""
+catalog.py
+
+Generator of synthetic catalogs. The catalogs have the same layout as the one
+shipped with concertista: `composers.yml` and `tracks/<composer>/*.yml`. The
+same seed and size always produce the same catalog.
+"""
+
+import os
+import json
+import random
+
+# average number of pieces per composer
+PIECES_PER_COMPOSER = 40
+# file written into the catalog after it is complete
+STAMP_FILE = '.benchmark'
+
+_BASE62 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+_SYLLABLES = [
+    "an", "to", "nín", "dvo", "řák", "lud", "wig", "bee", "tho", "ven",
+    "jo", "hann", "se", "bas", "ti", "bach", "ser", "gei", "rach", "ma",
+    "ni", "noff", "py", "otr", "tchai", "kov", "sky", "ed", "vard", "grieg",
+    "bé", "la", "bar", "tók", "cla", "ude", "de", "bus", "sy", "mo", "zart"
+]
+_FORMS = [
+    "Symphony", "Piano Sonata", "Violin Concerto", "Piano Concerto",
+    "String Quartet", "Piano Trio", "Prelude and Fugue", "Nocturne",
+    "Étude", "Mass", "Requiem", "Serenade", "Suite", "Variations",
+    "Overture", "Cello Sonata", "Rhapsody", "Ballade"
+]
+_KEYS = ["C", "D", "E", "F", "G", "A", "B", "E Flat", "B Flat", "F Sharp"]
+
+
+def spotify_id(rng):
+    """
+    Random ID looking like a Spotify ID
+    """
+    return "".join(rng.choice(_BASE62) for _ in range(22))
+
+
+def composer_name(rng):
+    """
+    Random composer name
+    """
+    words = []
+    for _ in range(rng.randint(2, 3)):
+        word = "".join(
+            rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 3)))
+        words.append(word.capitalize())
+    return " ".join(words)
+
+
+def piece_name(rng, opus):
+    """
+    Random piece name
+    """
+    return "{} No. {} in {} {}, Op. {}".format(
+        rng.choice(_FORMS), rng.randint(1, 12), rng.choice(_KEYS),
+        rng.choice(["Major", "Minor"]), opus)
+
+
+def _quote(text):
+    # JSON strings are valid double-quoted YAML scalars
+    return json.dumps(text, ensure_ascii=False)
+
+
+def generate(path, num_pieces, seed=0):
+    """
+    Write a catalog with `num_pieces` pieces into `path`. Returns the number
+    of composers.
+    """
+    rng = random.Random(seed)
+    num_composers = max(1, num_pieces // PIECES_PER_COMPOSER)
+    composers = [(spotify_id(rng), composer_name(rng))
+                 for _ in range(num_composers)]
+
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, 'composers.yml'), 'w') as f:
+        for id, name in composers:
+            f.write("- id: {}\n  name: {}\n".format(id, _quote(name)))
+
+    # a few composers have most of the pieces, like in the real catalog
+    weights = [1.0 / (i + 1) for i in range(num_composers)]
+    counts = [0] * num_composers
+    for i in rng.choices(range(num_composers), weights, k=num_pieces):
+        counts[i] += 1
+
+    tracks_dir = os.path.join(path, 'tracks')
+    for i, (composer_id, name) in enumerate(composers):
+        if counts[i] == 0:
+            continue
+        composer_dir = os.path.join(tracks_dir, "c{:06d}".format(i))
+        os.makedirs(composer_dir, exist_ok=True)
+        for opus in range(1, counts[i] + 1):
+            tracks = "".join(
+                "- {}\n".format(spotify_id(rng))
+                for _ in range(rng.randint(1, 8)))
+            text = (
+                "album_id: {}\n"
+                "composer_id: {}\n"
+                "id: {:032x}\n"
+                "name: {}\n"
+                "tracks:\n{}").format(
+                    spotify_id(rng), composer_id, rng.getrandbits(128),
+                    _quote(piece_name(rng, opus)), tracks)
+            fn = os.path.join(composer_dir, "op.{}.yml".format(opus))
+            with open(fn, 'w') as f:
+                f.write(text)
+
+    with open(os.path.join(path, STAMP_FILE), 'w') as f:
+        json.dump({'pieces': num_pieces, 'seed': seed}, f)
+    return num_composers
+
+
+def is_generated(path, num_pieces, seed=0):
+    """
+    Check if `path` has a complete catalog generated with these parameters
+    """
+    try:
+        with open(os.path.join(path, STAMP_FILE)) as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return stamp == {'pieces': num_pieces, 'seed': seed}
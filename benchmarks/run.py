@@ -0,0 +1,224 @@
+"""
+run.py
+
+Time the phases of loading and using the catalog on synthetic catalogs of
+different sizes and write the results as JSON. Example:
+
+    python -m benchmarks.run --pieces 1000 10000 -o bench.json
+"""
+
+import os
+import sys
+import gc
+import time
+import json
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import tracemalloc
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5 import QtCore, QtWidgets  # noqa: E402
+from concertista import consts  # noqa: E402
+from concertista import station  # noqa: E402
+from concertista import weights  # noqa: E402
+from concertista.assets import Assets  # noqa: E402
+from concertista.DB import DB  # noqa: E402
+from concertista.PreferencesWindow import PreferencesWindow  # noqa: E402
+from benchmarks import catalog  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+STATION_HOURS = 8
+SEARCH_QUERIES = ["symphony", "dvorak", "sonata no. 3", "zart", "tchaikovksy"]
+
+
+def max_rss_kb():
+    """
+    Peak resident set size of this process so far
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if platform.system() == 'Darwin':
+        # bytes on macOS, kilobytes on Linux
+        rss //= 1024
+    return rss
+
+
+class Phases:
+    """
+    Collect wall time, CPU time and memory of benchmark phases
+    """
+
+    def __init__(self, trace_memory):
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    def run(self, name, func, *args):
+        """
+        Run `func(*args)` as phase `name` and return its result
+        """
+        gc.collect()
+        if self.trace_memory:
+            tracemalloc.start()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        result = func(*args)
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+        peak_kb = None
+        if self.trace_memory:
+            peak_kb = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+
+        self.results[name] = {
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'peak_kb': peak_kb,
+            'max_rss_kb': max_rss_kb()
+        }
+        print("  {:<20} {:10.3f} s".format(name, wall), flush=True)
+        return result
+
+
+def load(cache_dir, lazy=False):
+    db = DB(cache_dir=cache_dir, lazy=lazy)
+    db.load()
+    return db
+
+
+def build_completer_model(db):
+    db._build_completer_model()
+    model = db.get_completer_model()
+    # rows are set up on first access
+    model.index(0).data()
+    return model
+
+
+def search(db, queries):
+    for q in queries:
+        db.search(q)
+        db.fuzzy_search(q)
+
+
+def run_queries(index, composer_ids):
+    """
+    Union of composers, limited to short pieces, minus one composer
+    """
+    bits = 0
+    for id in composer_ids:
+        bits |= index.composer(id)
+    bits &= index.tracks(1, 4)
+    bits &= ~index.composer(composer_ids[0])
+    return index.ids(bits)
+
+
+def bench_catalog(path, args):
+    """
+    Run all phases on one catalog
+    """
+    Assets().music_dir = path
+    cache_dir = tempfile.mkdtemp(prefix='concertista-bench-cache-')
+    phases = Phases(args.trace_memory)
+    try:
+        phases.run('load_cold', load, cache_dir)
+        db = phases.run('load_snapshot', load, cache_dir)
+        phases.run('load_lazy', load, None, True)
+
+        model = phases.run('completer_model', build_completer_model, db)
+        phases.run('completer_lookup', model.lookup, 'Symphony No. 1')
+
+        phases.run('search_first', search, db, SEARCH_QUERIES[:1])
+        phases.run('search_queries', search, db, SEARCH_QUERIES)
+
+        prefs = PreferencesWindow(db)
+        phases.run('library_model', prefs.buildLibraryModel)
+        prefs.deleteLater()
+
+        piece_ids = db.get_piece_ids()
+        phases.run(
+            'randomize_pieces', station.randomize_pieces, db, piece_ids,
+            station.MAX_TRACKS, random, STATION_HOURS * 3600)
+        table = phases.run('weight_table', db.get_weights, weights.TRACKS)
+        phases.run(
+            'randomize_weighted', station.randomize_pieces, db, None,
+            station.MAX_TRACKS, random, STATION_HOURS * 3600, None, table)
+
+        index = phases.run('query_index', db.get_query_index)
+        composer_ids = list(db.get_composers())[:10]
+        phases.run('query_first', run_queries, index, composer_ids)
+        phases.run('query', run_queries, index, composer_ids)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    return {
+        'pieces': len(db.get_pieces()),
+        'composers': len(db.get_composers()),
+        'phases': phases.results
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.run',
+        description='Benchmark the catalog on synthetic catalogs')
+    parser.add_argument(
+        '--pieces', type=int, nargs='+', default=DEFAULT_SIZES,
+        help='catalog sizes, default: %(default)s')
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help='seed of the catalog generator, default: %(default)s')
+    parser.add_argument(
+        '--work-dir',
+        default=os.path.join(tempfile.gettempdir(), 'concertista-bench'),
+        help='where the catalogs are generated, they are reused by '
+             'later runs, default: %(default)s')
+    parser.add_argument(
+        '--trace-memory', action='store_true',
+        help='record peak memory of each phase with tracemalloc, this '
+             'makes the phases slower')
+    parser.add_argument(
+        '-o', '--output', help='JSON file with results, default: stdout')
+    args = parser.parse_args(argv)
+
+    QtCore.QCoreApplication.setOrganizationName("concertista-bench")
+    QtCore.QCoreApplication.setApplicationName("concertista-bench")
+    qapp = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    results = []
+    for num_pieces in args.pieces:
+        path = os.path.join(args.work_dir, "catalog-{}-{}".format(
+            num_pieces, args.seed))
+        if not catalog.is_generated(path, num_pieces, args.seed):
+            print("Generating catalog with {} pieces".format(num_pieces),
+                  flush=True)
+            shutil.rmtree(path, ignore_errors=True)
+            catalog.generate(path, num_pieces, args.seed)
+        print("Catalog with {} pieces".format(num_pieces), flush=True)
+        results.append(bench_catalog(path, args))
+
+    report = {
+        'version': consts.VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seed': args.seed,
+        'trace_memory': args.trace_memory,
+        'results': results
+    }
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+
+    del qapp
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
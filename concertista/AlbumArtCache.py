@@ -0,0 +1,156 @@
+"""
+AlbumArtCache.py
+"""
+
+import os
+import hashlib
+from collections import OrderedDict
+from PyQt5 import QtCore, QtGui, QtNetwork
+
+# directory with cover thumbnails, inside the cache directory
+DIR_NAME = 'covers'
+
+
+def cover_url(images, height):
+    """
+    URL of the smallest image from `images` (as in Spotify album objects)
+    that is at least `height` pixels high, or of the largest one if none is
+    """
+    def img_height(img):
+        return img.get('height') or 0
+
+    fitting = [img for img in images if img_height(img) >= height]
+    if len(fitting) > 0:
+        return min(fitting, key=img_height)['url']
+    elif len(images) > 0:
+        return max(images, key=img_height)['url']
+    return None
+
+
+class AlbumArtCache(QtCore.QObject):
+    """
+    Album covers scaled to the width we show them at. Covers are kept as
+    ready pixmaps in memory and as thumbnails on disk, so a cover that was
+    shown before costs no download and no decoding of the full image. Both
+    levels drop the least recently used covers when they are full.
+    """
+
+    # cover for the URL is ready
+    coverReady = QtCore.pyqtSignal(str, QtGui.QPixmap)
+
+    # number of pixmaps kept in memory
+    MEMORY_ITEMS = 32
+    # size of thumbnails kept on disk in bytes
+    DISK_BYTES = 8 * 1024 * 1024
+
+    def __init__(self, cache_dir, width, parent=None):
+        super().__init__(parent)
+        # `None` keeps covers only in memory
+        self._dir = None
+        if cache_dir is not None:
+            self._dir = os.path.join(cache_dir, DIR_NAME)
+        self._width = width
+        self._pixmaps = OrderedDict()
+        # URLs being downloaded
+        self._pending = set()
+        self._nam = QtNetwork.QNetworkAccessManager(self)
+        self._nam.finished.connect(self.onReply)
+
+    def file_name(self, url):
+        """
+        Name of the thumbnail file for an image URL
+        """
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self._dir, digest + '.png')
+
+    def cover(self, url):
+        """
+        Cover from the cache, `None` if it has to be downloaded
+        """
+        pixmap = self._pixmaps.get(url)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(url)
+            return pixmap
+        if self._dir is None:
+            return None
+        fn = self.file_name(url)
+        pixmap = QtGui.QPixmap(fn)
+        if pixmap.isNull():
+            return None
+        try:
+            # recently used thumbnails are evicted last
+            os.utime(fn)
+        except OSError:
+            pass
+        self._remember(url, pixmap)
+        return pixmap
+
+    def fetch(self, url):
+        """
+        Get a cover. `coverReady` is emitted right away if it is cached,
+        otherwise once it is downloaded.
+        """
+        pixmap = self.cover(url)
+        if pixmap is not None:
+            self.coverReady.emit(url, pixmap)
+        elif url not in self._pending:
+            self._pending.add(url)
+            self._nam.get(QtNetwork.QNetworkRequest(QtCore.QUrl(url)))
+
+    def onReply(self, reply):
+        """
+        Called when a cover was downloaded
+        """
+        url = reply.request().url().toString()
+        self._pending.discard(url)
+        reply.deleteLater()
+        if reply.error() != QtNetwork.QNetworkReply.NoError:
+            print("Error downloading cover:", url)
+            return
+        img = QtGui.QImage()
+        if not img.loadFromData(reply.readAll()):
+            return
+        pixmap = QtGui.QPixmap.fromImage(img.scaledToWidth(
+            self._width, QtCore.Qt.SmoothTransformation))
+        self._remember(url, pixmap)
+        self._save(url, pixmap)
+        self.coverReady.emit(url, pixmap)
+
+    def _remember(self, url, pixmap):
+        self._pixmaps[url] = pixmap
+        self._pixmaps.move_to_end(url)
+        while len(self._pixmaps) > self.MEMORY_ITEMS:
+            self._pixmaps.popitem(last=False)
+
+    def _save(self, url, pixmap):
+        if self._dir is None:
+            return
+        try:
+            os.makedirs(self._dir, exist_ok=True)
+        except OSError:
+            return
+        if not pixmap.save(self.file_name(url), 'PNG'):
+            print("Error writing cover:", self.file_name(url))
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used thumbnails until they fit into
+        `DISK_BYTES`
+        """
+        try:
+            entries = [e for e in os.scandir(self._dir) if e.is_file()]
+        except OSError:
+            return
+        stats = [(e.stat().st_mtime, e.stat().st_size, e.path)
+                 for e in entries]
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in sorted(stats):
+            if total <= self.DISK_BYTES:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
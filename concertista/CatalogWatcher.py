@@ -0,0 +1,118 @@
+"""
+CatalogWatcher.py
+"""
+
+import os
+from PyQt5 import QtCore
+
+
+class CatalogWatcher(QtCore.QObject):
+    """
+    Watch the tracks directory and re-read only the piece files that were
+    added, changed or deleted
+    """
+
+    # lists of added, changed and removed piece IDs
+    catalogChanged = QtCore.pyqtSignal(list, list, list)
+
+    # editors usually produce several events when saving a file, so we wait
+    # a little for them to settle before we update the catalog
+    UPDATE_DELAY_MS = 100
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self._db = db
+        # watched directory -> {name of piece file: mtime}
+        self._dirs = {}
+        self._pending_dirs = set()
+
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self.onDirectoryChanged)
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.UPDATE_DELAY_MS)
+        self._timer.timeout.connect(self.update)
+
+    def start(self):
+        """
+        Start watching the tracks directory
+        """
+        self.watchDirectory(self._db.get_tracks_dir())
+
+    def stop(self):
+        """
+        Stop watching
+        """
+        self._timer.stop()
+        paths = self._watcher.directories()
+        if len(paths) > 0:
+            self._watcher.removePaths(paths)
+        self._dirs = {}
+        self._pending_dirs = set()
+
+    def watchDirectory(self, path):
+        """
+        Start watching a directory and everything below it. Returns the list
+        of piece files that were found.
+        """
+        paths = []
+        file_names = []
+        for root, dirs, files in os.walk(path):
+            self._dirs[root] = self._scanFiles(root)
+            paths.append(root)
+            for name in self._dirs[root]:
+                file_names.append(os.path.join(root, name))
+        if len(paths) > 0:
+            self._watcher.addPaths(paths)
+        return file_names
+
+    def _scanFiles(self, path):
+        """
+        Return the modification times of the piece files in a directory
+        """
+        mtimes = {}
+        for entry in os.scandir(path):
+            if entry.name.endswith('.yml') and entry.is_file():
+                mtimes[entry.name] = entry.stat().st_mtime_ns
+        return mtimes
+
+    def onDirectoryChanged(self, path):
+        """
+        Called when a file was added, removed or replaced in a directory.
+        Editors save by writing a new file and renaming it over the old one,
+        so this covers modified files as well.
+        """
+        self._pending_dirs.add(path)
+        self._timer.start()
+
+    def update(self):
+        """
+        Re-read the files affected by the pending changes
+        """
+        file_names = set()
+        for path in self._pending_dirs:
+            if not os.path.isdir(path):
+                prefix = path + os.sep
+                for d in list(self._dirs.keys()):
+                    if d == path or d.startswith(prefix):
+                        for name in self._dirs.pop(d):
+                            file_names.add(os.path.join(d, name))
+                continue
+
+            for entry in os.scandir(path):
+                if entry.is_dir() and entry.path not in self._dirs:
+                    file_names.update(self.watchDirectory(entry.path))
+
+            mtimes = self._scanFiles(path)
+            old_mtimes = self._dirs.get(path, {})
+            for name in mtimes.keys() | old_mtimes.keys():
+                if mtimes.get(name) != old_mtimes.get(name):
+                    file_names.add(os.path.join(path, name))
+            self._dirs[path] = mtimes
+
+        self._pending_dirs = set()
+
+        added, changed, removed = self._db.update_files(sorted(file_names))
+        if len(added) > 0 or len(changed) > 0 or len(removed) > 0:
+            self.catalogChanged.emit(added, changed, removed)
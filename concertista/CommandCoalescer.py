@@ -0,0 +1,107 @@
+"""
+CommandCoalescer.py
+"""
+
+import functools
+from PyQt5 import QtCore
+
+
+class CommandCoalescer(QtCore.QObject):
+    """
+    Sends a Spotify command for a continuous control, like the volume
+    slider. Only the latest value is sent: there is at most one request in
+    flight per key (e.g. device ID), values that arrive in the meantime
+    replace each other, and at most one request is sent per interval.
+    """
+
+    # error of a request that failed
+    failed = QtCore.pyqtSignal(object)
+
+    # minimal time between requests in milliseconds
+    INTERVAL_MS = 150
+
+    def __init__(self, spotify_worker, method, parent=None):
+        super().__init__(parent)
+        self._spotify_worker = spotify_worker
+        self._method = method
+        # key -> request that was sent and did not finish yet
+        self._in_flight = {}
+        # key -> (args, kwargs) of the latest value that was not sent
+        self._pending = {}
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.INTERVAL_MS)
+        self._timer.timeout.connect(self.onTimeout)
+
+    def send(self, key, *args, **kwargs):
+        """
+        Call the method with these arguments, replacing any value for `key`
+        that was not sent yet
+        """
+        self._pending[key] = (args, kwargs)
+        self._kick()
+
+    def flush(self):
+        """
+        Send the pending values now, without waiting for the interval to
+        pass. Values of keys with a request in flight are sent when it
+        finishes.
+        """
+        self._timer.stop()
+        self._sendPending()
+
+    def isIdle(self):
+        """
+        Check if there is nothing pending or in flight
+        """
+        return len(self._pending) == 0 and len(self._in_flight) == 0
+
+    def cancel(self):
+        """
+        Drop pending values and cancel requests in flight
+        """
+        self._timer.stop()
+        self._pending.clear()
+        for request in self._in_flight.values():
+            request.cancel()
+        self._in_flight.clear()
+
+    def _kick(self):
+        if self._timer.isActive():
+            return
+        if self._sendPending():
+            self._timer.start()
+
+    def _sendPending(self):
+        sent = False
+        for key in list(self._pending):
+            if key in self._in_flight:
+                continue
+            args, kwargs = self._pending.pop(key)
+            request = self._spotify_worker.call(self._method, *args, **kwargs)
+            request.finished.connect(functools.partial(self.onFinished, key))
+            request.failed.connect(functools.partial(self.onFailed, key))
+            self._in_flight[key] = request
+            sent = True
+        return sent
+
+    def onTimeout(self):
+        """
+        Called when the interval between requests passed
+        """
+        self._kick()
+
+    def onFinished(self, key, result):
+        """
+        Called when a request finished
+        """
+        self._in_flight.pop(key, None)
+        self._kick()
+
+    def onFailed(self, key, error):
+        """
+        Called when a request failed
+        """
+        self._in_flight.pop(key, None)
+        self.failed.emit(error)
+        self._kick()
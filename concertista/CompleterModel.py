@@ -0,0 +1,185 @@
+"""
+CompleterModel.py
+"""
+
+from PyQt5 import QtCore
+from concertista.assets import Assets
+
+
+class CompleterModel(QtCore.QAbstractListModel):
+    """
+    List of composers followed by pieces for the search completer. Nothing is
+    stored per row, the data is computed from the database when requested.
+    """
+
+    # role with the {"type", "id"} dictionary identifying the item
+    ItemRole = QtCore.Qt.UserRole + 1
+
+    def __init__(self, composers, pieces, parent=None):
+        """
+        @param composers Mapping composer id -> composer
+        @param pieces Mapping piece id -> piece
+        """
+        super().__init__(parent)
+        self._composers = composers
+        self._pieces = pieces
+        self._num_pieces = len(pieces)
+        # ordered IDs of composers and pieces, built when a row is accessed
+        self._composer_ids = None
+        self._piece_ids = None
+        # piece id -> index into `_piece_ids`
+        self._piece_rows = None
+        # display text -> (type, id) or a list of them if the text is not
+        # unique, built on first lookup
+        self._text_index = None
+        self._size_hint = QtCore.QSize(20, 20)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._composers) + self._num_pieces
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        if role == QtCore.Qt.SizeHintRole:
+            return self._size_hint
+
+        type, id = self.item(index.row())
+        if role == QtCore.Qt.DisplayRole or role == QtCore.Qt.EditRole:
+            return self.text(type, id)
+        elif role == QtCore.Qt.DecorationRole:
+            if type == "composer":
+                return Assets().author_icon
+            else:
+                return Assets().piece_icon
+        elif role == self.ItemRole:
+            return {"type": type, "id": id}
+        return None
+
+    def item(self, row):
+        """
+        Get (type, id) of the item at `row`
+        """
+        self._buildIds()
+        if row < len(self._composer_ids):
+            return "composer", self._composer_ids[row]
+        else:
+            return "piece", self._piece_ids[row - len(self._composer_ids)]
+
+    def text(self, type, id):
+        """
+        Text shown for an item
+        """
+        if type == "composer":
+            return "{}".format(self._composers[id]['name'])
+        else:
+            return self.pieceText(self._pieces[id])
+
+    def lookup(self, text):
+        """
+        Find the item whose text is exactly `text`. Returns {"type", "id"} or
+        `None` if there is no such item or the text is not unique.
+        """
+        self.buildTextIndex()
+
+        entry = self._text_index.get(text)
+        if entry is None:
+            return None
+        if isinstance(entry, tuple):
+            entry = [entry]
+        # entries of removed or renamed items are not purged from the index,
+        # so we validate them here
+        found = [key for key in entry if self._isItem(key, text)]
+        if len(found) == 1:
+            return {"type": found[0][0], "id": found[0][1]}
+        return None
+
+    def _isItem(self, key, text):
+        type, id = key
+        items = self._composers if type == "composer" else self._pieces
+        return id in items and self.text(type, id) == text
+
+    def buildTextIndex(self):
+        """
+        Build the index used by `lookup`, if it was not built yet. It is built
+        on the first lookup otherwise.
+        """
+        if self._text_index is not None:
+            return
+        self._text_index = {}
+        for id in self._composers.keys():
+            self._indexText(("composer", id))
+        for id in self._pieces.keys():
+            self._indexText(("piece", id))
+
+    def _indexText(self, key):
+        text = self.text(*key)
+        entry = self._text_index.get(text)
+        if entry is None:
+            self._text_index[text] = key
+        elif isinstance(entry, tuple):
+            if entry != key:
+                self._text_index[text] = [entry, key]
+        elif key not in entry:
+            entry.append(key)
+
+    def pieceText(self, piece):
+        """
+        Text shown for a piece
+        """
+        return "{}: {}".format(
+            piece['name'],
+            self._composers[piece['composer_id']]['name'])
+
+    def updatePieces(self, added, changed, removed):
+        """
+        Called after pieces were added, changed or removed from the database
+        """
+        if self._text_index is not None:
+            for id in changed + added:
+                self._indexText(("piece", id))
+
+        if self._piece_ids is None:
+            # no row was looked at yet, so there is nothing to patch
+            self.beginResetModel()
+            self._num_pieces = len(self._pieces)
+            self.endResetModel()
+            return
+
+        offset = len(self._composer_ids)
+        # from the last row, so the rows still to be removed do not move
+        rows = sorted((self._piece_rows[id] for id in removed), reverse=True)
+        for row in rows:
+            self.beginRemoveRows(QtCore.QModelIndex(), offset + row,
+                                 offset + row)
+            del self._piece_ids[row]
+            self._num_pieces -= 1
+            self.endRemoveRows()
+        if len(rows) > 0:
+            self._buildPieceRows()
+
+        for id in changed:
+            idx = self.index(offset + self._piece_rows[id])
+            self.dataChanged.emit(idx, idx)
+
+        if len(added) > 0:
+            first = len(self._piece_ids)
+            self.beginInsertRows(QtCore.QModelIndex(), offset + first,
+                                 offset + first + len(added) - 1)
+            self._piece_ids.extend(added)
+            for row, id in enumerate(added, first):
+                self._piece_rows[id] = row
+            self._num_pieces += len(added)
+            self.endInsertRows()
+
+    def _buildIds(self):
+        if self._piece_ids is None:
+            self._composer_ids = list(self._composers.keys())
+            self._piece_ids = list(self._pieces.keys())
+            self._num_pieces = len(self._piece_ids)
+            self._buildPieceRows()
+
+    def _buildPieceRows(self):
+        self._piece_rows = {id: row for row, id in enumerate(self._piece_ids)}
@@ -2,9 +2,17 @@
 DB.py
 """
 import os
-import yaml
+import hashlib
+import pickle
+import threading
+from concertista import consts
+from concertista import ingest
+from concertista import search
+from concertista import durations
+from concertista import query
+from concertista import weights
 from concertista.assets import Assets
-from PyQt5 import QtCore, QtGui
+from concertista.records import Composer, Piece
 
 
 class DB:
@@ -12,86 +20,584 @@ class DB:
     Database with the music
     """
 
-    def __init__(self):
+    # Bump this when the layout of the snapshot changes
+    SNAPSHOT_VERSION = 3
+
+    def __init__(self, cache_dir=None, lazy=False):
         self._composers = {}
         self._pieces = {}
-        # composer_id -> dict(piece ids)
+        # composer_id -> list of piece ids
         self._pieces_by_composers = {}
+        # file name (relative to tracks dir) -> (mtime, size, hash, piece id)
+        self._files = {}
+        # (mtime, size, hash) of composers.yml
+        self._composers_file = None
+        # directory where we store the compiled snapshot, `None` while it is
+        # disabled
+        self._cache_dir = _resolve_cache_dir(cache_dir)
+        # number of processes used for parsing piece files, `None` means the
+        # number of CPUs
+        self.workers = None
+        # if `True`, pieces of a composer are loaded when they are needed
+        self.lazy = lazy
+        # composer id -> directories with its piece files
+        self._shards = {}
+        self._loaded_shards = set()
+        self._all_shards_loaded = False
+        self._lock = threading.RLock()
         self._completer_model = None
+        self._search_index = None
+        # list of all piece IDs, built on first use
+        self._piece_ids = None
+        self._track_durations = None
+        # composer id -> weight used when drawing pieces for stations
+        self._composer_weights = {}
+        # (mode, composer id) -> weights.WeightTable
+        self._weight_tables = {}
+        self._query_index = None
 
     def load(self):
         """
         Read database from location
         """
-        self._load_composers()
-        self._load_pieces()
-        self._build_completer_model()
+        if self.lazy:
+            self._load_composers()
+            self._load_shard_index()
+            return
+
+        snapshot = self._read_snapshot()
+        if snapshot is None:
+            self._load_composers()
+            self._load_pieces()
+            modified = True
+        else:
+            modified = self._update_from_snapshot(snapshot)
+        if modified:
+            self._write_snapshot()
 
     def get_pieces(self):
+        if self.lazy:
+            self._load_all_shards()
         return self._pieces
 
+    def get_piece_ids(self):
+        """
+        List of IDs of all pieces. The list is shared, do not modify it.
+        """
+        if self._piece_ids is None:
+            self._piece_ids = list(self.get_pieces().keys())
+        return self._piece_ids
+
+    def get_track_ids(self, piece_ids=None):
+        """
+        IDs of tracks of the pieces, or of all pieces
+        """
+        if piece_ids is None:
+            piece_ids = self.get_piece_ids()
+        track_ids = []
+        for id in piece_ids:
+            piece = self.get_piece(id)
+            if piece is not None:
+                track_ids.extend(piece['tracks'])
+        return track_ids
+
+    def get_track_durations(self):
+        """
+        Cache of track durations, it is read on first use
+        """
+        if self._track_durations is None:
+            self._track_durations = durations.TrackDurations(self._cache_dir)
+            self._track_durations.load()
+        return self._track_durations
+
+    def set_composer_weights(self, composer_weights):
+        """
+        Set weights of composers for drawing pieces, composers that are not
+        listed have weight 1
+        """
+        if composer_weights != self._composer_weights:
+            self._composer_weights = dict(composer_weights)
+            self._weight_tables = {}
+
+    def get_composer_weights(self):
+        return self._composer_weights
+
+    def get_weights(self, mode, composer_id=None, piece_ids=None):
+        """
+        Table for drawing pieces in proportion to their weights (see
+        `weights.MODES`). Tables for the whole library and for the pieces
+        of a composer are built on first use and kept until the catalog
+        changes. A table for other `piece_ids` is built on each call.
+        """
+        track_durations = None
+        if mode == weights.DURATION:
+            track_durations = self.get_track_durations()
+        if piece_ids is not None:
+            return weights.WeightTable.build(
+                self, piece_ids, mode, self._composer_weights,
+                track_durations)
+
+        key = (mode, composer_id)
+        with self._lock:
+            table = self._weight_tables.get(key)
+            if (table is None or (track_durations is not None and
+                                  table.durations_version !=
+                                  track_durations.version)):
+                if composer_id is None:
+                    piece_ids = self.get_piece_ids()
+                else:
+                    piece_ids = self.get_composer_pieces(composer_id)
+                table = weights.WeightTable.build(
+                    self, piece_ids, mode, self._composer_weights,
+                    track_durations)
+                self._weight_tables[key] = table
+        return table
+
+    def get_query_index(self):
+        """
+        Index for selecting pieces by composer, album and number of tracks.
+        It is built on first use and rebuilt after the catalog changes.
+        """
+        with self._lock:
+            if self._query_index is None:
+                self._query_index = query.QueryIndex(self)
+            return self._query_index
+
+    def get_piece(self, piece_id):
+        """
+        Get a piece by its ID, returns `None` if there is no such piece
+        """
+        piece = self._pieces.get(piece_id)
+        if piece is None and self.lazy and not self._all_shards_loaded:
+            self._load_all_shards()
+            piece = self._pieces.get(piece_id)
+        return piece
+
     def get_composers(self):
         return self._composers
 
     def get_composer_pieces(self, composer_id):
-        return self._pieces_by_composers[composer_id]
+        if self.lazy:
+            self._load_composer_shards(composer_id)
+        return self._pieces_by_composers.get(composer_id, [])
+
+    def is_composer_loaded(self, composer_id):
+        """
+        Check if pieces of a composer were already loaded
+        """
+        if not self.lazy or self._all_shards_loaded:
+            return True
+        return all(path in self._loaded_shards
+                   for path in self._shards.get(composer_id, []))
 
     def get_completer_model(self):
+        """
+        Model for the search completer, it is built on first use, so the
+        database can be used without Qt. In lazy mode, this loads all pieces.
+        """
+        if self._completer_model is None:
+            self._build_completer_model()
         return self._completer_model
 
+    def prepare_search(self):
+        """
+        Build the completer model and the search index now, so the first
+        search does not have to wait for them
+        """
+        self.get_completer_model().buildTextIndex()
+        if self._search_index is None:
+            self._build_search_index()
+
+    def search(self, text, limit=50):
+        """
+        Search for composers and pieces by name. Returns a list of
+        {"type", "id"} with composers first. In lazy mode, the first search
+        loads all pieces.
+        """
+        if self._search_index is None:
+            self._build_search_index()
+        return self._search_index.search(text, limit)
+
+    def fuzzy_search(self, text, limit=50):
+        """
+        Search for composers and pieces tolerating typos in their names.
+        Returns a list of {"type", "id"} ranked by the number of typos and by
+        the number of pieces of the composer.
+        """
+        if self._search_index is None:
+            self._build_search_index()
+        return self._search_index.fuzzy_search(text, limit)
+
+    def get_tracks_dir(self):
+        return os.path.join(Assets().music_dir, "tracks")
+
+    def update_files(self, file_names):
+        """
+        Re-read piece files that were added, modified or deleted since they
+        were loaded and patch the completer model in place. Returns lists of
+        added, changed and removed piece IDs.
+        """
+        if self.lazy:
+            self._update_shard_index(file_names)
+        tracks_dir = self.get_tracks_dir()
+        old_ids = {}
+        to_read = []
+        for fn in file_names:
+            if (self.lazy and
+                    os.path.dirname(fn) not in self._loaded_shards):
+                # will be read when the shard is loaded
+                continue
+            rel = os.path.relpath(fn, tracks_dir)
+            rec = self._files.get(rel)
+            if os.path.isfile(fn):
+                old_sig = None if rec is None else rec[:3]
+                sig = ingest.file_signature(fn, old_sig)
+                if rec is not None and sig[2] == rec[2]:
+                    self._files[rel] = sig + (rec[3], )
+                    continue
+                to_read.append(fn)
+            if rec is not None:
+                old_ids[rec[3]] = True
+                self._remove_file(rel)
+
+        new_ids = {}
+        for fn, sig, piece in ingest.read_pieces(to_read, self.workers):
+            if piece is None:
+                print("Error loading file:", os.path.basename(fn))
+                continue
+            rel = os.path.relpath(fn, tracks_dir)
+            new_ids[self._add_piece(rel, sig, piece)] = True
+
+        added = [id for id in new_ids if id not in old_ids]
+        changed = [id for id in new_ids if id in old_ids]
+        removed = [id for id in old_ids if id not in new_ids]
+        self._update_indexes(added, changed, removed)
+        return added, changed, removed
+
+    def _composers_file_name(self):
+        return os.path.join(Assets().music_dir, 'composers.yml')
+
+    def _cache_file_name(self, suffix):
+        """
+        Name of a file in the cache directory; it is unique for each music
+        directory, so we do not mix catalogs from different locations
+        """
+        music_dir = os.path.abspath(Assets().music_dir)
+        digest = hashlib.sha1(music_dir.encode('utf-8')).hexdigest()
+        return os.path.join(self._cache_dir, "catalog-{}{}".format(
+            digest[:16], suffix))
+
+    def _read_snapshot(self):
+        """
+        Read the compiled snapshot of the database, returns `None` if there is
+        no usable snapshot
+        """
+        if self._cache_dir is None:
+            return None
+
+        try:
+            with open(self._cache_file_name('.pickle'), 'rb') as f:
+                snapshot = pickle.load(f)
+        except (OSError, EOFError, AttributeError, pickle.UnpicklingError):
+            return None
+
+        if (not isinstance(snapshot, dict) or
+                snapshot.get('version') != self.SNAPSHOT_VERSION):
+            return None
+        return snapshot
+
+    def _write_snapshot(self):
+        """
+        Write the compiled snapshot of the database into the cache directory
+        """
+        if self._cache_dir is None:
+            return
+
+        snapshot = {
+            'version': self.SNAPSHOT_VERSION,
+            'composers_file': self._composers_file,
+            'composers': self._composers,
+            'files': self._files,
+            'pieces': self._pieces,
+            'pieces_by_composers': self._pieces_by_composers
+        }
+        fn = self._cache_file_name('.pickle')
+        tmp_fn = fn + ".tmp"
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            with open(tmp_fn, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_fn, fn)
+        except OSError:
+            print("Error writing catalog snapshot:", fn)
+
+    def _update_from_snapshot(self, snapshot):
+        """
+        Take the data from a snapshot and re-read only the files that changed
+        since the snapshot was taken. Returns `True` if the snapshot needs to
+        be updated
+        """
+        self._composers = snapshot['composers']
+        self._composers_file = snapshot['composers_file']
+        self._files = snapshot['files']
+        self._pieces = snapshot['pieces']
+        self._pieces_by_composers = snapshot['pieces_by_composers']
+        modified = False
+
+        fn = self._composers_file_name()
+        sig = ingest.file_signature(fn, self._composers_file)
+        if sig != self._composers_file:
+            if sig[2] != self._composers_file[2]:
+                self._composers = {}
+                self._load_composers()
+            self._composers_file = sig
+            modified = True
+
+        tracks_dir = self.get_tracks_dir()
+        changed = []
+        present = set()
+        for fn in ingest.piece_files(tracks_dir):
+            rel = os.path.relpath(fn, tracks_dir)
+            present.add(rel)
+            rec = self._files.get(rel)
+            old_sig = None if rec is None else rec[:3]
+            sig = ingest.file_signature(fn, old_sig)
+            if rec is None or sig[2] != rec[2]:
+                changed.append(fn)
+            elif sig != old_sig:
+                self._files[rel] = sig + (rec[3], )
+                modified = True
+
+        removed = [rel for rel in self._files if rel not in present]
+        for rel in removed:
+            self._remove_file(rel)
+        for fn in changed:
+            self._remove_file(os.path.relpath(fn, tracks_dir))
+        self._add_pieces(changed)
+
+        return modified or len(removed) > 0 or len(changed) > 0
+
+    def _remove_file(self, rel):
+        """
+        Remove the piece that was loaded from a file
+        """
+        rec = self._files.pop(rel, None)
+        if rec is None:
+            return
+        piece = self._pieces.pop(rec[3], None)
+        if piece is not None:
+            composer_id = piece['composer_id']
+            self._pieces_by_composers[composer_id].remove(rec[3])
+            if len(self._pieces_by_composers[composer_id]) == 0:
+                del self._pieces_by_composers[composer_id]
+
     def _load_composers(self):
         composers = []
-        fn = os.path.join(Assets().music_dir, 'composers.yml')
-        with open(fn, 'rt', encoding="utf-8") as f:
-            composers = yaml.safe_load(f)
+        fn = self._composers_file_name()
+        with open(fn, 'rb') as f:
+            data = f.read()
+        self._composers_file = ingest.file_signature(fn, data=data)
+        composers = ingest.load_yaml(data.decode('utf-8'))
 
         if composers is not None:
             for c in composers:
-                id = c['id']
-                self._composers[id] = c
+                composer = Composer.from_dict(c)
+                self._composers[composer.id] = composer
 
     def _load_pieces(self):
-        tracks_dir = os.path.join(Assets().music_dir, "tracks")
-        for root, dirs, files in os.walk(tracks_dir):
-            root.split(os.sep)
-            for file in files:
-                if file.endswith(('.yml')):
-                    try:
-                        fn = os.path.join(root, file)
-                        with open(fn, 'rt', encoding="utf-8") as f:
-                            piece = yaml.safe_load(f)
-
-                        piece_id = piece['id']
-                        self._pieces[piece_id] = piece
-
-                        composer_id = piece['composer_id']
-                        if composer_id not in self._pieces_by_composers:
-                            self._pieces_by_composers[composer_id] = []
-                        self._pieces_by_composers[composer_id].append(piece_id)
-                    except yaml.YAMLError:
-                        print("Error loading file:", file)
+        self._add_pieces(list(ingest.piece_files(self.get_tracks_dir())))
+
+    def _add_pieces(self, file_names):
+        """
+        Parse piece files and add them into the database. The pieces are
+        added in the order of `file_names`. Returns IDs of added pieces.
+        """
+        tracks_dir = self.get_tracks_dir()
+        piece_ids = []
+        for fn, sig, piece in ingest.read_pieces(file_names, self.workers):
+            if piece is None:
+                print("Error loading file:", os.path.basename(fn))
+                continue
+
+            rel = os.path.relpath(fn, tracks_dir)
+            piece_ids.append(self._add_piece(rel, sig, piece))
+        return piece_ids
+
+    def _add_piece(self, rel, sig, data):
+        piece = Piece.from_dict(data)
+        piece_id = piece.id
+        self._pieces[piece_id] = piece
+        self._files[rel] = sig + (piece_id, )
+
+        composer_id = piece.composer_id
+        if composer_id not in self._pieces_by_composers:
+            self._pieces_by_composers[composer_id] = []
+        self._pieces_by_composers[composer_id].append(piece_id)
+        return piece_id
+
+    def _load_shard_index(self):
+        """
+        Find out which composer each directory with piece files belongs to.
+        Only the first file in every directory is parsed.
+        """
+        for root, dirs, files in os.walk(self.get_tracks_dir()):
+            dirs.sort()
+            names = sorted(f for f in files if f.endswith('.yml'))
+            if len(names) > 0:
+                self._add_shard(root, names)
+
+    def _add_shard(self, path, names):
+        """
+        Add a directory with piece files `names` to the shard index. Returns
+        the composer ID or `None` if the first file could not be read.
+        """
+        sig, piece = ingest.read_piece(os.path.join(path, names[0]))
+        if piece is None:
+            print("Error loading file:", names[0])
+            return None
+        composer_id = piece['composer_id']
+        if composer_id not in self._shards:
+            self._shards[composer_id] = []
+        self._shards[composer_id].append(path)
+        return composer_id
+
+    def _update_shard_index(self, file_names):
+        """
+        Add directories that appeared since the shard index was built and
+        drop the ones that disappeared before they were loaded. A new
+        directory is loaded right away if the other pieces of its composer
+        are already loaded.
+        """
+        dirs = set(os.path.dirname(fn) for fn in file_names)
+        known = set()
+        for composer_id, paths in self._shards.items():
+            for path in list(paths):
+                known.add(path)
+                if (path in dirs and path not in self._loaded_shards and
+                        not os.path.isdir(path)):
+                    paths.remove(path)
+
+        for path in sorted(dirs - known):
+            if not os.path.isdir(path):
+                continue
+            names = sorted(f for f in os.listdir(path) if f.endswith('.yml'))
+            if len(names) == 0:
+                continue
+            composer_id = self._add_shard(path, names)
+            if composer_id is None:
+                continue
+            if all(p in self._loaded_shards
+                   for p in self._shards[composer_id] if p != path):
+                # its files are read by `update_files`
+                self._loaded_shards.add(path)
+
+    def _load_shard(self, path):
+        """
+        Load all piece files from a directory, if not already loaded
+        """
+        if path in self._loaded_shards:
+            return
+        with self._lock:
+            if path in self._loaded_shards:
+                return
+            file_names = sorted(
+                os.path.join(path, f)
+                for f in os.listdir(path) if f.endswith('.yml'))
+            piece_ids = self._add_pieces(file_names)
+            self._loaded_shards.add(path)
+            self._update_indexes(piece_ids, [], [])
+
+    def _load_composer_shards(self, composer_id):
+        for path in self._shards.get(composer_id, []):
+            self._load_shard(path)
+
+    def _load_all_shards(self):
+        if self._all_shards_loaded:
+            return
+        with self._lock:
+            for paths in list(self._shards.values()):
+                for path in paths:
+                    self._load_shard(path)
+            self._all_shards_loaded = True
 
     def _build_completer_model(self):
-        self._completer_model = QtGui.QStandardItemModel()
+        from concertista.CompleterModel import CompleterModel
+        if self.lazy:
+            # every piece must be found, not just the ones browsed so far
+            self._load_all_shards()
+        self._completer_model = CompleterModel(self._composers, self._pieces)
 
+    def _build_search_index(self):
+        if self.lazy:
+            self._load_all_shards()
+        self._search_index = search.SearchIndex()
         for id, composer in self._composers.items():
-            si = QtGui.QStandardItem(
-                Assets().author_icon,
-                "{}".format(composer['name']))
-            si.setData({"type": "composer", "id": id})
-            self._completer_model.appendRow(si)
-            self._completer_model.setData(
-                si.index(), QtCore.QSize(20, 20), QtCore.Qt.SizeHintRole)
-
+            self._search_index.add(
+                "composer", id, composer['name'], self._popularity(id))
         for id, piece in self._pieces.items():
-            si = QtGui.QStandardItem(
-                Assets().piece_icon,
-                "{}: {}".format(
-                    piece['name'],
-                    self._composers[piece['composer_id']]['name']))
-            si.setData({"type": "piece", "id": id})
-            self._completer_model.appendRow(si)
-            self._completer_model.setData(
-                si.index(),
-                QtCore.QSize(20, 20),
-                QtCore.Qt.SizeHintRole)
+            self._search_index.add(
+                "piece", id, self._piece_text(piece),
+                self._popularity(piece['composer_id']))
+
+    def _popularity(self, composer_id):
+        """
+        Popularity of a composer and their pieces for ranking search results
+        """
+        return len(self._pieces_by_composers.get(composer_id, []))
+
+    def _piece_text(self, piece):
+        """
+        Text we search in for a piece, the same as shown by the completer
+        """
+        composer = self._composers.get(piece['composer_id'])
+        if composer is None:
+            return piece['name']
+        return "{}: {}".format(piece['name'], composer['name'])
+
+    def _update_indexes(self, added, changed, removed):
+        """
+        Patch the completer model and the search index after pieces were
+        added, changed or removed. Weight tables are rebuilt when needed.
+        """
+        if len(added) > 0 or len(removed) > 0:
+            self._piece_ids = None
+        self._weight_tables = {}
+        self._query_index = None
+        if self._completer_model is not None:
+            self._completer_model.updatePieces(added, changed, removed)
+        if self._search_index is not None:
+            for id in removed:
+                self._search_index.remove("piece", id)
+            for id in changed + added:
+                piece = self._pieces[id]
+                self._search_index.add(
+                    "piece", id, self._piece_text(piece),
+                    self._popularity(piece['composer_id']))
+
+
+def _resolve_cache_dir(cache_dir):
+    """
+    Cache directory passed to a database: `None` stands for
+    `consts.CACHE_DIR`, read when the database is created, and `False`
+    disables the cache
+    """
+    if cache_dir is None:
+        return consts.CACHE_DIR
+    if cache_dir is False:
+        return None
+    return cache_dir
+
+
+def create_db():
+    """
+    Create the database backend selected by CONCERTISTA_DB: "sqlite", "lazy"
+    or the default in-memory one
+    """
+    backend = os.environ.get("CONCERTISTA_DB")
+    if backend == "sqlite":
+        from concertista.SQLiteDB import SQLiteDB
+        return SQLiteDB()
+    elif backend == "lazy":
+        return DB(lazy=True)
+    else:
+        return DB()
@@ -2,11 +2,13 @@
 DeveloperAlbumsWindow.py
 """
 
+import functools
 from PyQt5 import QtWidgets, QtCore, QtGui
+from concertista.SpotifyWorker import SpotifyCallsMixin
 from concertista.PieceNameDialog import PieceNameDialog
 
 
-class DeveloperAlbumsWindow(QtWidgets.QMainWindow):
+class DeveloperAlbumsWindow(SpotifyCallsMixin, QtWidgets.QMainWindow):
     """
     Developer window
     """
@@ -14,8 +16,10 @@ class DeveloperAlbumsWindow(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
         self._artist = None
-        # Spotify object
-        self._spotify = None
+        # runs the Spotify calls
+        self._spotify_worker = None
+        # group -> pending Spotify requests
+        self._requests = {}
         self._market = None
         self._results = None
         self._settings = QtCore.QSettings()
@@ -66,21 +70,41 @@ class DeveloperAlbumsWindow(QtWidgets.QMainWindow):
         fch_data = first_child.data(0, QtCore.Qt.UserRole)
         if fch_data is None:
             album_data = item.data(0, QtCore.Qt.UserRole)
+            # mark the album as loading, so the tracks are requested once
+            first_child.setData(0, QtCore.Qt.UserRole, False)
+            request = self.spotifyCall(
+                'tracks', 'album_tracks', album_data['id'])
+            request.finished.connect(
+                functools.partial(self.onAlbumTracks, item))
+            request.failed.connect(
+                functools.partial(self.onAlbumTracksFailed, item))
 
-            album_tracks = self._spotify.album_tracks(album_data['id'])
-            for track in album_tracks['items']:
-                ti = QtWidgets.QTreeWidgetItem(item)
-                ti.setText(
-                    0,
-                    "{:2d}. {}".format(track['track_number'], track['name']))
-                ti.setData(0, QtCore.Qt.UserRole, track)
-                ti.setCheckState(0, QtCore.Qt.Unchecked)
-                item.addChild(ti)
+    def onAlbumTracks(self, item, album_tracks):
+        """
+        Called when tracks of an expanded album arrived
+        """
+        first_child = item.child(0)
+        for track in album_tracks['items']:
+            ti = QtWidgets.QTreeWidgetItem(item)
+            ti.setText(
+                0,
+                "{:2d}. {}".format(track['track_number'], track['name']))
+            ti.setData(0, QtCore.Qt.UserRole, track)
+            ti.setCheckState(0, QtCore.Qt.Unchecked)
+            item.addChild(ti)
 
-            item.removeChild(first_child)
+        item.removeChild(first_child)
+
+        for i in range(self._album_list.columnCount()):
+            self._album_list.resizeColumnToContents(i)
 
-            for i in range(self._album_list.columnCount()):
-                self._album_list.resizeColumnToContents(i)
+    def onAlbumTracksFailed(self, item, error):
+        """
+        Called when tracks of an album could not be loaded, so the album
+        can be expanded again
+        """
+        item.child(0).setData(0, QtCore.Qt.UserRole, None)
+        item.setExpanded(False)
 
     def onSave(self):
         items = []
@@ -114,6 +138,8 @@ class DeveloperAlbumsWindow(QtWidgets.QMainWindow):
         Called when EventClose is recieved
         """
         self.writeSettings()
+        # loading tracks can go on, the albums stay in the list
+        self.cancelRequests('albums')
         event.accept()
 
     def writeSettings(self):
@@ -142,14 +168,12 @@ class DeveloperAlbumsWindow(QtWidgets.QMainWindow):
             self.restoreGeometry(geom)
         self._settings.endGroup()
 
-    def setSpotify(self, spotify, market):
+    def setSpotify(self, spotify_worker, market):
         """
-        Setup spotify object
+        Setup the worker running Spotify calls
         """
-        self._spotify = spotify
+        self._spotify_worker = spotify_worker
         self._market = market
-        if spotify is None:
-            return
 
     def setArtist(self, artist):
         """
@@ -159,13 +183,24 @@ class DeveloperAlbumsWindow(QtWidgets.QMainWindow):
 
         self._artist_name.setText(self._artist['name'])
 
+        # tracks of the albums being removed are not needed anymore
+        self.cancelRequests('albums', 'tracks')
         self._album_list.clear()
 
-        self._results = self._spotify.artist_albums(
+        request = self.spotifyCall(
+            'albums',
+            'artist_albums',
             self._artist['id'],
             album_type='album',
             limit=50,
             country=self._market)
+        request.finished.connect(self.onArtistAlbums)
+
+    def onArtistAlbums(self, results):
+        """
+        Called when albums of the artist arrived
+        """
+        self._results = results
         all_albums = self._results['items']
         # while self._results['next']:
         #     self._results = self._spotify.next(self._results)
@@ -2,20 +2,24 @@
 DeveloperWindow.py
 """
 
+import functools
 from PyQt5 import QtWidgets, QtCore, QtGui
+from concertista.SpotifyWorker import SpotifyCallsMixin
 from concertista.DeveloperAlbumsWindow import DeveloperAlbumsWindow
 from concertista.PieceNameDialog import PieceNameDialog
 
 
-class DeveloperWindow(QtWidgets.QMainWindow):
+class DeveloperWindow(SpotifyCallsMixin, QtWidgets.QMainWindow):
     """
     Developer window
     """
 
     def __init__(self):
         super().__init__()
-        # Spotify object
-        self._spotify = None
+        # runs the Spotify calls
+        self._spotify_worker = None
+        # group -> pending Spotify requests
+        self._requests = {}
         self._market = None
         self._settings = QtCore.QSettings()
         self._albums_window = None
@@ -131,15 +135,23 @@ class DeveloperWindow(QtWidgets.QMainWindow):
         """
         Called when search for a composer is requested
         """
+        self.cancelRequests('composers')
         self._composer_list.clear()
 
         srch_str = self._composer_search_box.text()
-        res = self._spotify.search(
+        request = self.spotifyCall(
+            'composers',
+            'search',
             srch_str,
             limit=50,
             type='artist',
             market=self._market)
+        request.finished.connect(self.onComposersFound)
 
+    def onComposersFound(self, res):
+        """
+        Called when composer search results arrived
+        """
         root = self._composer_list.invisibleRootItem()
         for artist in res['artists']['items']:
             ti = QtWidgets.QTreeWidgetItem(root)
@@ -160,7 +172,8 @@ class DeveloperWindow(QtWidgets.QMainWindow):
 
         if self._albums_window is None:
             self._albums_window = DeveloperAlbumsWindow()
-            self._albums_window.setSpotify(self._spotify, self._market)
+            self._albums_window.setSpotify(
+                self._spotify_worker, self._market)
 
         self._albums_window.setArtist(artist)
         self._albums_window.show()
@@ -169,15 +182,24 @@ class DeveloperWindow(QtWidgets.QMainWindow):
         """
         Called when search for an album is requested
         """
+        # tracks of the albums being removed are not needed anymore
+        self.cancelRequests('albums', 'tracks')
         self._album_list.clear()
 
         srch_str = self._album_search_box.text()
-        res = self._spotify.search(
+        request = self.spotifyCall(
+            'albums',
+            'search',
             srch_str,
             limit=50,
             type='album',
             market=self._market)
+        request.finished.connect(self.onAlbumsFound)
 
+    def onAlbumsFound(self, res):
+        """
+        Called when album search results arrived
+        """
         root = self._album_list.invisibleRootItem()
         for album in res['albums']['items']:
             ti = QtWidgets.QTreeWidgetItem(root)
@@ -205,21 +227,41 @@ class DeveloperWindow(QtWidgets.QMainWindow):
         fch_data = first_child.data(0, QtCore.Qt.UserRole)
         if fch_data is None:
             album_data = item.data(0, QtCore.Qt.UserRole)
+            # mark the album as loading, so the tracks are requested once
+            first_child.setData(0, QtCore.Qt.UserRole, False)
+            request = self.spotifyCall(
+                'tracks', 'album_tracks', album_data['id'])
+            request.finished.connect(
+                functools.partial(self.onAlbumTracks, item))
+            request.failed.connect(
+                functools.partial(self.onAlbumTracksFailed, item))
+
+    def onAlbumTracks(self, item, album_tracks):
+        """
+        Called when tracks of an expanded album arrived
+        """
+        first_child = item.child(0)
+        for track in album_tracks['items']:
+            ti = QtWidgets.QTreeWidgetItem(item)
+            ti.setText(
+                0,
+                "{:2d}. {}".format(track['track_number'], track['name']))
+            ti.setData(0, QtCore.Qt.UserRole, track)
+            ti.setCheckState(0, QtCore.Qt.Unchecked)
+            item.addChild(ti)
 
-            album_tracks = self._spotify.album_tracks(album_data['id'])
-            for track in album_tracks['items']:
-                ti = QtWidgets.QTreeWidgetItem(item)
-                ti.setText(
-                    0,
-                    "{:2d}. {}".format(track['track_number'], track['name']))
-                ti.setData(0, QtCore.Qt.UserRole, track)
-                ti.setCheckState(0, QtCore.Qt.Unchecked)
-                item.addChild(ti)
+        item.removeChild(first_child)
 
-            item.removeChild(first_child)
+        for i in range(self._album_list.columnCount()):
+            self._album_list.resizeColumnToContents(i)
 
-            for i in range(self._album_list.columnCount()):
-                self._album_list.resizeColumnToContents(i)
+    def onAlbumTracksFailed(self, item, error):
+        """
+        Called when tracks of an album could not be loaded, so the album
+        can be expanded again
+        """
+        item.child(0).setData(0, QtCore.Qt.UserRole, None)
+        item.setExpanded(False)
 
     def onSave(self):
         if self._tab.currentIndex() != 0:
@@ -257,6 +299,8 @@ class DeveloperWindow(QtWidgets.QMainWindow):
         Called when EventClose is recieved
         """
         self.writeSettings()
+        # loading tracks can go on, the albums stay in the list
+        self.cancelRequests('composers', 'albums')
         event.accept()
 
     def writeSettings(self):
@@ -284,11 +328,9 @@ class DeveloperWindow(QtWidgets.QMainWindow):
             self.restoreGeometry(geom)
         self._settings.endGroup()
 
-    def setupSpotify(self, spotify, market):
+    def setupSpotify(self, spotify_worker, market):
         """
-        Setup spotify object
+        Setup the worker running Spotify calls
         """
-        self._spotify = spotify
+        self._spotify_worker = spotify_worker
         self._market = market
-        if spotify is None:
-            return
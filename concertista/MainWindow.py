@@ -4,15 +4,28 @@ MainWindow.py
 
 import sys
 import random
+import functools
 import platform
 from PyQt5 import QtWidgets, QtCore, QtNetwork, QtGui
-from concertista import server
+from concertista import consts
+from concertista import session
+from concertista import station
+from concertista import tracing
+from concertista import weights
+from concertista.Signaler import signaler
 from concertista.assets import Assets
-from concertista.DB import DB
+from concertista.DB import create_db
+from concertista.history import History
+from concertista.CatalogWatcher import CatalogWatcher
 from concertista.AboutDialog import AboutDialog
 from concertista.StationSearchDialog import StationSearchDialog
 from concertista.PreferencesWindow import PreferencesWindow
-from concertista.DeveloperWindow import DeveloperWindow
+from concertista.StationFeeder import StationFeeder
+from concertista.SpotifyWorker import SpotifyWorker
+from concertista.CommandCoalescer import CommandCoalescer
+from concertista.PlaybackPoller import PlaybackPoller
+from concertista.PlaybackState import PlaybackState
+from concertista.AlbumArtCache import AlbumArtCache, cover_url
 
 if platform.system() == "Darwin":
     WINDOW_TITLE = "Player"
@@ -35,48 +48,87 @@ class MainWindow(QtWidgets.QMainWindow):
     # delay in milliseconds for updating player status (assumes good connection
     # to Spotify)
     UPDATE_DELAY_MS = 500
+    # delay in milliseconds after which the search indexes are built, when the
+    # window is already shown
+    PREPARE_SEARCH_DELAY_MS = 2000
 
     def __init__(self):
         super().__init__()
         random.seed()
+        # where history and covers are kept
+        self._cache_dir = consts.CACHE_DIR
         # database
-        self._db = DB()
+        self._db = create_db()
         self.loadDB()
         # market for spotify
         self._market = 'US'
-        # Spotify object
-        self._spotify = None
+        # runs Spotify calls off the GUI thread
+        self._spotify_worker = SpotifyWorker(self)
+        # sends only the latest volume while the slider moves
+        self._volume_coalescer = CommandCoalescer(
+            self._spotify_worker, 'volume', self)
+        self._volume_coalescer.failed.connect(self.onSpotifyError)
+        # keeps the current playback up to date
+        self._playback_poller = PlaybackPoller(self._spotify_worker, self)
+        self._playback_poller.failed.connect(self.onSpotifyError)
+        # what is playing, answered without asking Spotify
+        self._playback_state = PlaybackState(self)
+        self._playback_poller.playbackUpdated.connect(
+            self._playback_state.update)
+        self._playback_state.changed.connect(self.onPlaybackStateChanged)
         # my Spotify profile
         self._me = None
         # Spotify devices
         self._devices = None
         # active Spotify device Id
         self._active_device_id = None
+        self._current_item = None
         self._current_title = ""
         self._current_artists = []
         self._volume = None
         self._settings = QtCore.QSettings()
         self._about_dlg = None
-        self._preferences_window = PreferencesWindow(self._db, self)
+        with tracing.span("PreferencesWindow"):
+            self._preferences_window = PreferencesWindow(self._db, self)
         self._preferences_window.preferencesUpdated.connect(
             self.onPreferencesUpdated)
+        # recently played pieces
+        self._history = History(
+            self._cache_dir, self._preferences_window.repeat_horizon.value())
+        self._history.load()
+        self._db.set_composer_weights(
+            self._preferences_window.composer_weights)
         self._developer_window = None
+        self._server_thread = None
+        self._catalog_watcher = None
+        self._station_feeder = None
+        self._durations_request = None
         self._window_menu = None
         self._show_prefs_window = None
 
-        self._station_search_dlg = StationSearchDialog(self._db, self)
+        with tracing.span("StationSearchDialog"):
+            self._station_search_dlg = StationSearchDialog(self._db, self)
         self._station_search_dlg.accepted.connect(self.onStationSearchPlay)
+        QtCore.QTimer.singleShot(
+            self.PREPARE_SEARCH_DELAY_MS, self._station_search_dlg.prepare)
 
-        server.signaler.connectToSpotify.connect(self.setupSpotify)
+        signaler.connectToSpotify.connect(self.setupSpotify)
 
         self._nam = QtNetwork.QNetworkAccessManager()
         self._nam.finished.connect(self.onNetworkReply)
+        self._album_art = AlbumArtCache(
+            self._cache_dir, self.ALBUM_IMAGE_WD, self)
+        self._album_art.coverReady.connect(self.onCoverReady)
+        # URL of the cover that should be shown
+        self._cover_url = None
 
         self.readSettings()
         self.setWindowTitle(WINDOW_TITLE)
-        self.setupWidgets()
+        with tracing.span("setupWidgets"):
+            self.setupWidgets()
         self.setupMenuBar()
         self.updateMenuBar()
+        self.updateCatalogWatcher()
 
     def setupWidgets(self):
         """
@@ -200,6 +252,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self._device_combo_box.currentIndexChanged.connect(
             self.onCurrentDeviceChanged)
         self._volume_slider.valueChanged.connect(self.onVolumeChanged)
+        self._volume_slider.sliderReleased.connect(
+            self._volume_coalescer.flush)
 
     def setupMenuBar(self):
         """
@@ -286,44 +340,77 @@ class MainWindow(QtWidgets.QMainWindow):
         self._dev_separator.setVisible(visible)
         self._developer.setVisible(visible)
 
-    def randomizePieces(self, piece_ids):
+    def randomizePieces(self, piece_ids, piece_weights=None):
         """
         Randomize list of pieces
         """
-        rng = random.sample(piece_ids, k=len(piece_ids))
-        pieces = self._db.get_pieces()
-
-        # if avg. track length is 5 mins, then this will be about 16 hours of
-        # music
-        max_tracks = 200
-        uris = []
-        for id in rng:
-            piece = pieces[id]
-            for track in piece['tracks']:
-                uri = "spotify:track:{}".format(track)
-                uris.append(uri)
-                max_tracks = max_tracks - 1
-            if max_tracks <= 0:
-                break
-        return uris
+        hours = self._preferences_window.station_hours.value()
+        return station.randomize_pieces(
+            self._db, piece_ids, max_duration=hours * 3600,
+            history=self._history, weights=piece_weights)
+
+    def stationWeights(self, composer_id=None, piece_ids=None):
+        """
+        Weights for drawing pieces of the library, of a composer or of the
+        given pieces. Returns `None` if all pieces are equally likely.
+        """
+        mode = self._preferences_window.station_sampling.currentData()
+        if (mode == weights.UNIFORM and
+                len(self._db.get_composer_weights()) == 0):
+            return None
+        return self._db.get_weights(mode, composer_id, piece_ids)
+
+    def playStation(self, piece_ids, piece_weights=None):
+        """
+        Start playing a station made of the pieces
+        """
+        self.stopStationFeeder()
+        if self._preferences_window.endless_station.isChecked():
+            uris = station.tracks(
+                self._db, piece_ids, repeat=True, history=self._history,
+                weights=piece_weights)
+            self._station_feeder = StationFeeder(
+                self._spotify_worker, self._playback_poller,
+                self._active_device_id, uris, self)
+            self._station_feeder.finished.connect(self.stopStationFeeder)
+            self._station_feeder.start()
+        else:
+            uris = self.randomizePieces(piece_ids, piece_weights)
+            self.playbackCommand(
+                {'is_playing': True},
+                'start_playback',
+                device_id=self._active_device_id,
+                uris=uris)
+        self._history.save()
+
+    def stopStationFeeder(self):
+        """
+        Stop feeding the queue of an endless station
+        """
+        if self._station_feeder is not None:
+            self._station_feeder.stop()
+            self._station_feeder.deleteLater()
+            self._station_feeder = None
+            self._history.save()
 
     def onNewStation(self):
         """
         Start to listen to new music
         """
         if self._active_device_id is not None:
-            pieces = {}
             if (self._preferences_window.music_library.checkedId() ==
                     PreferencesWindow.MUSIC_LIBRARY_ENTIRE):
-                pieces = self._db.get_pieces()
+                piece_ids = self._db.get_piece_ids()
+                piece_weights = self.stationWeights()
             else:
-                pieces = self._preferences_window.user_selection
-
-            if len(pieces) > 0:
-                uris = self.randomizePieces(list(pieces.keys()))
-                self._spotify.start_playback(
-                    device_id=self._active_device_id,
-                    uris=uris)
+                # pieces that are no longer in the catalog are dropped
+                index = self._db.get_query_index()
+                piece_ids = index.ids(index.pieces(
+                    self._preferences_window.user_selection))
+                piece_weights = self.stationWeights(piece_ids=piece_ids)
+
+            if len(piece_ids) > 0:
+                self.playStation(piece_ids, piece_weights)
         else:
             self.reportUnknownDeviceId()
 
@@ -341,16 +428,11 @@ class MainWindow(QtWidgets.QMainWindow):
             type = self._station_search_dlg.db_item['type']
             id = self._station_search_dlg.db_item['id']
             if type == 'piece':
-                uris = self.randomizePieces([id])
-                self._spotify.start_playback(
-                    device_id=self._active_device_id,
-                    uris=uris)
+                self.playStation([id])
             elif type == 'composer':
-                piece_ids = self._db.get_composer_pieces(id)
-                uris = self.randomizePieces(piece_ids)
-                self._spotify.start_playback(
-                    device_id=self._active_device_id,
-                    uris=uris)
+                self.playStation(
+                    list(self._db.get_composer_pieces(id)),
+                    self.stationWeights(composer_id=id))
         else:
             self.reportUnknownDeviceId()
 
@@ -359,39 +441,68 @@ class MainWindow(QtWidgets.QMainWindow):
         Open developer GUI
         """
         if self._developer_window is None:
+            # developer tools are rarely used, so we import them on demand
+            from concertista.DeveloperWindow import DeveloperWindow
             self._developer_window = DeveloperWindow()
-            self._developer_window.setupSpotify(self._spotify, self._market)
+            self._developer_window.setupSpotify(
+                self._spotify_worker, self._market)
         self._developer_window.show()
 
     def onPlayPause(self):
         """
         Start/Pause the playback
         """
-        cpb = self._spotify.current_playback()
-        if cpb['is_playing'] is True:
-            self._spotify.pause_playback(device_id=self._active_device_id)
-            self._play_pause.setText("Play")
-            self._play_pause_button.setIcon(Assets().play_icon)
+        if self._playback_state.isPlaying():
+            self.playbackCommand(
+                {'is_playing': False},
+                'pause_playback', device_id=self._active_device_id)
         else:
-            self._spotify.start_playback(device_id=self._active_device_id)
-            self._play_pause.setText("Pause")
-            self._play_pause_button.setIcon(Assets().pause_icon)
+            self.playbackCommand(
+                {'is_playing': True},
+                'start_playback', device_id=self._active_device_id)
 
     def onNext(self):
         """
         Skip to the next track
         """
-        self._spotify.next_track(device_id=self._active_device_id)
-        QtCore.QTimer.singleShot(
-            self.UPDATE_DELAY_MS, self.updateCurrentlyPlaying)
+        self.playbackCommand(
+            {'is_playing': True},
+            'next_track', device_id=self._active_device_id)
 
     def onPrevious(self):
         """
         Jump to the previous track
         """
-        self._spotify.previous_track(device_id=self._active_device_id)
-        QtCore.QTimer.singleShot(
-            self.UPDATE_DELAY_MS, self.updateCurrentlyPlaying)
+        self.playbackCommand(
+            {'is_playing': True},
+            'previous_track', device_id=self._active_device_id)
+
+    def playbackCommand(self, fields, method, *args, **kwargs):
+        """
+        Send a command that changes the playback. The local playback state
+        gets `fields` right away and is reconciled with the next snapshot.
+        """
+        change = self._playback_state.apply(**fields)
+        request = self.spotifyCall(method, *args, **kwargs)
+        request.finished.connect(
+            functools.partial(self.onPlaybackCommandFinished, change))
+        request.failed.connect(
+            functools.partial(self.onPlaybackCommandFailed, change))
+        return request
+
+    def onPlaybackCommandFinished(self, change, result):
+        """
+        Called when Spotify changed the playback on our request
+        """
+        self._playback_state.confirm(change)
+        self._playback_poller.refresh(self.UPDATE_DELAY_MS)
+
+    def onPlaybackCommandFailed(self, change, error):
+        """
+        Called when a command changing the playback failed
+        """
+        self._playback_state.revert(change)
+        self._playback_poller.refresh()
 
     def onVolumeUp(self):
         """
@@ -412,7 +523,9 @@ class MainWindow(QtWidgets.QMainWindow):
         Called when volume was changed
         """
         self._volume = value
-        self._spotify.volume(self._volume, device_id=self._active_device_id)
+        self._volume_coalescer.send(
+            self._active_device_id,
+            self._volume, device_id=self._active_device_id)
 
     def onAbout(self):
         """
@@ -429,7 +542,11 @@ class MainWindow(QtWidgets.QMainWindow):
         new_device_id = self._device_combo_box.itemData(index)
         if new_device_id != self._active_device_id:
             self._active_device_id = self._device_combo_box.itemData(index)
-            self._spotify.transfer_playback(self._active_device_id)
+            self.playbackCommand(
+                {'device_id': self._active_device_id},
+                'transfer_playback', self._active_device_id)
+            if self._station_feeder is not None:
+                self._station_feeder.setDeviceId(self._active_device_id)
 
     def onMinimize(self):
         """
@@ -475,6 +592,25 @@ class MainWindow(QtWidgets.QMainWindow):
         Called when 'Preferences' are updated
         """
         self.updateMenuBar()
+        self.updateCatalogWatcher()
+        self._history.horizon = self._preferences_window.repeat_horizon.value()
+        self._db.set_composer_weights(
+            self._preferences_window.composer_weights)
+
+    def updateCatalogWatcher(self):
+        """
+        Start or stop watching the music library for changes
+        """
+        watch = self._preferences_window.watch_library.isChecked()
+        if watch and self._catalog_watcher is None:
+            self._catalog_watcher = CatalogWatcher(self._db, self)
+            self._catalog_watcher.catalogChanged.connect(
+                self._preferences_window.onCatalogChanged)
+            self._catalog_watcher.start()
+        elif not watch and self._catalog_watcher is not None:
+            self._catalog_watcher.stop()
+            self._catalog_watcher.deleteLater()
+            self._catalog_watcher = None
 
     def event(self, event):
         """
@@ -495,6 +631,9 @@ class MainWindow(QtWidgets.QMainWindow):
         Called when EventClose is received
         """
         self.writeSettings()
+        self._volume_coalescer.cancel()
+        self._playback_poller.stop()
+        self._spotify_worker.cancelAll()
         event.accept()
         if platform.system() != "Darwin":
             sys.exit()
@@ -509,6 +648,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self._settings.setValue("device", self._device_combo_box.currentData())
 
+        self._history.save()
+
     def readSettings(self):
         """
         Read settings
@@ -526,26 +667,71 @@ class MainWindow(QtWidgets.QMainWindow):
             self.restoreGeometry(geom)
         self._settings.endGroup()
 
+    @tracing.traced
+    def startServer(self):
+        """
+        Start our local HTTP server and connect to Spotify through it. Flask
+        and spotipy take a while to import, so this is done after the window
+        is shown.
+        """
+        if self._server_thread is None:
+            with tracing.span("import server"):
+                from concertista import server
+            self._server_thread = server.ServerThread()
+            # the server must be listening before we can connect through it
+            self._server_thread.listening.connect(self.connectToSpotify)
+            self._server_thread.start()
+        else:
+            self.connectToSpotify()
+
     def connectToSpotify(self):
         """
         Connect to Spotify via our local HTTP server
         """
         spotify_req = QtNetwork.QNetworkRequest(
-            QtCore.QUrl("http://localhost:{}".format(server.port)))
+            QtCore.QUrl("http://localhost:{}".format(session.port)))
         self._nam.get(spotify_req)
 
+    def spotifyCall(self, method, *args, **kwargs):
+        """
+        Call a Spotify method in the background, errors are reported by
+        `onSpotifyError`
+        """
+        request = self._spotify_worker.call(method, *args, **kwargs)
+        request.failed.connect(self.onSpotifyError)
+        return request
+
+    def onSpotifyError(self, error):
+        """
+        Called when a Spotify call failed
+        """
+        print("Error calling Spotify:", error)
+
     def setupSpotify(self, spotify):
         """
         Link Spotify information to our internal data
         """
-        self._spotify = spotify
+        self._spotify_worker.setSpotify(spotify)
         if spotify is None:
             return
 
-        self._me = self._spotify.me()
-
+        request = self.spotifyCall('me')
+        request.finished.connect(self.onMe)
         # get active playback device and save its state
-        devs = self._spotify.devices()
+        request = self.spotifyCall('devices')
+        request.finished.connect(self.onDevices)
+
+    def onMe(self, me):
+        """
+        Called when my Spotify profile arrived
+        """
+        self._me = me
+
+    @tracing.traced
+    def onDevices(self, devs):
+        """
+        Called when the list of Spotify devices arrived
+        """
         self._devices = []
         for d in devs['devices']:
             self._devices.append(d)
@@ -553,7 +739,8 @@ class MainWindow(QtWidgets.QMainWindow):
                 self._active_device_id = d['id']
                 self._volume = d['volume_percent']
 
-        self.updateCurrentlyPlaying()
+        self._playback_poller.start()
+        self.updateTrackDurations()
 
         # devices
         self._device_combo_box.blockSignals(True)
@@ -587,6 +774,25 @@ class MainWindow(QtWidgets.QMainWindow):
         self._device_combo_box.setEnabled(True)
         self._volume_slider.setEnabled(True)
 
+    def updateTrackDurations(self):
+        """
+        Look up durations of tracks that are not in the cache yet. This runs
+        in the background, stations use the default duration for tracks that
+        are not known.
+        """
+        if (self._durations_request is not None and
+                self._durations_request.isPending()):
+            return
+        track_durations = self._db.get_track_durations()
+        track_ids = track_durations.missing(self._db.get_track_ids())
+        if len(track_ids) == 0:
+            return
+        self._durations_request = self._spotify_worker.run(
+            track_durations.fetch, track_ids, self._market)
+        # many batches of tracks, so this can take a while
+        self._durations_request.setTimeout(None)
+        self._durations_request.failed.connect(self.onSpotifyError)
+
     def updateCurrentlyPlayingTitle(self):
         """
         Update title and artists of currently playing track
@@ -607,31 +813,35 @@ class MainWindow(QtWidgets.QMainWindow):
         """
         Update information of currenlty playing track
         """
-        cpb = self._spotify.current_playback()
-        if cpb is not None:
-            if cpb['is_playing'] is True:
-                self._play_pause.setText("Pause")
-                self._play_pause_button.setIcon(Assets().pause_icon)
-            else:
-                self._play_pause.setText("Play")
-                self._play_pause_button.setIcon(Assets().play_icon)
-
-            if ('item' in cpb) and (cpb['item'] is not None):
-                self._current_title = cpb['item']['name']
-                self._current_artists = []
-                for a in cpb['item']['artists']:
-                    self._current_artists.append(a['name'])
-                self.updateCurrentlyPlayingTitle()
-
-                images = cpb['item']['album']['images']
-                for img in images:
-                    if (img['height'] >= self.ALBUM_IMAGE_HT and
-                            img['height'] <= 600):
-                        img_url = img['url']
+        self._playback_poller.refresh()
 
-                img_req = QtNetwork.QNetworkRequest(QtCore.QUrl(img_url))
-                self._nam.get(img_req)
+    @tracing.traced
+    def onPlaybackStateChanged(self):
+        """
+        Called when the local playback state changed
+        """
+        if self._playback_state.isPlaying():
+            self._play_pause.setText("Pause")
+            self._play_pause_button.setIcon(Assets().pause_icon)
+        else:
+            self._play_pause.setText("Play")
+            self._play_pause_button.setIcon(Assets().play_icon)
 
+        item = self._playback_state.item()
+        if item is not None and item != self._current_item:
+            self._current_item = item
+            self._current_title = item['name']
+            self._current_artists = []
+            for a in item['artists']:
+                self._current_artists.append(a['name'])
+            self.updateCurrentlyPlayingTitle()
+
+            url = cover_url(item['album']['images'], self.ALBUM_IMAGE_HT)
+            if url is not None and url != self._cover_url:
+                self._cover_url = url
+                self._album_art.fetch(url)
+
+    @tracing.traced
     def loadDB(self):
         """
         Load the database
@@ -642,14 +852,14 @@ class MainWindow(QtWidgets.QMainWindow):
         """
         Called when network request was finished
         """
-        if reply.url().host() == "localhost":
-            # our own requests
-            return
-        else:
-            img = QtGui.QImage()
-            img.load(reply, "")
-            scaled_img = img.scaledToWidth(self.ALBUM_IMAGE_WD)
-            pixmap = QtGui.QPixmap.fromImage(scaled_img)
+        # our own requests, covers are downloaded by the album art cache
+        reply.deleteLater()
+
+    def onCoverReady(self, url, pixmap):
+        """
+        Called when an album cover is ready
+        """
+        if url == self._cover_url:
             self._image.setPixmap(pixmap)
 
     def reportUnknownDeviceId(self):
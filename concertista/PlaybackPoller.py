@@ -0,0 +1,113 @@
+"""
+PlaybackPoller.py
+"""
+
+import time
+from PyQt5 import QtCore
+from concertista import playback
+
+
+class PlaybackPoller(QtCore.QObject):
+    """
+    Keeps one snapshot of the Spotify playback state up to date for all
+    consumers. The state is checked just after the playing track should
+    end, and less and less often while nothing is playing.
+    """
+
+    # new snapshot of the playback (as returned by `current_playback`)
+    playbackUpdated = QtCore.pyqtSignal(object)
+    # error of a check that failed
+    failed = QtCore.pyqtSignal(object)
+
+    def __init__(self, spotify_worker, parent=None):
+        super().__init__(parent)
+        self._spotify_worker = spotify_worker
+        self._schedule = playback.Schedule()
+        self._active = False
+        self._request = None
+        self._playback = None
+        # time.monotonic() when the snapshot was taken
+        self._updated = None
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.poll)
+
+    def playback(self):
+        """
+        Latest snapshot of the playback, `None` if nothing is playing
+        """
+        return self._playback
+
+    def progressMs(self):
+        """
+        Estimated progress of the playing track, `None` if not known
+        """
+        if self._playback is None or \
+                self._playback.get('progress_ms') is None:
+            return None
+        progress = self._playback['progress_ms']
+        if playback.is_playing(self._playback):
+            elapsed = time.monotonic() - self._updated
+            progress += int(elapsed * 1000)
+        return progress
+
+    def isActive(self):
+        """
+        Check if the playback is being checked
+        """
+        return self._active
+
+    def start(self):
+        """
+        Start checking the playback
+        """
+        self._active = True
+        self.refresh()
+
+    def stop(self):
+        """
+        Stop checking the playback
+        """
+        self._active = False
+        self._timer.stop()
+        if self._request is not None:
+            self._request.cancel()
+
+    def refresh(self, delay_ms=0):
+        """
+        Check the playback in `delay_ms` milliseconds, e.g. after the user
+        changed it
+        """
+        if not self._active:
+            return
+        self._schedule.reset()
+        self._timer.start(delay_ms)
+
+    def poll(self):
+        """
+        Check the playback now
+        """
+        # an older check could return a state that is out of date
+        if self._request is not None:
+            self._request.cancel()
+        self._request = self._spotify_worker.call('current_playback')
+        self._request.finished.connect(self.onPlayback)
+        self._request.failed.connect(self.onFailed)
+
+    def onPlayback(self, cpb):
+        """
+        Called when the playback state arrived
+        """
+        self._playback = cpb
+        self._updated = time.monotonic()
+        if self._active:
+            self._timer.start(self._schedule.next_delay(cpb))
+        self.playbackUpdated.emit(cpb)
+
+    def onFailed(self, error):
+        """
+        Called when the check failed
+        """
+        if self._active:
+            self._timer.start(self._schedule.backoff())
+        self.failed.emit(error)
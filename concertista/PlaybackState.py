@@ -0,0 +1,115 @@
+"""
+PlaybackState.py
+"""
+
+from PyQt5 import QtCore
+
+
+class PlaybackState(QtCore.QObject):
+    """
+    Local model of the Spotify playback, so the GUI can tell what is playing
+    without asking Spotify. It is updated from playback snapshots and
+    optimistically from commands we send. While a command is in flight,
+    snapshots are kept but do not override the change the command makes,
+    since they may have been taken before Spotify applied it.
+    """
+
+    # emitted when any of the fields changed
+    changed = QtCore.pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._fields = {
+            'is_playing': False,
+            'device_id': None,
+            'item': None
+        }
+        # optimistic changes that were not confirmed yet
+        self._changes = []
+        self._snapshot = None
+
+    def isPlaying(self):
+        """
+        Check if a track is playing
+        """
+        return self._fields['is_playing']
+
+    def deviceId(self):
+        """
+        ID of the device that plays
+        """
+        return self._fields['device_id']
+
+    def item(self):
+        """
+        Track that is playing (as in `current_playback()['item']`)
+        """
+        return self._fields['item']
+
+    def hasPendingChanges(self):
+        """
+        Check if there are changes Spotify did not confirm yet
+        """
+        return len(self._changes) > 0
+
+    def update(self, cpb):
+        """
+        Update the state from a snapshot (as returned by
+        `spotify.current_playback`)
+        """
+        self._snapshot = cpb
+        if cpb is None:
+            fields = {'is_playing': False, 'item': None}
+        else:
+            fields = {
+                'is_playing': cpb.get('is_playing') is True,
+                'item': cpb.get('item')
+            }
+            device = cpb.get('device')
+            if device is not None:
+                fields['device_id'] = device.get('id')
+        # changes in flight win over the snapshot
+        for change in self._changes:
+            for key in change:
+                fields.pop(key, None)
+        self._set(fields)
+
+    def apply(self, **fields):
+        """
+        Change the state before Spotify confirms it. Returns the change, to
+        be passed to `confirm` or `revert` once the command is done.
+        """
+        change = dict(fields)
+        self._changes.append(change)
+        self._set(fields)
+        return change
+
+    def confirm(self, change):
+        """
+        Spotify accepted the command that made `change`
+        """
+        self._forget(change)
+
+    def revert(self, change):
+        """
+        The command that made `change` failed, go back to the latest
+        snapshot
+        """
+        if self._forget(change):
+            self.update(self._snapshot)
+
+    def _forget(self, change):
+        for i, c in enumerate(self._changes):
+            if c is change:
+                del self._changes[i]
+                return True
+        return False
+
+    def _set(self, fields):
+        modified = False
+        for key, value in fields.items():
+            if self._fields[key] != value:
+                self._fields[key] = value
+                modified = True
+        if modified:
+            self.changed.emit()
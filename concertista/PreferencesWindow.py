@@ -3,6 +3,8 @@ PreferencesWindow.py
 """
 
 from PyQt5 import QtWidgets, QtCore, QtGui
+from concertista import history
+from concertista import weights
 
 
 class TreeProxyFilter(QtCore.QSortFilterProxyModel):
@@ -35,12 +37,23 @@ class PreferencesWindow(QtWidgets.QDialog):
     MUSIC_LIBRARY_ENTIRE = 0
     MUSIC_LIBRARY_PORTION = 1
 
+    STATION_HOURS_DEFAULT = 8
+    STATION_HOURS_MAX = 48
+
+    REPEAT_HORIZON_MAX = 100000
+
+    # column of the library tree with weights of composers
+    WEIGHT_COLUMN = 1
+    WEIGHT_MAX = 100.0
+
     def __init__(self, db, parent=None):
         super().__init__(parent)
         self._db = db
         self.window_action = None
         # IDs of user selected pieces
         self.user_selection = {}
+        # composer id -> weight, only for weights other than 1
+        self.composer_weights = {}
         self.setMinimumWidth(500)
         self.setWindowTitle("Preferences")
         self.setWindowFlags(
@@ -58,22 +71,24 @@ class PreferencesWindow(QtWidgets.QDialog):
 
     def buildLibraryModel(self):
         composers = self._db.get_composers()
-        pieces = self._db.get_pieces()
 
-        self._library_model = QtGui.QStandardItemModel()
+        self._library_model = QtGui.QStandardItemModel(
+            0, self.WEIGHT_COLUMN + 1)
+        # composer id -> item, piece id -> item
+        self._composer_items = {}
+        self._piece_items = {}
+        # composer id -> item with its weight
+        self._weight_items = {}
+        # IDs of composers whose pieces were not loaded yet
+        self._unfetched_composers = set()
         for cid, composer in composers.items():
-            ci = QtGui.QStandardItem(composer['name'])
-            ci.setData(composer['id'])
-            ci.setCheckable(True)
-            self._library_model.appendRow(ci)
-
-            comp_piece_ids = self._db.get_composer_pieces(cid)
-            for pid in comp_piece_ids:
-                piece = pieces[pid]
-                pi = QtGui.QStandardItem(piece['name'])
-                pi.setData(piece['id'])
-                pi.setCheckable(True)
-                ci.appendRow(pi)
+            ci = self._appendComposerItem(composer)
+            if self._db.is_composer_loaded(cid):
+                self._appendComposerPieces(ci)
+            else:
+                # pieces will be added when the composer is expanded
+                ci.appendRow(QtGui.QStandardItem(""))
+                self._unfetched_composers.add(cid)
 
         self._sort_library_model = TreeProxyFilter()
         self._sort_library_model.setSourceModel(self._library_model)
@@ -81,6 +96,83 @@ class PreferencesWindow(QtWidgets.QDialog):
             QtCore.Qt.CaseInsensitive)
         self._sort_library_model.setFilterKeyColumn(0)
 
+    def _appendComposerItem(self, composer):
+        ci = QtGui.QStandardItem(composer['name'])
+        ci.setData(composer['id'])
+        ci.setCheckable(True)
+        wi = QtGui.QStandardItem()
+        wi.setData(
+            self.composer_weights.get(composer['id'], 1.0),
+            QtCore.Qt.EditRole)
+        wi.setToolTip("How often pieces of the composer are played")
+        self._library_model.appendRow([ci, wi])
+        self._composer_items[composer['id']] = ci
+        self._weight_items[composer['id']] = wi
+        return ci
+
+    def _appendPieceItem(self, composer_item, piece):
+        pi = QtGui.QStandardItem(piece['name'])
+        pi.setData(piece['id'])
+        pi.setCheckable(True)
+        composer_item.appendRow(pi)
+        self._piece_items[piece['id']] = pi
+        return pi
+
+    def _appendComposerPieces(self, composer_item):
+        for pid in self._db.get_composer_pieces(composer_item.data()):
+            pi = self._appendPieceItem(composer_item, self._db.get_piece(pid))
+            if pid in self.user_selection:
+                pi.setCheckState(QtCore.Qt.Checked)
+
+    def fetchComposerPieces(self, composer_item):
+        """
+        Replace the placeholder of a composer item with its pieces
+        """
+        if composer_item.data() in self._unfetched_composers:
+            self._unfetched_composers.remove(composer_item.data())
+            composer_item.removeRows(0, composer_item.rowCount())
+            self._appendComposerPieces(composer_item)
+
+    def _composerItem(self, composer_id):
+        if composer_id in self._composer_items:
+            return self._composer_items[composer_id]
+        else:
+            composer = self._db.get_composers()[composer_id]
+            return self._appendComposerItem(composer)
+
+    def onCatalogChanged(self, added, changed, removed):
+        """
+        Called when pieces in the catalog were added, changed or removed.
+        Patches the library model in place.
+        """
+        for pid in removed:
+            self.user_selection.pop(pid, None)
+            pi = self._piece_items.pop(pid, None)
+            if pi is not None:
+                pi.parent().removeRow(pi.row())
+
+        for pid in changed:
+            pi = self._piece_items.get(pid)
+            if pi is None:
+                continue
+            piece = self._db.get_piece(pid)
+            pi.setText(piece['name'])
+            ci = self._composerItem(piece['composer_id'])
+            if pi.parent() is not ci:
+                check_state = pi.checkState()
+                row = pi.parent().takeRow(pi.row())
+                if ci.data() in self._unfetched_composers:
+                    del self._piece_items[pid]
+                else:
+                    ci.appendRow(row)
+                    pi.setCheckState(check_state)
+
+        for pid in added:
+            piece = self._db.get_piece(pid)
+            ci = self._composerItem(piece['composer_id'])
+            if ci.data() not in self._unfetched_composers:
+                self._appendPieceItem(ci, piece)
+
     def setupFonts(self):
         """
         Setup fonts for the window
@@ -147,13 +239,62 @@ class PreferencesWindow(QtWidgets.QDialog):
         self.library_tree.setModel(self._sort_library_model)
         self.library_tree.setSortingEnabled(True)
         self.library_tree.sortByColumn(0, QtCore.Qt.AscendingOrder)
+        header = self.library_tree.header()
+        header.setStretchLastSection(False)
+        header.setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        header.setSectionResizeMode(
+            self.WEIGHT_COLUMN, QtWidgets.QHeaderView.ResizeToContents)
         tree_layout.addWidget(self.library_tree)
 
         ctrl_layout.addLayout(tree_layout)
 
+        ctrl_layout.addSpacing(8)
+
+        hlayout = QtWidgets.QHBoxLayout()
+        text = QtWidgets.QLabel("Station length")
+        self.station_hours = QtWidgets.QSpinBox(self)
+        self.station_hours.setRange(1, self.STATION_HOURS_MAX)
+        self.station_hours.setSuffix(" hours")
+        self.station_hours.valueChanged.connect(self.updateWidgets)
+        hlayout.addWidget(text)
+        hlayout.addStretch()
+        hlayout.addWidget(self.station_hours)
+        ctrl_layout.addLayout(hlayout)
+
+        hlayout = QtWidgets.QHBoxLayout()
+        text = QtWidgets.QLabel("Do not repeat the last")
+        self.repeat_horizon = QtWidgets.QSpinBox(self)
+        self.repeat_horizon.setRange(0, self.REPEAT_HORIZON_MAX)
+        self.repeat_horizon.setSingleStep(10)
+        self.repeat_horizon.setSuffix(" pieces")
+        self.repeat_horizon.valueChanged.connect(self.updateWidgets)
+        hlayout.addWidget(text)
+        hlayout.addStretch()
+        hlayout.addWidget(self.repeat_horizon)
+        ctrl_layout.addLayout(hlayout)
+
+        hlayout = QtWidgets.QHBoxLayout()
+        text = QtWidgets.QLabel("Pick pieces")
+        self.station_sampling = QtWidgets.QComboBox(self)
+        self.station_sampling.addItem("Equally", weights.UNIFORM)
+        self.station_sampling.addItem("By number of tracks", weights.TRACKS)
+        self.station_sampling.addItem("By duration", weights.DURATION)
+        self.station_sampling.currentIndexChanged.connect(self.updateWidgets)
+        hlayout.addWidget(text)
+        hlayout.addStretch()
+        hlayout.addWidget(self.station_sampling)
+        ctrl_layout.addLayout(hlayout)
+
+        hint = QtWidgets.QLabel(
+            "Pieces of a composer are picked in proportion to the weight "
+            "next to the composer")
+        hint.setFont(self._hint_font)
+        ctrl_layout.addWidget(hint)
+
         self._vlayout.addLayout(ctrl_layout)
 
         self.search_library.textChanged.connect(self.onSearchLibraryChanged)
+        self.library_tree.expanded.connect(self.onLibraryTreeExpanded)
         self._library_model.itemChanged.connect(self.onLibraryModelItemChanged)
 
     def setupAdvanced(self):
@@ -182,6 +323,40 @@ class PreferencesWindow(QtWidgets.QDialog):
         ctrl_layout.addLayout(hlayout)
         ctrl_layout.addWidget(hint)
 
+        ctrl_layout.addSpacing(8)
+
+        hlayout = QtWidgets.QHBoxLayout()
+        text = QtWidgets.QLabel("Endless stations")
+        self.endless_station = QtWidgets.QCheckBox()
+        self.endless_station.clicked.connect(self.updateWidgets)
+        hlayout.addWidget(text)
+        hlayout.addStretch()
+        hlayout.addWidget(self.endless_station)
+
+        hint = QtWidgets.QLabel(
+            "Keep adding tracks to the queue while the station is playing")
+        hint.setFont(self._hint_font)
+
+        ctrl_layout.addLayout(hlayout)
+        ctrl_layout.addWidget(hint)
+
+        ctrl_layout.addSpacing(8)
+
+        hlayout = QtWidgets.QHBoxLayout()
+        text = QtWidgets.QLabel("Watch music library for changes")
+        self.watch_library = QtWidgets.QCheckBox()
+        self.watch_library.clicked.connect(self.updateWidgets)
+        hlayout.addWidget(text)
+        hlayout.addStretch()
+        hlayout.addWidget(self.watch_library)
+
+        hint = QtWidgets.QLabel(
+            "Reload pieces when their files are modified on disk")
+        hint.setFont(self._hint_font)
+
+        ctrl_layout.addLayout(hlayout)
+        ctrl_layout.addWidget(hint)
+
         self._vlayout.addLayout(ctrl_layout)
 
     def updateWidgets(self):
@@ -219,9 +394,12 @@ class PreferencesWindow(QtWidgets.QDialog):
         """
         Called when item in the library tree was modified
         """
-        if item.hasChildren():
+        if item.column() == self.WEIGHT_COLUMN:
+            self.onComposerWeightChanged(item)
+        elif item.hasChildren():
             checkState = item.checkState()
             if checkState != QtCore.Qt.PartiallyChecked:
+                self.fetchComposerPieces(item)
                 for i in range(item.rowCount()):
                     item.child(i).setCheckState(checkState)
         else:
@@ -240,7 +418,28 @@ class PreferencesWindow(QtWidgets.QDialog):
             if item.checkState() == QtCore.Qt.Checked:
                 self.user_selection[item.data()] = True
             else:
-                del self.user_selection[item.data()]
+                self.user_selection.pop(item.data(), None)
+
+    def onComposerWeightChanged(self, item):
+        """
+        Called when weight of a composer was modified
+        """
+        composer_id = self._library_model.item(item.row(), 0).data()
+        weight = min(max(float(item.data(QtCore.Qt.EditRole)), 0.0),
+                     self.WEIGHT_MAX)
+        if weight == 1.0:
+            self.composer_weights.pop(composer_id, None)
+        else:
+            self.composer_weights[composer_id] = weight
+        self.updateWidgets()
+
+    def onLibraryTreeExpanded(self, index):
+        """
+        Called when an item in the library tree was expanded
+        """
+        src_index = self._sort_library_model.mapToSource(index)
+        item = self._library_model.itemFromIndex(src_index)
+        self.fetchComposerPieces(item)
 
     def onSearchLibraryChanged(self, text):
         """
@@ -265,11 +464,21 @@ class PreferencesWindow(QtWidgets.QDialog):
             "library_portion", self.music_library.checkedId())
         self._settings.setValue(
             "user_selection", list(self.user_selection.keys()))
+        self._settings.setValue("station_hours", self.station_hours.value())
+        self._settings.setValue(
+            "repeat_horizon", self.repeat_horizon.value())
+        self._settings.setValue(
+            "station_sampling", self.station_sampling.currentData())
+        self._settings.setValue("composer_weights", self.composer_weights)
         self._settings.endGroup()
 
         self._settings.beginGroup("Preferences/Advanced")
         self._settings.setValue(
             "show_develop_menu", self.show_developer.isChecked())
+        self._settings.setValue(
+            "endless_station", self.endless_station.isChecked())
+        self._settings.setValue(
+            "watch_library", self.watch_library.isChecked())
         self._settings.endGroup()
 
     def readSettings(self):
@@ -286,7 +495,7 @@ class PreferencesWindow(QtWidgets.QDialog):
 
         self._settings.beginGroup("Preferences/Music")
         portion = self._settings.value(
-            "library_portion", self.MUSIC_LIBRARY_ENTIRE)
+            "library_portion", self.MUSIC_LIBRARY_ENTIRE, type=int)
         self.music_library.button(portion).setChecked(True)
 
         piece_ids = self._settings.value("user_selection", [])
@@ -301,9 +510,29 @@ class PreferencesWindow(QtWidgets.QDialog):
             if len(idxs) > 0:
                 si = self._library_model.itemFromIndex(idxs[0])
                 si.setCheckState(QtCore.Qt.Checked)
+            elif self._db.lazy:
+                # piece will be checked when its composer is fetched
+                self.user_selection[pid] = True
+        self.station_hours.setValue(self._settings.value(
+            "station_hours", self.STATION_HOURS_DEFAULT, type=int))
+        self.repeat_horizon.setValue(self._settings.value(
+            "repeat_horizon", history.HORIZON, type=int))
+        index = self.station_sampling.findData(
+            self._settings.value("station_sampling", weights.UNIFORM))
+        if index != -1:
+            self.station_sampling.setCurrentIndex(index)
+        composer_weights = self._settings.value("composer_weights") or {}
+        for cid, weight in composer_weights.items():
+            if cid in self._weight_items:
+                self._weight_items[cid].setData(
+                    float(weight), QtCore.Qt.EditRole)
         self._settings.endGroup()
 
         self._settings.beginGroup("Preferences/Advanced")
         self.show_developer.setChecked(
             self._settings.value("show_develop_menu", False, type=bool))
+        self.endless_station.setChecked(
+            self._settings.value("endless_station", False, type=bool))
+        self.watch_library.setChecked(
+            self._settings.value("watch_library", False, type=bool))
         self._settings.endGroup()
@@ -0,0 +1,58 @@
+"""
+SQLiteCompleterModel.py
+"""
+
+import re
+from concertista.CompleterModel import CompleterModel
+
+
+class SQLiteCompleterModel(CompleterModel):
+    """
+    Completer model for `SQLiteDB`. Items are looked up by their text in the
+    database, so no text index is kept in memory.
+    """
+
+    def __init__(self, conn, has_search, composers, pieces, parent=None):
+        """
+        @param conn Connection to the database
+        @param has_search `True` if the database has the full text index
+        """
+        super().__init__(composers, pieces, parent)
+        self._conn = conn
+        self._has_search = has_search
+
+    def lookup(self, text):
+        """
+        Find the item whose text is exactly `text`. Returns {"type", "id"} or
+        `None` if there is no such item or the text is not unique.
+        """
+        found = [("composer", row[0]) for row in self._conn.execute(
+            "SELECT id FROM composers WHERE name = ? LIMIT 2", (text, ))]
+
+        words = re.findall(r'\w+', text)
+        if self._has_search and len(words) > 0:
+            # the full text index narrows down the pieces to compare
+            query = " ".join('"{}"'.format(w) for w in words)
+            rows = self._conn.execute(
+                "SELECT pieces.id FROM search "
+                "JOIN pieces ON pieces.rowid = search.rowid "
+                "JOIN composers ON composers.id = pieces.composer_id "
+                "WHERE search MATCH ? "
+                "AND pieces.name || ': ' || composers.name = ? LIMIT 2",
+                (query, text))
+        else:
+            rows = self._conn.execute(
+                "SELECT pieces.id FROM pieces "
+                "JOIN composers ON composers.id = pieces.composer_id "
+                "WHERE pieces.name || ': ' || composers.name = ? LIMIT 2",
+                (text, ))
+        found.extend(("piece", row[0]) for row in rows)
+
+        if len(found) == 1:
+            return {"type": found[0][0], "id": found[0][1]}
+        return None
+
+    def buildTextIndex(self):
+        """
+        There is no text index, `lookup` queries the database
+        """
@@ -0,0 +1,362 @@
+"""
+SQLiteDB.py
+"""
+
+import os
+import re
+import sqlite3
+from collections import abc
+from concertista import ingest
+from concertista import search
+from concertista.DB import DB
+from concertista.records import Composer, Piece
+
+SCHEMA = """
+CREATE TABLE composers (
+    id UNIQUE NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE pieces (
+    id UNIQUE NOT NULL,
+    composer_id NOT NULL,
+    album_id,
+    name TEXT NOT NULL
+);
+CREATE INDEX pieces_composer_id ON pieces (composer_id);
+CREATE TABLE tracks (
+    piece_rowid INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    track_id NOT NULL,
+    PRIMARY KEY (piece_rowid, position)
+) WITHOUT ROWID;
+CREATE TABLE files (
+    name TEXT PRIMARY KEY,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    piece_id NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value
+) WITHOUT ROWID;
+"""
+
+# Full text index over composer and piece names. Pieces are stored under their
+# rowid, composers under their negated rowid, so composers sort first.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE search USING fts5(
+    name, composer, tokenize = 'unicode61 remove_diacritics 2')
+"""
+
+
+class SQLiteDB(DB):
+    """
+    Database with the music stored in SQLite. Pieces are not kept in memory,
+    they are read from the database when requested.
+    """
+
+    # Bump this when the schema changes
+    SCHEMA_VERSION = 1
+
+    def __init__(self, cache_dir=None):
+        super().__init__(cache_dir)
+        self._conn = None
+        self._has_search = False
+        # spelling correction over the words in the search table, built on
+        # first fuzzy search
+        self._speller = None
+
+    def load(self):
+        """
+        Open the database and import changes from the YAML tree
+        """
+        self._open()
+        self.import_yaml()
+
+        self._composers = {}
+        for id, name in self._conn.execute(
+                "SELECT id, name FROM composers ORDER BY rowid"):
+            self._composers[id] = Composer(id, name)
+        self._pieces = _PieceTable(self._conn)
+
+    def get_composer_pieces(self, composer_id):
+        return [row[0] for row in self._conn.execute(
+            "SELECT id FROM pieces WHERE composer_id = ? ORDER BY rowid",
+            (composer_id, ))]
+
+    def prepare_search(self):
+        """
+        The search tables are kept in the database, so there is nothing to
+        build in advance
+        """
+
+    def search(self, text, limit=50):
+        """
+        Search for composers and pieces by name. Returns a list of
+        {"type", "id"} with composers first.
+        """
+        tokens = text.split()
+        if len(tokens) == 0:
+            return []
+
+        if self._has_search:
+            query = " ".join(
+                '"{}"*'.format(t.replace('"', '""')) for t in tokens)
+            return self._match(query, limit)
+        else:
+            pattern = "%{}%".format(text)
+            return self._results(self._conn.execute(
+                "SELECT id, NULL FROM composers WHERE name LIKE ? "
+                "UNION ALL "
+                "SELECT NULL, id FROM pieces WHERE name LIKE ? "
+                "LIMIT ?",
+                (pattern, pattern, limit)))
+
+    def fuzzy_search(self, text, limit=50):
+        """
+        Search for composers and pieces tolerating typos in their names. Every
+        word is replaced by the closest words in the search table.
+        """
+        if not self._has_search:
+            return []
+        if self._speller is None:
+            self._speller = search.Speller()
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS temp.search_vocab "
+                "USING fts5vocab(main, search, row)")
+            for row in self._conn.execute("SELECT term FROM search_vocab"):
+                self._speller.add(row[0])
+
+        groups = []
+        for word in re.findall(r'\w+', search.fold(text)):
+            close = self._speller.lookup(word)
+            if len(close) == 0:
+                return []
+            groups.append("({})".format(" OR ".join(
+                '"{}"'.format(w) for dist, w in close if dist == close[0][0])))
+        if len(groups) == 0:
+            return []
+        return self._match(" AND ".join(groups), limit)
+
+    def _build_completer_model(self):
+        from concertista.SQLiteCompleterModel import SQLiteCompleterModel
+        self._completer_model = SQLiteCompleterModel(
+            self._conn, self._has_search, self._composers, self._pieces)
+
+    def _match(self, query, limit):
+        return self._results(self._conn.execute(
+            "SELECT composers.id, pieces.id FROM search "
+            "LEFT JOIN composers ON composers.rowid = -search.rowid "
+            "LEFT JOIN pieces ON pieces.rowid = search.rowid "
+            "WHERE search MATCH ? "
+            "ORDER BY search.rowid >= 0, rank LIMIT ?",
+            (query, limit)))
+
+    def _results(self, rows):
+        results = []
+        for composer_id, piece_id in rows:
+            if composer_id is not None:
+                results.append({"type": "composer", "id": composer_id})
+            else:
+                results.append({"type": "piece", "id": piece_id})
+        return results
+
+    def update_files(self, file_names):
+        """
+        Re-import piece files that were added, modified or deleted and patch
+        the completer model in place. Returns lists of added, changed and
+        removed piece IDs.
+        """
+        with self._conn:
+            added, changed, removed = self._import_files(file_names)
+        self._speller = None
+        self._update_indexes(added, changed, removed)
+        return added, changed, removed
+
+    def import_yaml(self):
+        """
+        Import the YAML tree into the database. Only files that changed since
+        the last import are parsed.
+        """
+        with self._conn:
+            self._import_composers()
+
+            known = {}
+            for name, mtime, size in self._conn.execute(
+                    "SELECT name, mtime, size FROM files"):
+                known[name] = (mtime, size)
+
+            tracks_dir = self.get_tracks_dir()
+            file_names = []
+            for fn in ingest.piece_files(tracks_dir):
+                rel = os.path.relpath(fn, tracks_dir)
+                st = os.stat(fn)
+                if known.pop(rel, None) != (st.st_mtime_ns, st.st_size):
+                    file_names.append(fn)
+            for rel in known:
+                file_names.append(os.path.join(tracks_dir, rel))
+
+            self._import_files(file_names)
+
+    def _open(self):
+        if self._cache_dir is None:
+            fn = ':memory:'
+        else:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            fn = self._cache_file_name('.sqlite')
+        self._conn = sqlite3.connect(fn)
+
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            with self._conn:
+                for name in ['composers', 'pieces', 'tracks', 'files', 'meta',
+                             'search']:
+                    self._conn.execute("DROP TABLE IF EXISTS " + name)
+                self._conn.executescript(SCHEMA)
+                try:
+                    self._conn.execute(SEARCH_SCHEMA)
+                except sqlite3.OperationalError:
+                    print("SQLite does not support FTS5, search will be slow")
+                self._conn.execute(
+                    "PRAGMA user_version = {}".format(self.SCHEMA_VERSION))
+
+        self._has_search = self._conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'search'"
+        ).fetchone()[0] > 0
+
+    def _import_composers(self):
+        fn = self._composers_file_name()
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'composers_hash'").fetchone()
+        sig = ingest.file_signature(fn)
+        if row is not None and row[0] == sig[2]:
+            return
+
+        with open(fn, 'rb') as f:
+            composers = ingest.load_yaml(f.read().decode('utf-8'))
+        self._conn.execute("DELETE FROM composers")
+        for c in composers or []:
+            self._conn.execute(
+                "INSERT INTO composers (id, name) VALUES (?, ?)",
+                (c['id'], c['name']))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) "
+            "VALUES ('composers_hash', ?)", (sig[2], ))
+
+        if self._has_search:
+            self._conn.execute("DELETE FROM search")
+            self._conn.execute(
+                "INSERT INTO search (rowid, name, composer) "
+                "SELECT -rowid, name, '' FROM composers")
+            self._conn.execute(
+                "INSERT INTO search (rowid, name, composer) "
+                "SELECT pieces.rowid, pieces.name, composers.name "
+                "FROM pieces LEFT JOIN composers "
+                "ON composers.id = pieces.composer_id")
+
+    def _import_files(self, file_names):
+        """
+        Import piece files into the database. Returns lists of added, changed
+        and removed piece IDs.
+        """
+        tracks_dir = self.get_tracks_dir()
+        old_ids = {}
+        to_read = []
+        for fn in file_names:
+            rel = os.path.relpath(fn, tracks_dir)
+            row = self._conn.execute(
+                "SELECT mtime, size, hash, piece_id FROM files "
+                "WHERE name = ?", (rel, )).fetchone()
+            if os.path.isfile(fn):
+                if row is not None:
+                    sig = ingest.file_signature(fn, tuple(row[:3]))
+                    if sig[2] == row[2]:
+                        self._conn.execute(
+                            "UPDATE files SET mtime = ?, size = ? "
+                            "WHERE name = ?", (sig[0], sig[1], rel))
+                        continue
+                to_read.append(fn)
+            if row is not None:
+                old_ids[row[3]] = True
+                self._delete_piece(rel, row[3])
+
+        new_ids = {}
+        for fn, sig, piece in ingest.read_pieces(to_read, self.workers):
+            if piece is None:
+                print("Error loading file:", os.path.basename(fn))
+                continue
+            try:
+                self._insert_piece(os.path.relpath(fn, tracks_dir), sig, piece)
+                new_ids[piece['id']] = True
+            except sqlite3.IntegrityError:
+                print("Duplicate piece ID in file:", os.path.basename(fn))
+
+        added = [id for id in new_ids if id not in old_ids]
+        changed = [id for id in new_ids if id in old_ids]
+        removed = [id for id in old_ids if id not in new_ids]
+        return added, changed, removed
+
+    def _insert_piece(self, rel, sig, piece):
+        cursor = self._conn.execute(
+            "INSERT INTO pieces (id, composer_id, album_id, name) "
+            "VALUES (?, ?, ?, ?)",
+            (piece['id'], piece['composer_id'], piece.get('album_id'),
+             piece['name']))
+        rowid = cursor.lastrowid
+        self._conn.executemany(
+            "INSERT INTO tracks (piece_rowid, position, track_id) "
+            "VALUES (?, ?, ?)",
+            [(rowid, i, t) for i, t in enumerate(piece['tracks'])])
+        self._conn.execute(
+            "INSERT INTO files (name, mtime, size, hash, piece_id) "
+            "VALUES (?, ?, ?, ?, ?)", (rel, ) + sig + (piece['id'], ))
+        if self._has_search:
+            self._conn.execute(
+                "INSERT INTO search (rowid, name, composer) "
+                "VALUES (?, ?, "
+                "(SELECT name FROM composers WHERE id = ?))",
+                (rowid, piece['name'], piece['composer_id']))
+
+    def _delete_piece(self, rel, piece_id):
+        self._conn.execute("DELETE FROM files WHERE name = ?", (rel, ))
+        row = self._conn.execute(
+            "SELECT rowid FROM pieces WHERE id = ?", (piece_id, )).fetchone()
+        if row is None:
+            return
+        self._conn.execute("DELETE FROM pieces WHERE rowid = ?", row)
+        self._conn.execute("DELETE FROM tracks WHERE piece_rowid = ?", row)
+        if self._has_search:
+            self._conn.execute("DELETE FROM search WHERE rowid = ?", row)
+
+
+class _PieceTable(abc.Mapping):
+    """
+    Read-only mapping of piece IDs to pieces stored in the database
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getitem__(self, id):
+        row = self._conn.execute(
+            "SELECT rowid, composer_id, album_id, name FROM pieces "
+            "WHERE id = ?", (id, )).fetchone()
+        if row is None:
+            raise KeyError(id)
+
+        tracks = [r[0] for r in self._conn.execute(
+            "SELECT track_id FROM tracks WHERE piece_rowid = ? "
+            "ORDER BY position", (row[0], ))]
+        return Piece(id, row[1], row[3], row[2], tracks)
+
+    def __contains__(self, id):
+        return self._conn.execute(
+            "SELECT 1 FROM pieces WHERE id = ?", (id, )).fetchone() is not None
+
+    def __iter__(self):
+        for row in self._conn.execute("SELECT id FROM pieces ORDER BY rowid"):
+            yield row[0]
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM pieces").fetchone()[0]
@@ -0,0 +1,52 @@
+"""
+SearchResultsModel.py
+"""
+
+from PyQt5 import QtCore
+from concertista.assets import Assets
+from concertista.CompleterModel import CompleterModel
+
+
+class SearchResultsModel(QtCore.QAbstractListModel):
+    """
+    Results of a search shown in the completer popup. The texts come from the
+    completer model of the database.
+    """
+
+    ItemRole = CompleterModel.ItemRole
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self._db = db
+        # list of {"type", "id"}
+        self._results = []
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._results)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        item = self._results[index.row()]
+        if role == QtCore.Qt.DisplayRole or role == QtCore.Qt.EditRole:
+            return self._db.get_completer_model().text(
+                item['type'], item['id'])
+        elif role == QtCore.Qt.DecorationRole:
+            if item['type'] == "composer":
+                return Assets().author_icon
+            else:
+                return Assets().piece_icon
+        elif role == self.ItemRole:
+            return item
+        return None
+
+    def setResults(self, results):
+        """
+        Replace the results
+        """
+        self.beginResetModel()
+        self._results = results
+        self.endResetModel()
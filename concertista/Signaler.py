@@ -0,0 +1,20 @@
+"""
+Signaler.py
+"""
+
+from PyQt5 import QtCore
+
+
+class Signaler(QtCore.QObject):
+    """
+    Signaler class to communicate with Qt
+    """
+
+    connectToSpotify = QtCore.pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__()
+        pass
+
+
+signaler = Signaler()
@@ -0,0 +1,229 @@
+"""
+SpotifyWorker.py
+"""
+
+from PyQt5 import QtCore
+from concertista import tracing
+
+
+class SpotifyRequest(QtCore.QObject):
+    """
+    Spotify call running in the background. Exactly one of `finished` and
+    `failed` is emitted in the GUI thread, unless the request is cancelled.
+    """
+
+    # result of the call
+    finished = QtCore.pyqtSignal(object)
+    # exception raised by the call, `TimeoutError` if it took too long
+    failed = QtCore.pyqtSignal(object)
+
+    # emitted from the pool thread when the call returns
+    _done = QtCore.pyqtSignal(object, object)
+
+    def __init__(self, name, worker):
+        # no parent, so the request is freed once nobody refers to it
+        super().__init__()
+        self.name = name
+        self._worker = worker
+        self._runnable = None
+        self._pending = True
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.onTimeout)
+        self._done.connect(self.onDone)
+
+    def isPending(self):
+        """
+        Check if the result was not delivered yet
+        """
+        return self._pending
+
+    def setTimeout(self, msecs):
+        """
+        Fail the request if it does not finish within `msecs` milliseconds
+        from now. `None` disables the timeout.
+        """
+        if msecs is None:
+            self._timer.stop()
+        else:
+            self._timer.start(msecs)
+
+    def cancel(self):
+        """
+        Cancel the request. A call that did not start yet is not run, the
+        result of a running call is dropped.
+        """
+        if not self._pending:
+            return
+        self._pending = False
+        self._timer.stop()
+        if self._worker.tryTake(self):
+            self._worker.removeRequest(self)
+
+    def onTimeout(self):
+        """
+        Called when the request did not finish in time
+        """
+        if self._pending:
+            self._pending = False
+            self.failed.emit(TimeoutError(
+                "Spotify request '{}' timed out".format(self.name)))
+
+    def onDone(self, result, error):
+        """
+        Called in the GUI thread when the call returned
+        """
+        self._worker.removeRequest(self)
+        if not self._pending:
+            return
+        self._pending = False
+        self._timer.stop()
+        if error is None:
+            self.finished.emit(result)
+        else:
+            self.failed.emit(error)
+
+
+class _Runnable(QtCore.QRunnable):
+
+    def __init__(self, request, func, spotify, args, kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self._request = request
+        self._func = func
+        self._spotify = spotify
+        self._args = args
+        self._kwargs = kwargs
+
+    def run(self):
+        result = None
+        error = None
+        try:
+            with tracing.span(self._request.name, 'spotify'):
+                result = self._func(self._spotify, *self._args, **self._kwargs)
+        except Exception as e:
+            error = e
+        self._request._done.emit(result, error)
+
+
+class SpotifyWorker(QtCore.QObject):
+    """
+    Runs Spotify calls in a thread pool, so the GUI never waits for the
+    network. Results are delivered through the signals of `SpotifyRequest`.
+    """
+
+    # default timeout of a request in milliseconds
+    TIMEOUT_MS = 10000
+    # number of calls that can run at the same time
+    MAX_THREADS = 4
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._spotify = None
+        self._requests = set()
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(self.MAX_THREADS)
+
+    def spotify(self):
+        """
+        Spotify object the calls are made on
+        """
+        return self._spotify
+
+    def setSpotify(self, spotify):
+        """
+        Set the Spotify object the calls are made on
+        """
+        self._spotify = spotify
+
+    def call(self, method, *args, **kwargs):
+        """
+        Call `spotify.<method>(*args, **kwargs)` in the background
+        """
+        def func(spotify, *args, **kwargs):
+            return getattr(spotify, method)(*args, **kwargs)
+        return self._start("spotify." + method, func, args, kwargs)
+
+    def run(self, func, *args, **kwargs):
+        """
+        Call `func(spotify, *args, **kwargs)` in the background
+        """
+        name = getattr(func, '__qualname__', 'spotify')
+        return self._start(name, func, args, kwargs)
+
+    def _start(self, name, func, args, kwargs):
+        request = SpotifyRequest(name, self)
+        request._runnable = _Runnable(
+            request, func, self._spotify, args, kwargs)
+        request.setTimeout(self.TIMEOUT_MS)
+        self._requests.add(request)
+        self._pool.start(request._runnable)
+        return request
+
+    def tryTake(self, request):
+        """
+        Remove a request that did not start yet from the queue, returns
+        `True` on success
+        """
+        return self._pool.tryTake(request._runnable)
+
+    def removeRequest(self, request):
+        """
+        Forget a request that is done
+        """
+        self._requests.discard(request)
+
+    def pendingRequests(self):
+        """
+        Requests whose calls did not return yet
+        """
+        return list(self._requests)
+
+    def cancelAll(self):
+        """
+        Cancel all requests
+        """
+        for request in list(self._requests):
+            request.cancel()
+
+    def waitForDone(self, msecs=-1):
+        """
+        Wait until running calls return, returns `False` on timeout
+        """
+        return self._pool.waitForDone(msecs)
+
+
+class SpotifyCallsMixin:
+    """
+    Spotify calls made by a window. Pending requests are kept in named
+    groups, so a new search cancels only the requests it supersedes.
+    Expects `_spotify_worker`, `_requests = {}` and a status bar.
+    """
+
+    def spotifyCall(self, group, method, *args, **kwargs):
+        """
+        Call a Spotify method in the background as part of `group`
+        """
+        request = self._spotify_worker.call(method, *args, **kwargs)
+        request.failed.connect(self.onSpotifyError)
+        pending = [r for r in self._requests.get(group, []) if r.isPending()]
+        pending.append(request)
+        self._requests[group] = pending
+        return request
+
+    def cancelRequests(self, *groups):
+        """
+        Cancel pending requests of `groups`, or of all groups if none are
+        given
+        """
+        if len(groups) == 0:
+            groups = list(self._requests)
+        for group in groups:
+            for request in self._requests.pop(group, []):
+                request.cancel()
+
+    def onSpotifyError(self, error):
+        """
+        Called when a Spotify call failed
+        """
+        self.statusBar().showMessage("Error: {}".format(error))
@@ -0,0 +1,129 @@
+"""
+StationFeeder.py
+"""
+
+from PyQt5 import QtCore
+from concertista import station
+
+
+class StationFeeder(QtCore.QObject):
+    """
+    Keeps the Spotify queue of an endless station filled while the station
+    is playing. The queue is updated whenever the `PlaybackPoller` has a new
+    playback state.
+
+    Tracks are drawn from the station in the GUI thread, since that touches
+    the database and the history. Only the Spotify calls go through the
+    `SpotifyWorker`.
+    """
+
+    # emitted when the station is over
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, spotify_worker, playback_poller, device_id, uris,
+                 parent=None):
+        super().__init__(parent)
+        self._spotify_worker = spotify_worker
+        self._playback_poller = playback_poller
+        self._feeder = station.Feeder(None, device_id, uris)
+        self._request = None
+        self._started = False
+        # playback state the queue was not updated for yet
+        self._playback = None
+        self._has_playback = False
+
+    def start(self):
+        """
+        Start the playback and feeding of the queue
+        """
+        uris = self._feeder.begin()
+        if len(uris) == 0:
+            self.finished.emit()
+            return
+        self._request = self._spotify_worker.call(
+            'start_playback', device_id=self._feeder.device_id, uris=uris)
+        self._request.finished.connect(self.onStarted)
+        self._request.failed.connect(self.onFailed)
+
+    def stop(self):
+        """
+        Stop feeding the queue
+        """
+        if self._started:
+            self._started = False
+            self._playback_poller.playbackUpdated.disconnect(
+                self.onPlaybackUpdated)
+        if self._request is not None:
+            self._request.cancel()
+        self._feeder.stop()
+
+    def isActive(self):
+        """
+        Check if the station is playing
+        """
+        return self._feeder.active
+
+    def setDeviceId(self, device_id):
+        """
+        Set the device tracks are queued on
+        """
+        self._feeder.device_id = device_id
+
+    def onStarted(self, result):
+        """
+        Called when the playback started
+        """
+        self._started = True
+        self._playback_poller.playbackUpdated.connect(self.onPlaybackUpdated)
+        self._playback_poller.refresh()
+
+    def onFailed(self, error):
+        """
+        Called when a Spotify call failed
+        """
+        print("Error feeding the station:", error)
+        self.stop()
+        self.finished.emit()
+
+    def onPlaybackUpdated(self, cpb):
+        """
+        Called with a new playback state
+        """
+        self._playback = cpb
+        self._has_playback = True
+        self.updateQueue()
+
+    def updateQueue(self):
+        """
+        Queue more tracks if needed. Updates do not overlap, a playback state
+        that arrives meanwhile is handled when the running update is done.
+        """
+        if not self._started or not self._has_playback:
+            return
+        if self._request is not None and self._request.isPending():
+            return
+        self._has_playback = False
+        uris = self._feeder.advance(self._playback)
+        if len(uris) > 0:
+            self._request = self._spotify_worker.run(
+                _add_to_queue, uris, self._feeder.device_id)
+            self._request.finished.connect(self.onQueued)
+            self._request.failed.connect(self.onFailed)
+        elif not self._feeder.active:
+            self.stop()
+            self.finished.emit()
+
+    def onQueued(self, result):
+        """
+        Called when tracks were added to the queue
+        """
+        if self._feeder.active:
+            self.updateQueue()
+        else:
+            self.stop()
+            self.finished.emit()
+
+
+def _add_to_queue(spotify, uris, device_id):
+    for uri in uris:
+        spotify.add_to_queue(uri, device_id=device_id)
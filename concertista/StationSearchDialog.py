@@ -3,6 +3,7 @@ StationSearchDialog.py
 """
 
 from PyQt5 import QtWidgets, QtCore
+from concertista.SearchResultsModel import SearchResultsModel
 
 
 class StationSearchDialog(QtWidgets.QDialog):
@@ -10,6 +11,11 @@ class StationSearchDialog(QtWidgets.QDialog):
     Station by composer
     """
 
+    # keystrokes that come faster than this are looked up only once
+    LOOKUP_DELAY_MS = 10
+    # number of results shown in the completer popup
+    MAX_RESULTS = 50
+
     def __init__(self, db, parent):
         super().__init__(parent)
         self._db = db
@@ -22,10 +28,12 @@ class StationSearchDialog(QtWidgets.QDialog):
         self.search = QtWidgets.QLineEdit(self)
         self.search.setPlaceholderText("What are you looking for?")
         self.search.setClearButtonEnabled(True)
-        self._completer = QtWidgets.QCompleter(
-            self._db.get_completer_model(), self.search)
-        self._completer.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
-        self._completer.setFilterMode(QtCore.Qt.MatchContains)
+        # the results are already filtered and ranked by the search index,
+        # so the completer shows them as they are
+        self._results = SearchResultsModel(self._db, self)
+        self._completer = QtWidgets.QCompleter(self._results, self.search)
+        self._completer.setCompletionMode(
+            QtWidgets.QCompleter.UnfilteredPopupCompletion)
         self.search.setCompleter(self._completer)
         self.search.textChanged.connect(self.onSearchTextChanged)
         self._layout.addWidget(self.search)
@@ -49,23 +57,60 @@ class StationSearchDialog(QtWidgets.QDialog):
         self.setLayout(self._layout)
         self.setWindowTitle("Search")
 
+        self._lookup_timer = QtCore.QTimer(self)
+        self._lookup_timer.setSingleShot(True)
+        self._lookup_timer.setInterval(self.LOOKUP_DELAY_MS)
+        self._lookup_timer.timeout.connect(self.updateWidgets)
+
+    def prepare(self):
+        """
+        Build the search indexes, so the first keystroke does not wait for
+        them. Does nothing if they are built already.
+        """
+        self._db.prepare_search()
+
+    def showEvent(self, event):
+        """
+        Called when the dialog is shown
+        """
+        self.prepare()
+        super().showEvent(event)
+
     def updateWidgets(self):
         """
         Update widgets on UI change
         """
-        items = self._completer.model().findItems(self.search.text())
-        if len(items) == 1:
+        text = self.search.text()
+        item = self._db.get_completer_model().lookup(text)
+        if item is not None:
             self._play_button.setEnabled(True)
-            self.db_item = items[0].data()
+            self.db_item = item
         else:
             self._play_button.setEnabled(False)
             self.db_item = None
 
+        if item is None and len(text.strip()) > 0:
+            results = self._db.search(text, self.MAX_RESULTS)
+            if len(results) == 0:
+                # probably a typo
+                results = self._db.fuzzy_search(text, self.MAX_RESULTS)
+        else:
+            results = []
+        self._results.setResults(results)
+        if len(results) > 0:
+            self._completer.complete()
+        else:
+            self._completer.popup().hide()
+
     def onSearchTextChanged(self, text):
         """
         Called when search text has changed
         """
-        self.updateWidgets()
+        # the result of the previous lookup is no longer valid; restarting
+        # the timer drops the lookup for the previous text
+        self._play_button.setEnabled(False)
+        self.db_item = None
+        self._lookup_timer.start()
 
     def onPlay(self):
         """
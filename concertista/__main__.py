@@ -4,11 +4,13 @@ Concertista
 
 import sys
 import signal
+import multiprocessing
 from concertista import consts
-from concertista import server
+from concertista import tracing
 
-from PyQt5 import QtWidgets, QtCore
-from concertista.MainWindow import MainWindow
+# Qt and the GUI are imported in main(). Worker processes parsing the
+# catalog re-import this module on platforms that spawn them, and they must
+# stay light.
 
 
 def safe_timer(timeout, func, *args, **kwargs):
@@ -16,6 +18,8 @@ def safe_timer(timeout, func, *args, **kwargs):
     overlapping calls.
     See: http://ralsina.me/weblog/posts/BB974.html
     """
+    from PyQt5 import QtCore
+
     def timer_event():
         try:
             func(*args, **kwargs)
@@ -25,39 +29,54 @@ def safe_timer(timeout, func, *args, **kwargs):
 
 
 def handle_sigint(signum, frame):
+    from PyQt5 import QtWidgets
     QtWidgets.QApplication.quit()
 
 
 def handle_uncaught_exception(exc_type, exc, traceback):
+    from PyQt5 import QtWidgets
     print('Unhandled exception', exc_type, exc, traceback)
     QtWidgets.QApplication.quit()
 
 
-sys.excepthook = handle_uncaught_exception
+def main():
+    # the catalog can be parsed by worker processes
+    multiprocessing.freeze_support()
 
+    # must happen before the heavy modules are imported, so we can time them
+    tracing.setup(sys.argv)
+
+    from PyQt5 import QtWidgets, QtCore
+    from concertista.MainWindow import MainWindow
+
+    sys.excepthook = handle_uncaught_exception
 
-def main():
     QtCore.QCoreApplication.setOrganizationName("David Andrs")
     QtCore.QCoreApplication.setOrganizationDomain("name.andrs")
     QtCore.QCoreApplication.setApplicationName(consts.APP_NAME)
 
-    qapp = QtWidgets.QApplication(sys.argv)
-    qapp.setAttribute(QtCore.Qt.AA_UseHighDpiPixmaps)
-    qapp.setQuitOnLastWindowClosed(False)
-
-    server_thread = server.ServerThread()
-    server_thread.start()
+    with tracing.span("QApplication"):
+        qapp = QtWidgets.QApplication(sys.argv)
+        qapp.setAttribute(QtCore.Qt.AA_UseHighDpiPixmaps)
+        qapp.setQuitOnLastWindowClosed(False)
 
-    window = MainWindow()
+    with tracing.span("MainWindow"):
+        window = MainWindow()
     signal.signal(signal.SIGINT, handle_sigint)
-    window.connectToSpotify()
-    window.show()
+    with tracing.span("show"):
+        window.show()
+    QtCore.QTimer.singleShot(
+        0, lambda: tracing.instant("event loop started"))
+    # the server stack is imported once the event loop runs, so the window
+    # appears without waiting for it
+    QtCore.QTimer.singleShot(0, window.startServer)
 
     # Repeatedly run python-noop to give the interpreter time to
     # handle signals
     safe_timer(50, lambda: None)
 
     qapp.exec()
+    tracing.finish()
 
     del window
     del qapp
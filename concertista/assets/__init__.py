@@ -1,12 +1,22 @@
 import os
 import sys
 import platform
-from PyQt5 import QtGui
 
 
 class Assets:
     _instance = None
 
+    # attribute name -> icon file
+    ICONS = {
+        'author_icon': "author.svg",
+        'piece_icon': "vinyl.svg",
+        'prev_icon': "prev.svg",
+        'next_icon': "next.svg",
+        'play_icon': "play.svg",
+        'pause_icon': "pause.svg",
+        'spotify_logo': "spotify-logo.svg"
+    }
+
     def __new__(cls, *args, **kwargs):
         if not cls._instance:
             cls._instance = super().__new__(cls, *args, **kwargs)
@@ -22,14 +32,15 @@ class Assets:
             path = os.path.dirname(__file__)
 
         self.music_dir = os.path.join(path, 'music')
+        self._icons_dir = os.path.join(path, 'icons')
 
-        icons_dir = os.path.join(path, 'icons')
-        self.author_icon = QtGui.QIcon(os.path.join(icons_dir, "author.svg"))
-        self.piece_icon = QtGui.QIcon(os.path.join(icons_dir, "vinyl.svg"))
-        self.prev_icon = QtGui.QIcon(os.path.join(icons_dir, "prev.svg"))
-        self.next_icon = QtGui.QIcon(os.path.join(icons_dir, "next.svg"))
-        self.play_icon = QtGui.QIcon(os.path.join(icons_dir, "play.svg"))
-        self.pause_icon = QtGui.QIcon(os.path.join(icons_dir, "pause.svg"))
-
-        self.spotify_logo = QtGui.QIcon(
-            os.path.join(icons_dir, "spotify-logo.svg"))
+    def __getattr__(self, name):
+        # icons are created on first use, so the catalog can be used without
+        # loading Qt
+        file_name = self.ICONS.get(name)
+        if file_name is None:
+            raise AttributeError(name)
+        from PyQt5 import QtGui
+        icon = QtGui.QIcon(os.path.join(self._icons_dir, file_name))
+        setattr(self, name, icon)
+        return icon
@@ -0,0 +1,287 @@
+"""
+cli.py
+
+Command line interface for starting stations without the GUI. It uses the
+Spotify token cached by the app, so the app has to be started once to sign
+in. Qt is never loaded. Examples:
+
+    python -m concertista.cli station --composer dvorak --device Kitchen
+    python -m concertista.cli station --piece "new world"
+    python -m concertista.cli station --composer dvorak --composer grieg \\
+        --max-tracks 4
+    python -m concertista.cli station --endless
+    python -m concertista.cli devices
+    python -m concertista.cli durations
+"""
+
+import sys
+import time
+import argparse
+from concertista import consts
+from concertista import history
+from concertista import playback
+from concertista import search
+from concertista import session
+from concertista import station
+from concertista import weights
+from concertista.DB import create_db
+
+# default length of a station
+STATION_HOURS = 8
+
+
+def find_composer(db, text):
+    """
+    Find composer by ID or name, returns its ID or `None`
+    """
+    composers = db.get_composers()
+    if text in composers:
+        return text
+    folded = search.fold(text)
+    for id, composer in composers.items():
+        if search.fold(composer['name']) == folded:
+            return id
+    for item in db.search(text) or db.fuzzy_search(text):
+        if item['type'] == "composer":
+            return item['id']
+    return None
+
+
+def find_piece(db, text):
+    """
+    Find piece by ID or name, returns its ID or `None`
+    """
+    if db.get_piece(text) is not None:
+        return text
+    for item in db.search(text) or db.fuzzy_search(text):
+        if item['type'] == "piece":
+            return item['id']
+    return None
+
+
+def piece_ids(db, args):
+    """
+    IDs of pieces to build the station from
+    """
+    index = db.get_query_index()
+    if args.composer or args.piece or args.album:
+        bits = 0
+        for text in args.composer or []:
+            composer_id = find_composer(db, text)
+            if composer_id is None:
+                sys.exit("No composer matching '{}'".format(text))
+            bits |= index.composer(composer_id)
+        for text in args.piece or []:
+            piece_id = find_piece(db, text)
+            if piece_id is None:
+                sys.exit("No piece matching '{}'".format(text))
+            bits |= index.pieces([piece_id])
+        for album_id in args.album or []:
+            bits |= index.album(album_id)
+    else:
+        bits = index.all()
+
+    if args.min_tracks is not None or args.max_tracks is not None:
+        bits &= index.tracks(args.min_tracks or 1, args.max_tracks)
+    for text in args.exclude_composer or []:
+        composer_id = find_composer(db, text)
+        if composer_id is None:
+            sys.exit("No composer matching '{}'".format(text))
+        bits &= ~index.composer(composer_id)
+    return index.ids(bits)
+
+
+def connect():
+    """
+    Connect to Spotify with the cached token
+    """
+    import spotipy
+    from spotipy.oauth2 import SpotifyOAuth, SpotifyOauthError
+
+    client_id, client_secret = session.credentials()
+    try:
+        auth_manager = SpotifyOAuth(
+            scope=session.SCOPE,
+            client_id=client_id,
+            client_secret=client_secret,
+            redirect_uri=session.SPOTIFY_REDIRECT_URI,
+            cache_path=session.session_cache_path(),
+            open_browser=False)
+        token = auth_manager.get_cached_token()
+    except SpotifyOauthError as e:
+        sys.exit("Spotify authorization failed: {}".format(e))
+    if token is None:
+        sys.exit("Not signed in to Spotify, start Concertista to sign in")
+    return spotipy.Spotify(auth_manager=auth_manager)
+
+
+def find_device(spotify, name):
+    """
+    Find device by ID or name. Without a name, the active device is used.
+    """
+    devices = spotify.devices()['devices']
+    for d in devices:
+        if name is None and d['is_active']:
+            return d['id']
+        if name is not None and (
+                d['id'] == name or d['name'].lower() == name.lower()):
+            return d['id']
+    if name is None and len(devices) == 1:
+        return devices[0]['id']
+    if name is None:
+        sys.exit("No active device, use --device")
+    sys.exit("Unknown device '{}'".format(name))
+
+
+def cmd_station(args):
+    db = create_db()
+    db.load()
+    ids = piece_ids(db, args)
+    if len(ids) == 0:
+        sys.exit("No pieces to play")
+    # a dry run does not count as playing the pieces
+    played = history.History(
+        None if args.dry_run else consts.CACHE_DIR, args.horizon)
+    played.load()
+    piece_weights = None
+    if args.weight != weights.UNIFORM:
+        piece_weights = db.get_weights(args.weight, piece_ids=ids)
+    if args.endless and not args.dry_run:
+        return play_endless(db, ids, played, piece_weights, args)
+    uris = station.randomize_pieces(
+        db, ids, max_duration=args.hours * 3600, history=played,
+        weights=piece_weights)
+
+    if args.dry_run:
+        for uri in uris:
+            print(uri)
+        return 0
+
+    spotify = connect()
+    device_id = find_device(spotify, args.device)
+    spotify.start_playback(device_id=device_id, uris=uris)
+    played.save()
+    return 0
+
+
+def play_endless(db, ids, played, piece_weights, args):
+    """
+    Play an endless station until it is interrupted or the user starts to
+    play something else
+    """
+    spotify = connect()
+    device_id = find_device(spotify, args.device)
+    uris = station.tracks(
+        db, ids, repeat=True, history=played, weights=piece_weights)
+    feeder = station.Feeder(spotify, device_id, uris)
+    if not feeder.start():
+        sys.exit("No tracks to play")
+    schedule = playback.Schedule()
+    try:
+        while True:
+            cpb = spotify.current_playback()
+            if not feeder.update(cpb):
+                break
+            played.save()
+            time.sleep(schedule.next_delay(cpb) / 1000)
+    except KeyboardInterrupt:
+        pass
+    played.save()
+    return 0
+
+
+def cmd_devices(args):
+    spotify = connect()
+    for d in spotify.devices()['devices']:
+        print("{}{}  {}".format(
+            '*' if d['is_active'] else ' ', d['id'], d['name']))
+    return 0
+
+
+def cmd_durations(args):
+    db = create_db()
+    db.load()
+    track_durations = db.get_track_durations()
+    track_ids = db.get_track_ids()
+    missing = track_durations.missing(track_ids)
+    if len(missing) > 0:
+        spotify = connect()
+        track_durations.fetch(spotify, missing, args.market)
+    print("Looked up {} of {} tracks".format(
+        len(missing), len(set(track_ids))))
+    return 0
+
+
+def parser():
+    """
+    Parser of the command line
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m concertista.cli',
+        description='Start Concertista stations from the command line')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    parser_station = commands.add_parser(
+        'station', help='start a new station')
+    parser_station.add_argument(
+        '--composer', action='append',
+        help='play pieces of a composer (name or ID), can be repeated')
+    parser_station.add_argument(
+        '--piece', action='append',
+        help='play a piece (name or ID), can be repeated')
+    parser_station.add_argument(
+        '--album', action='append',
+        help='play pieces from a Spotify album (ID), can be repeated')
+    parser_station.add_argument(
+        '--exclude-composer', action='append',
+        help='do not play pieces of a composer (name or ID), can be '
+             'repeated')
+    parser_station.add_argument(
+        '--min-tracks', type=int,
+        help='play only pieces with at least this many tracks')
+    parser_station.add_argument(
+        '--max-tracks', type=int,
+        help='play only pieces with at most this many tracks')
+    parser_station.add_argument(
+        '--device', help='device to play on (name or ID), default: the '
+                         'active device')
+    parser_station.add_argument(
+        '--hours', type=float, default=STATION_HOURS,
+        help='length of the station, default: %(default)s')
+    parser_station.add_argument(
+        '--horizon', type=int, default=history.HORIZON,
+        help='number of recently played pieces that are played only after '
+             'the other pieces, default: %(default)s')
+    parser_station.add_argument(
+        '--weight', choices=weights.MODES, default=weights.UNIFORM,
+        help='how likely pieces are picked: all equally, by number of '
+             'tracks or by duration, default: %(default)s')
+    parser_station.add_argument(
+        '--endless', action='store_true',
+        help='keep adding tracks to the queue until interrupted')
+    parser_station.add_argument(
+        '--dry-run', action='store_true',
+        help='print the tracks instead of playing them')
+    parser_station.set_defaults(func=cmd_station)
+
+    parser_devices = commands.add_parser(
+        'devices', help='list Spotify devices')
+    parser_devices.set_defaults(func=cmd_devices)
+
+    parser_durations = commands.add_parser(
+        'durations', help='look up track durations used for the length of '
+                          'stations')
+    parser_durations.add_argument(
+        '--market', help='Spotify market (country code) of the tracks')
+    parser_durations.set_defaults(func=cmd_durations)
+    return parser
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
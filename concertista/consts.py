@@ -3,7 +3,13 @@
 Constants
 """
 
+import os
+from pathlib import Path
+
 APP_NAME = "Concertista"
 VERSION = 1.0
 COPYRIGHT = u"Copyright © 2020, David Andrš, All Rights Reserved"
 DESCRIPTION = 'Little app to fill your spotify queue with concert music'
+
+# location where we keep our cached data (spotify token, catalog snapshot)
+CACHE_DIR = os.path.join(str(Path.home()), '.cache', 'concertista')
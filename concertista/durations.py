@@ -0,0 +1,139 @@
+"""
+durations.py
+
+Cache of track durations. Durations are looked up on Spotify in batches and
+stored in the cache directory next to the catalog snapshot, so stations of a
+given length can be built without talking to Spotify.
+"""
+
+import os
+import json
+import threading
+
+FILE_NAME = 'durations.json'
+# maximum number of tracks Spotify returns in one request
+BATCH_SIZE = 50
+# the cache file is written after this many batches, so an interrupted lookup
+# does not lose what was found
+SAVE_EVERY = 10
+# used for tracks whose duration we do not know yet
+DEFAULT_DURATION_MS = 5 * 60 * 1000
+
+
+class TrackDurations:
+    """
+    Track ID -> duration in milliseconds. Tracks that Spotify does not know
+    have zero duration, they are skipped during playback.
+    """
+
+    def __init__(self, cache_dir=None):
+        # directory with the cache file, `None` keeps the durations in memory
+        self._cache_dir = cache_dir
+        self._durations = {}
+        self._lock = threading.Lock()
+        # incremented when durations change
+        self.version = 0
+
+    def __len__(self):
+        return len(self._durations)
+
+    def file_name(self):
+        """
+        Name of the cache file
+        """
+        return os.path.join(self._cache_dir, FILE_NAME)
+
+    def load(self):
+        """
+        Read the durations from the cache file
+        """
+        if self._cache_dir is None:
+            return
+        try:
+            with open(self.file_name()) as f:
+                durations = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(durations, dict):
+            with self._lock:
+                self._durations.update(durations)
+                self.version += 1
+
+    def save(self):
+        """
+        Write the durations into the cache file
+        """
+        if self._cache_dir is None:
+            return
+        with self._lock:
+            durations = dict(self._durations)
+        fn = self.file_name()
+        tmp_fn = fn + ".tmp"
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            with open(tmp_fn, 'w') as f:
+                json.dump(durations, f, separators=(',', ':'))
+            os.replace(tmp_fn, fn)
+        except OSError:
+            print("Error writing track durations:", fn)
+
+    def get(self, track_id, default=None):
+        """
+        Duration of a track in milliseconds
+        """
+        return self._durations.get(track_id, default)
+
+    def set(self, track_id, duration_ms):
+        """
+        Set duration of a track in milliseconds
+        """
+        with self._lock:
+            self._durations[track_id] = duration_ms
+            self.version += 1
+
+    def missing(self, track_ids):
+        """
+        IDs of tracks with unknown duration, without duplicates
+        """
+        return [id for id in dict.fromkeys(track_ids)
+                if id not in self._durations]
+
+    def piece_duration(self, piece, default=DEFAULT_DURATION_MS):
+        """
+        Duration of a piece in milliseconds. Tracks with unknown duration
+        count as `default`.
+        """
+        return sum(self._durations.get(t, default) for t in piece['tracks'])
+
+    def fetch(self, spotify, track_ids, market=None):
+        """
+        Look up durations of the tracks on Spotify, `BATCH_SIZE` tracks per
+        request, and save them. Tracks with known duration are skipped.
+        Durations found so far are saved even if a request fails. Returns the
+        number of tracks looked up.
+        """
+        track_ids = self.missing(track_ids)
+        unsaved = 0
+        try:
+            for i in range(0, len(track_ids), BATCH_SIZE):
+                batch = track_ids[i:i + BATCH_SIZE]
+                result = spotify.tracks(batch, market=market)
+                found = {}
+                for track in result['tracks']:
+                    if track is not None:
+                        found[track['id']] = track['duration_ms']
+                        linked = track.get('linked_from')
+                        if linked is not None:
+                            found[linked['id']] = track['duration_ms']
+                with self._lock:
+                    for id in batch:
+                        self._durations[id] = found.get(id, 0)
+                    self.version += 1
+                unsaved += 1
+                if unsaved == SAVE_EVERY:
+                    self.save()
+                    unsaved = 0
+        finally:
+            if unsaved > 0:
+                self.save()
+        return len(track_ids)
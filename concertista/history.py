@@ -0,0 +1,113 @@
+"""
+history.py
+
+Pieces that were played recently, so stations do not repeat them. Only the
+last `horizon` pieces are remembered, so the history stays small no matter
+how many pieces were played.
+"""
+
+import os
+import json
+from collections import OrderedDict
+
+FILE_NAME = 'history.json'
+# number of pieces remembered by default
+HORIZON = 200
+
+
+class History:
+    """
+    Bounded set of recently played piece IDs, ordered from the oldest to the
+    most recent play
+    """
+
+    def __init__(self, cache_dir=None, horizon=HORIZON):
+        # directory with the history file, `None` keeps the history in memory
+        self._cache_dir = cache_dir
+        self._horizon = horizon
+        self._pieces = OrderedDict()
+        # `True` if the history changed since it was saved
+        self._modified = False
+
+    def __len__(self):
+        return len(self._pieces)
+
+    def __contains__(self, piece_id):
+        return piece_id in self._pieces
+
+    def __iter__(self):
+        return iter(self._pieces)
+
+    @property
+    def horizon(self):
+        """
+        Number of pieces remembered, zero disables the history
+        """
+        return self._horizon
+
+    @horizon.setter
+    def horizon(self, value):
+        self._horizon = value
+        self._trim()
+
+    def add(self, piece_id):
+        """
+        Record that a piece was played
+        """
+        if self._horizon <= 0:
+            return
+        self._pieces[piece_id] = True
+        self._pieces.move_to_end(piece_id)
+        self._trim()
+        self._modified = True
+
+    def clear(self):
+        """
+        Forget all pieces
+        """
+        self._pieces.clear()
+        self._modified = True
+
+    def _trim(self):
+        while len(self._pieces) > max(self._horizon, 0):
+            self._pieces.popitem(last=False)
+            self._modified = True
+
+    def file_name(self):
+        """
+        Name of the history file
+        """
+        return os.path.join(self._cache_dir, FILE_NAME)
+
+    def load(self):
+        """
+        Read the history from the cache directory
+        """
+        if self._cache_dir is None:
+            return
+        try:
+            with open(self.file_name()) as f:
+                piece_ids = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(piece_ids, list):
+            for id in piece_ids:
+                self.add(id)
+        self._modified = False
+
+    def save(self):
+        """
+        Write the history into the cache directory, if it changed
+        """
+        if self._cache_dir is None or not self._modified:
+            return
+        fn = self.file_name()
+        tmp_fn = fn + ".tmp"
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            with open(tmp_fn, 'w') as f:
+                json.dump(list(self._pieces), f)
+            os.replace(tmp_fn, fn)
+            self._modified = False
+        except OSError:
+            print("Error writing history:", fn)
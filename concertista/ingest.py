@@ -0,0 +1,98 @@
+"""
+ingest.py
+
+Reading of the piece files. Large track trees are parsed by a pool of
+worker processes, so this module must not depend on Qt.
+"""
+
+import os
+import hashlib
+import yaml
+from concurrent import futures
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader
+
+# number of files a worker process parses in one go
+BATCH_SIZE = 64
+# parse files in worker processes only if there are at least this many
+MIN_PARALLEL_FILES = 512
+
+
+def load_yaml(text):
+    """
+    Parse YAML text, using libyaml when it is available
+    """
+    return yaml.load(text, Loader=SafeLoader)
+
+
+def piece_files(tracks_dir):
+    """
+    Iterate over piece files in the tracks directory in a deterministic order
+    """
+    for root, dirs, files in os.walk(tracks_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith(('.yml')):
+                yield os.path.join(root, file)
+
+
+def file_signature(fn, old_sig=None, data=None):
+    """
+    Compute (mtime, size, hash) of a file. If the mtime and size match the
+    ones in `old_sig`, the file is not read and the old hash is reused.
+    """
+    st = os.stat(fn)
+    if (old_sig is not None and
+            old_sig[0] == st.st_mtime_ns and old_sig[1] == st.st_size):
+        return old_sig
+
+    if data is None:
+        with open(fn, 'rb') as f:
+            data = f.read()
+    return (st.st_mtime_ns, st.st_size, hashlib.sha1(data).hexdigest())
+
+
+def read_piece(fn):
+    """
+    Read a piece file. Returns (signature, piece), where piece is `None` if
+    the file could not be parsed.
+    """
+    with open(fn, 'rb') as f:
+        data = f.read()
+    sig = file_signature(fn, data=data)
+    try:
+        piece = load_yaml(data.decode('utf-8'))
+    except yaml.YAMLError:
+        piece = None
+    return sig, piece
+
+
+def _read_batch(file_names):
+    return [read_piece(fn) for fn in file_names]
+
+
+def read_pieces(file_names, workers=None):
+    """
+    Read piece files and yield (file name, signature, piece) in the same order
+    as `file_names`. If there are enough files, they are split into batches
+    that are parsed by a pool of `workers` processes.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers < 2 or len(file_names) < MIN_PARALLEL_FILES:
+        for fn in file_names:
+            yield (fn, ) + read_piece(fn)
+        return
+
+    batches = [
+        file_names[i:i + BATCH_SIZE]
+        for i in range(0, len(file_names), BATCH_SIZE)
+    ]
+    with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch, results in zip(batches, executor.map(_read_batch, batches)):
+            for fn, (sig, piece) in zip(batch, results):
+                yield fn, sig, piece
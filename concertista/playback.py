@@ -0,0 +1,78 @@
+"""
+playback.py
+
+Scheduling checks of the Spotify playback state. While a track is playing,
+the state changes when the track ends, so the next check is scheduled just
+after the expected end of the track. While nothing is playing, the checks
+back off exponentially.
+"""
+
+# check this long after the track is expected to end, in milliseconds
+BOUNDARY_DELAY_MS = 1000
+# shortest time between checks
+MIN_DELAY_MS = 1000
+# longest time between checks while playing, catches seeks and changes made
+# on other devices
+MAX_PLAYING_DELAY_MS = 60000
+# first delay while paused or idle, doubled with every check
+IDLE_DELAY_MS = 5000
+# longest delay while paused or idle
+MAX_IDLE_DELAY_MS = 120000
+
+
+def is_playing(playback):
+    """
+    Check if a track is playing according to `playback` (as returned by
+    `spotify.current_playback`)
+    """
+    return (playback is not None and
+            playback.get('is_playing') is True and
+            playback.get('item') is not None)
+
+
+def remaining_ms(playback):
+    """
+    Milliseconds until the track in `playback` ends, `None` if not known
+    """
+    item = playback.get('item')
+    progress = playback.get('progress_ms')
+    if item is None or progress is None or item.get('duration_ms') is None:
+        return None
+    return max(item['duration_ms'] - progress, 0)
+
+
+class Schedule:
+    """
+    Delays between checks of the playback state
+    """
+
+    def __init__(self):
+        self._idle_delay = IDLE_DELAY_MS
+
+    def reset(self):
+        """
+        Start the backoff over, e.g. when the user did something
+        """
+        self._idle_delay = IDLE_DELAY_MS
+
+    def backoff(self):
+        """
+        Delay of the next check while nothing is playing or checks fail
+        """
+        delay = self._idle_delay
+        self._idle_delay = min(delay * 2, MAX_IDLE_DELAY_MS)
+        return delay
+
+    def next_delay(self, playback):
+        """
+        Delay in milliseconds of the check after the one that returned
+        `playback`
+        """
+        if not is_playing(playback):
+            return self.backoff()
+        self.reset()
+        remaining = remaining_ms(playback)
+        if remaining is None:
+            return MAX_PLAYING_DELAY_MS
+        return min(max(remaining + BOUNDARY_DELAY_MS, MIN_DELAY_MS),
+                   MAX_PLAYING_DELAY_MS)
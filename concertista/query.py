@@ -0,0 +1,153 @@
+"""
+query.py
+
+Selecting pieces for stations by composer, album, number of tracks or by an
+explicit list of pieces. Sets of pieces are bitsets stored in Python ints, so
+unions, intersections and exclusions are single `|`, `&` and `& ~`
+operations, no matter how many pieces there are. Sets must not be negative,
+so exclude pieces from a set with `a & ~b`, never with `~b` alone.
+"""
+
+import re
+from array import array
+from concertista.records import Piece
+
+# bit positions set in each byte value
+_BYTE_BITS = [tuple(b for b in range(8) if value >> b & 1)
+              for value in range(256)]
+_NONZERO = re.compile(rb'[^\x00]+')
+
+
+def bits_from_positions(positions):
+    """
+    Bitset with the given bits set
+    """
+    bits = 0
+    if len(positions) == 0:
+        return bits
+    data = bytearray(max(positions) // 8 + 1)
+    for p in positions:
+        data[p >> 3] |= 1 << (p & 7)
+    return int.from_bytes(data, 'little')
+
+
+def positions(bits):
+    """
+    Positions of bits that are set, in increasing order
+    """
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    result = array('l')
+    # skip runs of empty bytes in C
+    for m in _NONZERO.finditer(data):
+        base = m.start() * 8
+        for byte in m.group():
+            for b in _BYTE_BITS[byte]:
+                result.append(base + b)
+            base += 8
+    return result
+
+
+def count(bits):
+    """
+    Number of bits that are set
+    """
+    return bin(bits).count('1')
+
+
+def _num_tracks(piece):
+    if isinstance(piece, Piece):
+        # avoids unpacking the track IDs
+        return piece.num_tracks()
+    return len(piece['tracks'])
+
+
+class QueryIndex:
+    """
+    Index for building sets of pieces. Each piece has a bit. Pieces of one
+    composer have consecutive bits, so the set of pieces of a composer is
+    just a range of bits. Albums and numbers of tracks are kept as sorted
+    arrays of bits and turned into bitsets when they are queried.
+    """
+
+    def __init__(self, db):
+        # bit -> piece ID
+        self.piece_ids = []
+        # piece ID -> bit
+        self._bits = {}
+        # composer ID -> (first bit, last bit + 1)
+        self._composers = {}
+        # album ID -> array of bits
+        self._albums = {}
+        # number of tracks -> array of bits
+        self._track_counts = {}
+        # number of tracks -> bitset, built on first use
+        self._track_count_bits = {}
+
+        for composer_id in db.get_composers():
+            start = len(self.piece_ids)
+            for id in db.get_composer_pieces(composer_id):
+                self._add(db.get_piece(id))
+            self._composers[composer_id] = (start, len(self.piece_ids))
+        # pieces of composers that are not in the catalog
+        for id in db.get_piece_ids():
+            if id not in self._bits:
+                self._add(db.get_piece(id))
+
+    def _add(self, piece):
+        bit = len(self.piece_ids)
+        self.piece_ids.append(piece['id'])
+        self._bits[piece['id']] = bit
+        album_id = piece.get('album_id')
+        if album_id is not None:
+            self._albums.setdefault(album_id, array('l')).append(bit)
+        num_tracks = _num_tracks(piece)
+        self._track_counts.setdefault(num_tracks, array('l')).append(bit)
+
+    def __len__(self):
+        return len(self.piece_ids)
+
+    def all(self):
+        """
+        All pieces
+        """
+        return (1 << len(self.piece_ids)) - 1
+
+    def composer(self, composer_id):
+        """
+        Pieces of a composer
+        """
+        start, end = self._composers.get(composer_id, (0, 0))
+        return ((1 << (end - start)) - 1) << start
+
+    def album(self, album_id):
+        """
+        Pieces from an album
+        """
+        return bits_from_positions(self._albums.get(album_id, ()))
+
+    def tracks(self, minimum=1, maximum=None):
+        """
+        Pieces with at least `minimum` and at most `maximum` tracks
+        """
+        bits = 0
+        for num_tracks, piece_bits in self._track_counts.items():
+            if num_tracks >= minimum and (
+                    maximum is None or num_tracks <= maximum):
+                if num_tracks not in self._track_count_bits:
+                    self._track_count_bits[num_tracks] = \
+                        bits_from_positions(piece_bits)
+                bits |= self._track_count_bits[num_tracks]
+        return bits
+
+    def pieces(self, piece_ids):
+        """
+        Given pieces, IDs that are not in the index are ignored
+        """
+        return bits_from_positions(
+            [self._bits[id] for id in piece_ids if id in self._bits])
+
+    def ids(self, bits):
+        """
+        IDs of pieces in a set
+        """
+        return [self.piece_ids[p] for p in positions(bits)]
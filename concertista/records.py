@@ -0,0 +1,203 @@
+"""
+records.py
+
+Compact records for composers and pieces. They replace the dicts returned by
+the YAML parser, but still support dict-style access, so `piece['name']` keeps
+working.
+"""
+
+import sys
+
+# Spotify IDs are 128-bit numbers written as 22 base62 digits; packed, each
+# one takes 16 bytes
+TRACK_ID_LEN = 22
+PACKED_ID_LEN = 16
+_BASE62 = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_BASE62_DIGITS = {c: i for i, c in enumerate(_BASE62)}
+_MAX_ID = 1 << (8 * PACKED_ID_LEN)
+
+
+def intern_id(id):
+    """
+    Intern an ID, so that records referring to the same composer or album
+    share one string
+    """
+    if isinstance(id, str):
+        return sys.intern(id)
+    return id
+
+
+def _decode_id(id):
+    """
+    Number encoded by a Spotify ID, `None` if `id` is not a Spotify ID
+    """
+    if not isinstance(id, str) or len(id) != TRACK_ID_LEN:
+        return None
+    n = 0
+    try:
+        for c in id:
+            n = n * 62 + _BASE62_DIGITS[c]
+    except KeyError:
+        return None
+    if n >= _MAX_ID:
+        return None
+    return n
+
+
+def _encode_id(n):
+    """
+    Inverse of `_decode_id`
+    """
+    digits = []
+    for _ in range(TRACK_ID_LEN):
+        n, d = divmod(n, 62)
+        digits.append(_BASE62[d])
+    return "".join(reversed(digits))
+
+
+def pack_track_ids(track_ids):
+    """
+    Pack a list of Spotify track IDs into a single `bytes` object, each ID is
+    stored as a 16-byte number. IDs that are not Spotify IDs are kept in a
+    tuple.
+    """
+    track_ids = list(track_ids)
+    numbers = [_decode_id(t) for t in track_ids]
+    if None in numbers:
+        return tuple(track_ids)
+    return b"".join(n.to_bytes(PACKED_ID_LEN, 'big') for n in numbers)
+
+
+def unpack_track_ids(packed):
+    """
+    Inverse of `pack_track_ids`
+    """
+    if isinstance(packed, tuple):
+        return list(packed)
+    return [
+        _encode_id(int.from_bytes(packed[i:i + PACKED_ID_LEN], 'big'))
+        for i in range(0, len(packed), PACKED_ID_LEN)
+    ]
+
+
+class Record:
+    """
+    Base class for records with dict-style access to their fields
+    """
+
+    __slots__ = ()
+    # names of the fields accessible via `record[key]`
+    KEYS = ()
+
+    def __getitem__(self, key):
+        if key in self.KEYS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.KEYS and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def keys(self):
+        return [k for k in self.KEYS if k in self]
+
+    def __eq__(self, other):
+        if not isinstance(other, type(self)):
+            return NotImplemented
+        return all(self[k] == other[k] for k in self.KEYS)
+
+    def __hash__(self):
+        # equal records have equal IDs
+        return hash((type(self), self.id))
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(k, self.get(k)) for k in self.keys()))
+
+
+class Composer(Record):
+    """
+    Composer
+    """
+
+    __slots__ = ('id', 'name')
+    KEYS = ('id', 'name')
+
+    def __init__(self, id, name):
+        self.id = intern_id(id)
+        self.name = name
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['id'], data['name'])
+
+    def __reduce__(self):
+        return (Composer, (self.id, self.name))
+
+
+class Piece(Record):
+    """
+    Piece, i.e. a list of tracks from one album
+    """
+
+    __slots__ = ('id', 'composer_id', 'album_id', 'name', '_tracks')
+    KEYS = ('id', 'composer_id', 'album_id', 'name', 'tracks')
+
+    def __init__(self, id, composer_id, name, album_id=None, tracks=()):
+        self.id = id
+        self.composer_id = intern_id(composer_id)
+        self.album_id = intern_id(album_id)
+        self.name = name
+        self._tracks = pack_track_ids(tracks)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['id'],
+            data['composer_id'],
+            data['name'],
+            data.get('album_id'),
+            data.get('tracks') or [])
+
+    @property
+    def tracks(self):
+        """
+        List of track IDs
+        """
+        return unpack_track_ids(self._tracks)
+
+    def num_tracks(self):
+        """
+        Number of tracks, without unpacking the track IDs
+        """
+        if isinstance(self._tracks, tuple):
+            return len(self._tracks)
+        return len(self._tracks) // PACKED_ID_LEN
+
+    def track_uris(self):
+        """
+        Iterate over Spotify URIs of the tracks
+        """
+        for track in self.tracks:
+            yield "spotify:track:{}".format(track)
+
+    def __reduce__(self):
+        return (_restore_piece, (self.id, self.composer_id, self.album_id,
+                                 self.name, self._tracks))
+
+
+def _restore_piece(id, composer_id, album_id, name, packed_tracks):
+    """
+    Restore a pickled piece without re-packing its tracks
+    """
+    piece = Piece.__new__(Piece)
+    piece.id = id
+    piece.composer_id = intern_id(composer_id)
+    piece.album_id = intern_id(album_id)
+    piece.name = name
+    piece._tracks = packed_tracks
+    return piece
@@ -0,0 +1,381 @@
+"""
+search.py
+
+Index for searching composers and pieces by name. Texts are compared after
+removing diacritics and case folding, so "dvorak" finds "Antonín Dvořák".
+"""
+
+import bisect
+import heapq
+import unicodedata
+from array import array
+
+# letters that do not decompose into a base letter and a combining mark
+_FOLD = str.maketrans({
+    'ø': 'o',
+    'đ': 'd',
+    'ł': 'l',
+    'ı': 'i',
+    'æ': 'ae',
+    'œ': 'oe'
+})
+
+
+def fold(text):
+    """
+    Normalize text for searching: remove diacritics and case fold
+    """
+    if text.isascii():
+        return text.casefold()
+    text = unicodedata.normalize('NFKD', text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return text.casefold().translate(_FOLD)
+
+
+def trigrams(text):
+    """
+    Set of all 3 character substrings of `text`
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def max_edit_distance(word):
+    """
+    Number of typos we tolerate in a word, short words must match exactly
+    """
+    if len(word) < 4:
+        return 0
+    elif len(word) < 8:
+        return 1
+    return 2
+
+
+def edit_distance(a, b, limit):
+    """
+    Number of insertions, deletions, substitutions and transpositions of
+    adjacent characters turning `a` into `b`. Returns `limit + 1` if the
+    distance is larger than `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if (prev2 is not None and j > 1 and a[i - 1] == b[j - 2] and
+                    a[i - 2] == b[j - 1]):
+                d = min(d, prev2[j - 2] + 1)
+            cur[j] = d
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return min(prev[-1], limit + 1)
+
+
+class Speller:
+    """
+    Symmetric delete spelling correction. Every word is stored under all
+    strings made by deleting up to `MAX_DISTANCE` characters from its
+    beginning, so the words close to a misspelled word are found by
+    generating the deletes of the misspelled word, without comparing it to
+    the whole vocabulary.
+    """
+
+    MAX_DISTANCE = 2
+    # only this many characters from the beginning of words are used for the
+    # deletes, that keeps the dictionary small for long words
+    PREFIX_LENGTH = 7
+
+    def __init__(self):
+        # delete -> words
+        self._deletes = {}
+        self._words = set()
+
+    def __len__(self):
+        return len(self._words)
+
+    def add(self, word):
+        """
+        Add a word to the dictionary
+        """
+        if word in self._words:
+            return
+        self._words.add(word)
+        for d in self._variants(word[:self.PREFIX_LENGTH]):
+            self._deletes.setdefault(d, []).append(word)
+
+    def lookup(self, word):
+        """
+        Find words close to `word`. Returns a list of (distance, word) sorted
+        by distance.
+        """
+        limit = max_edit_distance(word)
+        candidates = set()
+        for d in self._variants(word[:self.PREFIX_LENGTH]):
+            candidates.update(self._deletes.get(d, []))
+
+        results = []
+        for candidate in candidates:
+            dist = edit_distance(word, candidate, limit)
+            if dist <= limit:
+                results.append((dist, candidate))
+        results.sort()
+        return results
+
+    def _variants(self, word):
+        """
+        `word` and all strings made by deleting characters from it
+        """
+        variants = {word}
+        edge = {word}
+        for _ in range(self.MAX_DISTANCE):
+            edge = {w[:i] + w[i + 1:] for w in edge for i in range(len(w))}
+            variants.update(edge)
+        return variants
+
+
+class SearchIndex:
+    """
+    Word index with a sorted prefix table over composers and pieces. Words
+    containing a query are found through a trigram index over the vocabulary,
+    which is much smaller than the number of items.
+
+    Every item gets an entry number when it is added. Entry numbers only grow,
+    so the posting lists of words stay sorted. Removed items keep their
+    entries, they are just skipped.
+    """
+
+    def __init__(self):
+        # entry -> (type, id), `None` if the item was removed
+        self._keys = []
+        # entry -> folded text
+        self._texts = []
+        # (type, id) -> entry
+        self._entries = {}
+        # word -> entries whose text contains it
+        self._postings = {}
+        # trigram -> words containing it
+        self._vocabulary = {}
+        # entry -> popularity of the item, used for ranking fuzzy matches
+        self._popularity = array('l')
+        # sorted list of (folded text, entry), built on first search
+        self._prefixes = None
+        # spelling correction over the words, built on first fuzzy search
+        self._speller = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, type, id, text, popularity=0):
+        """
+        Add an item, or replace it if it is already in the index
+        """
+        key = (type, id)
+        if key in self._entries:
+            self.remove(type, id)
+
+        entry = len(self._keys)
+        text = fold(text)
+        self._keys.append(key)
+        self._texts.append(text)
+        self._popularity.append(popularity)
+        self._entries[key] = entry
+        for word in text.split():
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = array('l')
+                for t in trigrams(word):
+                    self._vocabulary.setdefault(t, []).append(word)
+                if self._speller is not None:
+                    self._speller.add(word)
+            elif postings[-1] == entry:
+                continue
+            postings.append(entry)
+        if self._prefixes is not None:
+            bisect.insort(self._prefixes, (text, entry))
+
+    def remove(self, type, id):
+        """
+        Remove an item from the index
+        """
+        entry = self._entries.pop((type, id), None)
+        if entry is not None:
+            self._keys[entry] = None
+
+    def search(self, text, limit=50):
+        """
+        Search for items containing all words of `text`. Returns a list of
+        at most `limit` {"type", "id"}: composers first, then pieces starting
+        with `text` and then the pieces containing it.
+        """
+        query = fold(text).strip()
+        words = query.split()
+        if len(words) == 0:
+            return []
+
+        composers = []
+        pieces = []
+        found = set()
+        for entry in self._prefix_matches(query, limit):
+            found.add(entry)
+            if self._keys[entry][0] == "composer":
+                composers.append(entry)
+            else:
+                pieces.append(entry)
+
+        # the remaining matches are taken in the order they were added,
+        # composers were added before pieces
+        for entry in self._infix_matches(words):
+            if entry in found:
+                continue
+            if self._keys[entry][0] == "composer":
+                composers.append(entry)
+            elif len(pieces) < limit:
+                pieces.append(entry)
+            else:
+                break
+
+        results = []
+        for entry in (composers + pieces)[:limit]:
+            type, id = self._keys[entry]
+            results.append({"type": type, "id": id})
+        return results
+
+    def fuzzy_search(self, text, limit=50):
+        """
+        Search for items with words close to the words of `text`. Returns a
+        list of at most `limit` {"type", "id"} ranked by the number of typos
+        and then by popularity.
+        """
+        words = fold(text).split()
+        if len(words) == 0:
+            return []
+        if self._speller is None:
+            self._speller = Speller()
+            for word in self._postings.keys():
+                self._speller.add(word)
+
+        # query word -> {indexed word: distance}
+        corrections = []
+        for word in words:
+            close = {}
+            if len(word) >= 3:
+                for w in self._vocabulary_matches(word):
+                    close[w] = 0
+            for dist, w in self._speller.lookup(word):
+                close.setdefault(w, dist)
+            if len(close) == 0:
+                return []
+            corrections.append(close)
+
+        # candidates come from the query word with the fewest postings, the
+        # closest words first
+        driver = min(corrections, key=lambda close: sum(
+            len(self._postings[w]) for w in close))
+        tiers = {}
+        for w, dist in driver.items():
+            tiers.setdefault(dist, []).append(self._postings[w])
+
+        matches = {}
+        for dist in sorted(tiers.keys()):
+            for entry in heapq.merge(*tiers[dist]):
+                if len(matches) >= limit:
+                    break
+                if entry in matches or self._keys[entry] is None:
+                    continue
+                score = self._fuzzy_score(entry, corrections)
+                if score is not None:
+                    matches[entry] = score
+            if len(matches) >= limit:
+                break
+
+        ranked = sorted(matches.keys(), key=lambda entry: (
+            matches[entry],
+            self._keys[entry][0] != "composer",
+            -self._popularity[entry],
+            entry))
+        results = []
+        for entry in ranked[:limit]:
+            type, id = self._keys[entry]
+            results.append({"type": type, "id": id})
+        return results
+
+    def _fuzzy_score(self, entry, corrections):
+        """
+        Total number of typos of the query in the text of `entry`, `None` if
+        some query word is not there at all
+        """
+        text_words = self._texts[entry].split()
+        score = 0
+        for close in corrections:
+            dists = [close[w] for w in text_words if w in close]
+            if len(dists) == 0:
+                return None
+            score += min(dists)
+        return score
+
+    def _prefix_matches(self, query, limit):
+        """
+        Entries whose text starts with `query`
+        """
+        if self._prefixes is None:
+            self._prefixes = sorted(
+                (text, entry) for entry, text in enumerate(self._texts)
+                if self._keys[entry] is not None)
+
+        matches = []
+        i = bisect.bisect_left(self._prefixes, (query, ))
+        while i < len(self._prefixes) and len(matches) < limit:
+            text, entry = self._prefixes[i]
+            if not text.startswith(query):
+                break
+            if self._keys[entry] is not None:
+                matches.append(entry)
+            i += 1
+        return matches
+
+    def _vocabulary_matches(self, word):
+        """
+        Words of the indexed texts that contain `word`
+        """
+        if len(word) < 3:
+            # shorter than a trigram, scan the vocabulary
+            return [w for w in self._postings if word in w]
+        candidates = []
+        for t in trigrams(word):
+            words = self._vocabulary.get(t)
+            if words is None:
+                return []
+            candidates.append(words)
+        return [w for w in min(candidates, key=len) if word in w]
+
+    def _infix_matches(self, words):
+        """
+        Iterate over entries whose text contains all `words`
+        """
+        # candidates come from the query word with the fewest postings. Words
+        # shorter than a trigram need a scan of the vocabulary, so they are
+        # used only if there is no longer word.
+        long_words = [word for word in words if len(word) >= 3]
+        best = None
+        for word in long_words or words:
+            postings = [self._postings[w]
+                        for w in self._vocabulary_matches(word)]
+            count = sum(len(p) for p in postings)
+            if best is None or count < best[0]:
+                best = (count, postings)
+        if best is None:
+            return
+
+        last = None
+        for entry in heapq.merge(*best[1]):
+            if entry == last or self._keys[entry] is None:
+                continue
+            last = entry
+            text = self._texts[entry]
+            if all(word in text for word in words):
+                yield entry
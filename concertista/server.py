@@ -2,43 +2,26 @@ import os
 import webbrowser
 
 from flask import Flask, request, redirect
-from waitress import serve
-from dotenv import load_dotenv
+from waitress import create_server
 
 import spotipy
 import spotipy.util
 
 from PyQt5 import QtCore
-from pathlib import Path
+from concertista.session import (  # noqa: F401
+    SPOTIFY_REDIRECT_URI, SCOPE, port, caches_folder, session_cache_path,
+    credentials)
+from concertista.Signaler import Signaler, signaler  # noqa: F401
 
-load_dotenv()
-SPOTIFY_CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID')
-SPOTIFY_CLIENT_SECRET = os.getenv('SPOTIFY_CLIENT_SECRET')
-SPOTIFY_REDIRECT_URI = 'http://localhost:9182'
-
-# port where we run  our http server so we can talk to spotify
-port = int(os.environ.get("CONCERTISTA_PORT", 9182))
+SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET = credentials()
 
 app = Flask(__name__)
 
-caches_folder = os.path.join(str(Path.home()), '.cache', 'concertista')
-if not os.path.exists(caches_folder):
-    os.makedirs(caches_folder)
-
-
-def session_cache_path():
-    return os.path.join(caches_folder, 'spotify')
-
 
 @app.route('/')
 def index():
-    scope = ' '.join([
-        'user-read-playback-state',
-        'user-modify-playback-state',
-        'user-read-currently-playing'
-    ])
     auth_manager = spotipy.oauth2.SpotifyOAuth(
-        scope=scope,
+        scope=SCOPE,
         client_id=SPOTIFY_CLIENT_ID,
         client_secret=SPOTIFY_CLIENT_SECRET,
         redirect_uri=SPOTIFY_REDIRECT_URI,
@@ -73,23 +56,14 @@ class ServerThread(QtCore.QThread):
     Server thread for spotify authorization
     """
 
+    # emitted once the server accepts connections
+    listening = QtCore.pyqtSignal()
+
     def run(self):
         """
         Thread body
         """
-        serve(app, host="0.0.0.0", port=port)
-
-
-class Signaler(QtCore.QObject):
-    """
-    Signaler class to communicate with Qt
-    """
-
-    connectToSpotify = QtCore.pyqtSignal(object)
-
-    def __init__(self):
-        super().__init__()
-        pass
-
-
-signaler = Signaler()
+        os.makedirs(caches_folder, exist_ok=True)
+        srv = create_server(app, host="0.0.0.0", port=port)
+        self.listening.emit()
+        srv.run()
@@ -0,0 +1,36 @@
+"""
+session.py
+
+Spotify session settings shared by the authorization server and the rest of
+the app. Importing this module is cheap, it does not pull in Flask or spotipy.
+"""
+
+import os
+from concertista import consts
+
+SPOTIFY_REDIRECT_URI = 'http://localhost:9182'
+SCOPE = ' '.join([
+    'user-read-playback-state',
+    'user-modify-playback-state',
+    'user-read-currently-playing'
+])
+
+# port where we run  our http server so we can talk to spotify
+port = int(os.environ.get("CONCERTISTA_PORT", 9182))
+
+caches_folder = consts.CACHE_DIR
+
+
+def session_cache_path():
+    return os.path.join(caches_folder, 'spotify')
+
+
+def credentials():
+    """
+    Spotify client ID and secret, they are read from the environment or the
+    .env file
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return os.getenv('SPOTIFY_CLIENT_ID'), os.getenv('SPOTIFY_CLIENT_SECRET')
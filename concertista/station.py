@@ -0,0 +1,230 @@
+"""
+station.py
+
+Building of stations, i.e. random sequences of tracks. Used by the GUI and by
+the command line, so it must not depend on Qt.
+"""
+
+import random
+import itertools
+from collections import deque
+
+# if avg. track length is 5 mins, then this will be about 16 hours of music
+MAX_TRACKS = 200
+# number of tracks the playback of an endless station starts with
+INITIAL_TRACKS = 5
+# number of tracks an endless station keeps in the Spotify queue
+LOOKAHEAD = 10
+
+
+def shuffled(population, rng=random):
+    """
+    Iterate over the items of a sequence in random order, without replacement.
+
+    This is the Fisher-Yates shuffle done lazily: instead of permuting the
+    whole sequence upfront, we only remember the positions that were swapped.
+    Taking k items costs O(k) time and memory, regardless of the size of the
+    population.
+    """
+    n = len(population)
+    # position -> index of the item that was swapped into it
+    swapped = {}
+    for i in range(n):
+        j = rng.randrange(i, n)
+        item = swapped.get(j, j)
+        # position i is never looked at again
+        swapped[j] = swapped.pop(i, i)
+        yield population[item]
+
+
+def pieces(db, piece_ids, rng=random, repeat=False, history=None,
+           weights=None):
+    """
+    Iterate over pieces in random order. With `repeat`, the pieces are
+    reshuffled and played again once all of them were played. If `weights`
+    (a `weights.WeightTable`) is given, pieces are drawn from it in
+    proportion to their weights instead, and `piece_ids` is not used.
+
+    Pieces in `history` (recently played ones) are put off until the other
+    pieces were played. The pieces that are yielded are added to `history`.
+    """
+    while True:
+        found = False
+        # recently played pieces, there are at most `len(history)` of them
+        put_off = []
+        if weights is None:
+            order = shuffled(piece_ids, rng)
+        else:
+            order = weights.sample(rng)
+        for id in order:
+            if history is not None and id in history:
+                put_off.append(id)
+                continue
+            piece = db.get_piece(id)
+            if piece is not None:
+                found = True
+                if history is not None:
+                    history.add(id)
+                yield piece
+        for id in put_off:
+            piece = db.get_piece(id)
+            if piece is not None:
+                found = True
+                history.add(id)
+                yield piece
+        if not repeat or not found:
+            return
+
+
+def tracks(db, piece_ids, rng=random, repeat=False, history=None,
+           weights=None):
+    """
+    Iterate over Spotify URIs of the tracks of a station
+    """
+    for piece in pieces(db, piece_ids, rng, repeat, history, weights):
+        for track in piece['tracks']:
+            yield "spotify:track:{}".format(track)
+
+
+def randomize_pieces(db, piece_ids, max_tracks=MAX_TRACKS, rng=random,
+                     max_duration=None, history=None, weights=None):
+    """
+    Randomize list of pieces and return Spotify URIs of their tracks. The
+    station ends after `max_tracks` tracks or, if given, after `max_duration`
+    seconds of music according to the track durations cached by `db`. Pieces
+    are not split, so the last one can go over the limit. Pieces in
+    `history` are played last. Pieces are drawn from `weights` if given.
+    """
+    if max_duration is not None:
+        track_durations = db.get_track_durations()
+        remaining_ms = max_duration * 1000
+    uris = []
+    for piece in pieces(db, piece_ids, rng, history=history,
+                        weights=weights):
+        for track in piece['tracks']:
+            uris.append("spotify:track:{}".format(track))
+        if max_duration is not None:
+            remaining_ms -= track_durations.piece_duration(piece)
+            if remaining_ms <= 0:
+                break
+        elif len(uris) >= max_tracks:
+            break
+    return uris
+
+
+class Feeder:
+    """
+    Plays an endless station. The playback starts with a few tracks and more
+    tracks are added into the Spotify queue as the playback advances, so
+    there are always about `lookahead` tracks waiting.
+
+    Spotify plays queued tracks before the rest of the playback context, so
+    nothing is queued until the last track of the initial batch is playing.
+
+    `start` and `update` call Spotify. `begin` and `advance` only draw the
+    tracks, so callers can send them to Spotify on their own, and `spotify`
+    can be `None` then.
+    """
+
+    def __init__(self, spotify, device_id, uris,
+                 initial=INITIAL_TRACKS, lookahead=LOOKAHEAD):
+        self.device_id = device_id
+        self._spotify = spotify
+        self._uris = iter(uris)
+        self._initial = initial
+        self._lookahead = lookahead
+        # URIs sent to Spotify, starting with the one that is playing
+        self._sent = deque()
+        # number of tracks in `_sent` that belong to the playback context
+        self._in_context = 0
+        self.active = False
+
+    def start(self):
+        """
+        Start the playback. Returns `False` if the station has no tracks.
+        """
+        uris = self.begin()
+        if len(uris) == 0:
+            return False
+        self._spotify.start_playback(device_id=self.device_id, uris=uris)
+        return True
+
+    def begin(self):
+        """
+        Draw the tracks the playback starts with, without calling Spotify.
+        Returns an empty list if the station has no tracks.
+        """
+        uris = list(itertools.islice(self._uris, self._initial))
+        if len(uris) == 0:
+            return uris
+        self._sent.extend(uris)
+        self._in_context = len(uris)
+        self.active = True
+        return uris
+
+    def stop(self):
+        """
+        Stop feeding. Tracks that were already queued are still played.
+        """
+        self.active = False
+
+    def update(self, playback):
+        """
+        Top up the queue according to the current playback state (as returned
+        by `spotify.current_playback`). Returns `False` once the station is
+        over, i.e. when the tracks ran out or the user started to play an
+        album or a playlist.
+        """
+        if not self.active:
+            return False
+        for uri in self.advance(playback):
+            self._spotify.add_to_queue(uri, device_id=self.device_id)
+        return self.active
+
+    def advance(self, playback):
+        """
+        Follow the playback and draw the tracks that have to be queued next,
+        without calling Spotify
+        """
+        if not self.active:
+            return []
+        if playback is None or playback.get('item') is None:
+            return []
+
+        if playback.get('context') is not None:
+            # our tracks are played without a context, the user started an
+            # album or a playlist
+            self.stop()
+            return []
+
+        item = playback['item']
+        # Spotify can replace a track with its version for the user's market
+        uri = (item.get('linked_from') or item)['uri']
+        try:
+            position = self._sent.index(uri)
+        except ValueError:
+            # the user went back with Previous, or played a single track
+            # for a moment; we continue once one of our tracks plays again
+            return []
+
+        for _ in range(position):
+            self._sent.popleft()
+        self._in_context = max(self._in_context - position, 0)
+        if self._in_context <= 1:
+            return self.feed()
+        return []
+
+    def feed(self):
+        """
+        Draw tracks until there are `lookahead` tracks after the playing one.
+        Returns the tracks to be queued.
+        """
+        uris = []
+        while len(self._sent) <= self._lookahead:
+            uri = next(self._uris, None)
+            if uri is None:
+                self.active = False
+                break
+            self._sent.append(uri)
+            uris.append(uri)
+        return uris
@@ -0,0 +1,268 @@
+"""
+tracing.py
+
+Instrumentation of the startup. It is enabled by setting CONCERTISTA_TRACE to
+the name of the output file or by passing `--trace[=FILE]` on the command line.
+Wall and CPU time of the marked phases and of every imported module is
+written in the Chrome trace event format, so it can be viewed in
+chrome://tracing or https://ui.perfetto.dev and compared across releases.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import functools
+import threading
+import contextlib
+from importlib import abc
+
+ENV_VAR = 'CONCERTISTA_TRACE'
+DEFAULT_FILE_NAME = 'concertista-trace.json'
+
+_tracer = None
+
+
+class Tracer:
+    """
+    Collects trace events and writes them into a file
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self._events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+
+    def timestamp(self, t):
+        """
+        Convert `time.perf_counter()` into microseconds since the start
+        """
+        return (t - self._origin) * 1e6
+
+    def complete(self, name, category, start, end, cpu, args=None):
+        """
+        Add a phase that started at `start` and ended at `end` and used `cpu`
+        seconds of CPU time
+        """
+        args = dict(args or {})
+        args['cpu_ms'] = round(cpu * 1e3, 3)
+        self._add({
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': self.timestamp(start),
+            'dur': (end - start) * 1e6,
+            'args': args
+        })
+
+    def instant(self, name, category):
+        """
+        Add an event without duration
+        """
+        self._add({
+            'name': name,
+            'cat': category,
+            'ph': 'i',
+            's': 'p',
+            'ts': self.timestamp(time.perf_counter())
+        })
+
+    def _add(self, event):
+        event['pid'] = self._pid
+        event['tid'] = threading.get_ident()
+        with self._lock:
+            self._events.append(event)
+
+    def write(self):
+        """
+        Write the trace into the file
+        """
+        with self._lock:
+            events = list(self._events)
+        threads = {e['tid'] for e in events}
+        for tid in threads:
+            if tid == threading.main_thread().ident:
+                name = "main"
+            else:
+                name = "thread {}".format(tid)
+            events.append({
+                'name': 'thread_name', 'ph': 'M', 'pid': self._pid,
+                'tid': tid, 'args': {'name': name}
+            })
+
+        trace = {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'argv': sys.argv,
+                'python': sys.version
+            }
+        }
+        try:
+            with open(self.file_name, 'w') as f:
+                json.dump(trace, f)
+        except OSError:
+            print("Error writing trace:", self.file_name)
+
+
+class _ImportTimer(abc.MetaPathFinder):
+    """
+    Measures how long executing each imported module takes. Times include
+    the imports done by the module, the time spent in the module itself is
+    stored as `self_ms`.
+    """
+
+    def __init__(self, tracer):
+        self._tracer = tracer
+        self._local = threading.local()
+
+    def find_spec(self, fullname, path, target=None):
+        spec = None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        if spec is None:
+            return None
+
+        loader = spec.loader
+        # built-in and frozen modules share one loader class, they are not
+        # worth measuring anyway
+        if (loader is not None and not isinstance(loader, type) and
+                hasattr(loader, 'exec_module')):
+            # loaders can be shared by many modules (e.g. zipimporter or
+            # PyInstaller's FrozenImporter), so we wrap them per module
+            spec.loader = _TimedLoader(self, fullname, loader)
+        return spec
+
+    def timed(self, fullname, exec_module, module):
+        """
+        Execute a module and record how long it took
+        """
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            exec_module(module)
+        finally:
+            end = time.perf_counter()
+            cpu = time.thread_time() - cpu
+            children = stack.pop()
+            if len(stack) > 0:
+                stack[-1] += end - start
+            self._tracer.complete(
+                fullname, 'import', start, end, cpu,
+                {'self_ms': round((end - start - children) * 1e3, 3)})
+
+
+class _TimedLoader(abc.Loader):
+    """
+    Loader of one module that times executing it and passes everything else
+    to the real loader
+    """
+
+    def __init__(self, timer, fullname, loader):
+        self._timer = timer
+        self._fullname = fullname
+        self._loader = loader
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._timer.timed(self._fullname, self._loader.exec_module, module)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+def setup(argv=None):
+    """
+    Start tracing if requested by the environment or by `--trace[=FILE]` in
+    `argv`. The option is removed from `argv`. Returns `True` if tracing is
+    enabled.
+    """
+    global _tracer
+
+    file_name = os.environ.get(ENV_VAR) or None
+    if argv is not None:
+        for arg in list(argv[1:]):
+            if arg == '--trace':
+                file_name = file_name or DEFAULT_FILE_NAME
+                argv.remove(arg)
+            elif arg.startswith('--trace='):
+                file_name = arg[len('--trace='):] or DEFAULT_FILE_NAME
+                argv.remove(arg)
+    if file_name is None or _tracer is not None:
+        return _tracer is not None
+
+    _tracer = Tracer(file_name)
+    sys.meta_path.insert(0, _ImportTimer(_tracer))
+    atexit.register(finish)
+    return True
+
+
+def enabled():
+    """
+    Check if tracing is enabled
+    """
+    return _tracer is not None
+
+
+def finish():
+    """
+    Stop tracing and write the trace
+    """
+    global _tracer
+
+    if _tracer is None:
+        return
+    sys.meta_path[:] = [
+        f for f in sys.meta_path if not isinstance(f, _ImportTimer)]
+    _tracer.write()
+    _tracer = None
+
+
+@contextlib.contextmanager
+def span(name, category='phase'):
+    """
+    Record wall and CPU time of the enclosed block
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield
+    finally:
+        tracer.complete(
+            name, category, start, time.perf_counter(),
+            time.thread_time() - cpu)
+
+
+def traced(func):
+    """
+    Decorator recording wall and CPU time of each call of `func`
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(func.__qualname__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def instant(name, category='phase'):
+    """
+    Mark a moment, like the start of the event loop
+    """
+    if _tracer is not None:
+        _tracer.instant(name, category)
@@ -0,0 +1,141 @@
+"""
+weights.py
+
+Drawing pieces in proportion to their weights, so that, for example, a
+composer with many short pieces does not crowd out one with a few symphonies.
+"""
+
+import random
+import bisect
+import itertools
+from array import array
+from concertista import durations
+
+# all pieces are equally likely
+UNIFORM = 'uniform'
+# pieces with more tracks are more likely
+TRACKS = 'tracks'
+# longer pieces are more likely
+DURATION = 'duration'
+
+MODES = (UNIFORM, TRACKS, DURATION)
+
+
+def piece_weight(piece, mode, track_durations=None):
+    """
+    Weight of a piece for sampling `mode`
+    """
+    if mode == TRACKS:
+        return len(piece['tracks'])
+    elif mode == DURATION:
+        if track_durations is None:
+            return len(piece['tracks']) * durations.DEFAULT_DURATION_MS
+        return track_durations.piece_duration(piece)
+    return 1
+
+
+class WeightTable:
+    """
+    Cumulative weights of pieces. A piece is drawn by a binary search for a
+    random point in [0, total), so each draw is O(log n) and the table is
+    built only once for many stations.
+    """
+
+    def __init__(self, piece_ids, weights):
+        self.piece_ids = list(piece_ids)
+        self.cumulative = array('d', itertools.accumulate(weights))
+        # version of the track durations the weights were computed from
+        self.durations_version = None
+
+    @classmethod
+    def build(cls, db, piece_ids, mode, composer_weights=None,
+              track_durations=None):
+        """
+        Build the table for pieces of `db`. The weight of a piece is
+        multiplied by the weight of its composer from `composer_weights`.
+        """
+        composer_weights = composer_weights or {}
+        ids = []
+        weights = []
+        for id in piece_ids:
+            piece = db.get_piece(id)
+            if piece is None:
+                continue
+            weight = piece_weight(piece, mode, track_durations)
+            weight *= composer_weights.get(piece['composer_id'], 1.0)
+            ids.append(id)
+            weights.append(weight)
+        table = cls(ids, weights)
+        if track_durations is not None:
+            table.durations_version = track_durations.version
+        return table
+
+    def __len__(self):
+        return len(self.piece_ids)
+
+    @property
+    def total(self):
+        """
+        Sum of all weights
+        """
+        if len(self.cumulative) == 0:
+            return 0.0
+        return self.cumulative[-1]
+
+    def weight(self, index):
+        """
+        Weight of the piece at `index`
+        """
+        if index == 0:
+            return self.cumulative[0]
+        return self.cumulative[index] - self.cumulative[index - 1]
+
+    def _index(self, rng):
+        i = bisect.bisect_right(self.cumulative, rng.random() * self.total)
+        # rounding can put us past the last piece
+        return min(i, len(self.cumulative) - 1)
+
+    def draw(self, rng=random):
+        """
+        Draw one piece ID, or `None` if all weights are zero
+        """
+        if self.total <= 0:
+            return None
+        return self.piece_ids[self._index(rng)]
+
+    def sample(self, rng=random):
+        """
+        Iterate over piece IDs in random order, without replacement. Pieces
+        with zero weight are never drawn.
+
+        Pieces that were drawn already are rejected. Once they make up half
+        of the total weight, the table is rebuilt from the remaining pieces,
+        so a draw takes two tries on average.
+        """
+        table = self
+        drawn = set()
+        removed = 0.0
+        while True:
+            if removed * 2 > table.total or table.total <= 0:
+                ids = []
+                weights = []
+                for i, id in enumerate(table.piece_ids):
+                    weight = table.weight(i)
+                    if i not in drawn and weight > 0:
+                        ids.append(id)
+                        weights.append(weight)
+                if len(ids) == 0:
+                    return
+                table = WeightTable(ids, weights)
+                drawn = set()
+                removed = 0.0
+
+            i = table._index(rng)
+            if i in drawn:
+                continue
+            weight = table.weight(i)
+            if weight <= 0:
+                continue
+            drawn.add(i)
+            removed += weight
+            yield table.piece_ids[i]
@@ -1,5 +1,44 @@
 import pytest
 from unittest.mock import MagicMock
+from concertista.durations import TrackDurations
+from concertista.records import Composer, Piece
+
+
+class FakeDB:
+    """
+    Stand-in for `DB` with a handful of pieces held in memory
+    """
+
+    def __init__(self, composers, pieces):
+        self._composers = {c.id: c for c in composers}
+        self._pieces = {p.id: p for p in pieces}
+        self._track_durations = TrackDurations()
+
+    def get_composers(self):
+        return self._composers
+
+    def get_composer_pieces(self, composer_id):
+        return [id for id, p in self._pieces.items()
+                if p.composer_id == composer_id]
+
+    def get_piece_ids(self):
+        return list(self._pieces)
+
+    def get_piece(self, id):
+        return self._pieces.get(id)
+
+    def get_track_durations(self):
+        return self._track_durations
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """
+    Keep snapshots, history and covers out of the user's cache directory
+    """
+    path = str(tmp_path / 'cache')
+    monkeypatch.setattr('concertista.consts.CACHE_DIR', path)
+    yield path
 
 
 @pytest.fixture
@@ -8,6 +47,8 @@ def main_window(qtbot):
     main = MainWindow()
     qtbot.addWidget(main)
     yield main
+    main._spotify_worker.cancelAll()
+    main._spotify_worker.waitForDone()
 
 
 @pytest.fixture
@@ -16,3 +57,31 @@ def pref_dlg(qtbot, main_window):
     db = MagicMock()
     dlg = PreferencesWindow(db, main_window)
     yield dlg
+
+
+@pytest.fixture
+def fake_db():
+    return FakeDB(
+        [Composer('c1', 'One'), Composer('c2', 'Two')],
+        [
+            Piece('a', 'c1', 'A', 'al1', tracks=['1']),
+            Piece('b', 'c2', 'B', 'al1', tracks=['2', '3']),
+            Piece('c', 'c1', 'C', 'al2', tracks=['4', '5', '6']),
+            Piece('d', 'c3', 'D', tracks=['7', '8'])
+        ])
+
+
+@pytest.fixture
+def query_index(fake_db):
+    from concertista.query import QueryIndex
+    return QueryIndex(fake_db)
+
+
+@pytest.fixture
+def worker(qtbot):
+    from concertista.SpotifyWorker import SpotifyWorker
+    worker = SpotifyWorker()
+    worker.setSpotify(MagicMock())
+    yield worker
+    worker.cancelAll()
+    worker.waitForDone()
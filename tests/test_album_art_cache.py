@@ -0,0 +1,88 @@
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from PyQt5 import QtCore, QtGui, QtNetwork
+from concertista.AlbumArtCache import AlbumArtCache, cover_url
+
+
+def make_reply(url, width=300, error=QtNetwork.QNetworkReply.NoError):
+    img = QtGui.QImage(width, width, QtGui.QImage.Format_RGB32)
+    img.fill(QtGui.QColor('red'))
+    data = QtCore.QByteArray()
+    buf = QtCore.QBuffer(data)
+    buf.open(QtCore.QIODevice.WriteOnly)
+    img.save(buf, 'PNG')
+    reply = MagicMock()
+    reply.request().url().toString.return_value = url
+    reply.error.return_value = error
+    reply.readAll.return_value = data
+    return reply
+
+
+@pytest.fixture
+def cache(qtbot, tmp_path):
+    yield AlbumArtCache(str(tmp_path), 128)
+
+
+def test_cover_url():
+    images = [
+        {'height': 640, 'url': 'large'},
+        {'height': 300, 'url': 'medium'},
+        {'height': 64, 'url': 'small'}
+    ]
+    assert cover_url(images, 128) == 'medium'
+    assert cover_url(images, 1000) == 'large'
+    assert cover_url([], 128) is None
+
+
+def test_download(qtbot, cache):
+    with patch.object(cache._nam, 'get') as get:
+        cache.fetch('http://a')
+        cache.fetch('http://a')
+    get.assert_called_once()
+
+    with qtbot.waitSignal(cache.coverReady, timeout=1000) as blocker:
+        cache.onReply(make_reply('http://a'))
+    url, pixmap = blocker.args
+    assert url == 'http://a'
+    assert pixmap.width() == 128
+    assert os.path.exists(cache.file_name('http://a'))
+
+    # cached now
+    with patch.object(cache._nam, 'get') as get:
+        with qtbot.waitSignal(cache.coverReady, timeout=1000):
+            cache.fetch('http://a')
+    get.assert_not_called()
+
+
+def test_download_error(qtbot, cache):
+    reply = make_reply(
+        'http://a', error=QtNetwork.QNetworkReply.HostNotFoundError)
+    cache.onReply(reply)
+    assert cache.cover('http://a') is None
+
+
+def test_disk(qtbot, tmp_path, cache):
+    cache.onReply(make_reply('http://a'))
+    # a new session only has the thumbnails
+    cache = AlbumArtCache(str(tmp_path), 128)
+    pixmap = cache.cover('http://a')
+    assert pixmap is not None and pixmap.width() == 128
+    assert 'http://a' in cache._pixmaps
+
+
+def test_memory_eviction(qtbot, cache):
+    cache.MEMORY_ITEMS = 2
+    for url in ['a', 'b', 'c']:
+        cache.onReply(make_reply(url, width=16))
+    assert list(cache._pixmaps) == ['b', 'c']
+
+
+def test_disk_eviction(qtbot, cache):
+    cache.onReply(make_reply('a'))
+    size = os.path.getsize(cache.file_name('a'))
+    os.utime(cache.file_name('a'), (0, 0))
+    cache.DISK_BYTES = size
+    cache.onReply(make_reply('b'))
+    assert not os.path.exists(cache.file_name('a'))
+    assert os.path.exists(cache.file_name('b'))
@@ -0,0 +1,28 @@
+from benchmarks import catalog
+from concertista.assets import Assets
+from concertista.DB import DB
+
+
+def test_generate(qtbot, tmp_path, monkeypatch):
+    path = str(tmp_path / 'catalog')
+    assert catalog.is_generated(path, 100) is False
+    num_composers = catalog.generate(path, 100, seed=1)
+    assert catalog.is_generated(path, 100, seed=1)
+    assert catalog.is_generated(path, 100, seed=2) is False
+
+    monkeypatch.setattr(Assets(), 'music_dir', path)
+    db = DB(cache_dir=False)
+    db.load()
+    assert len(db.get_composers()) == num_composers
+    assert len(db.get_pieces()) == 100
+    for piece in db.get_pieces().values():
+        assert piece['composer_id'] in db.get_composers()
+        assert 1 <= piece.num_tracks() <= 8
+
+
+def test_generate_is_deterministic(tmp_path):
+    catalog.generate(str(tmp_path / 'a'), 20, seed=3)
+    catalog.generate(str(tmp_path / 'b'), 20, seed=3)
+    a = (tmp_path / 'a' / 'composers.yml').read_text()
+    b = (tmp_path / 'b' / 'composers.yml').read_text()
+    assert a == b
@@ -0,0 +1,129 @@
+import os
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+from concertista.assets import Assets
+from concertista.DB import DB
+from concertista.CatalogWatcher import CatalogWatcher
+from concertista.PreferencesWindow import PreferencesWindow
+
+dir = Path(__file__).parent
+
+PIECE = """album_id: a987
+composer_id: 1234
+id: {}
+name: {}
+tracks:
+- 123
+"""
+
+
+def make_db(tmp_path, monkeypatch):
+    music_dir = tmp_path / 'music'
+    shutil.copytree(os.path.join(dir, 'assets', 'music'), music_dir)
+    monkeypatch.setattr(Assets(), 'music_dir', str(music_dir))
+    db = DB(cache_dir=False)
+    db.load()
+    return db, music_dir / 'tracks' / 'c1'
+
+
+def test_update_files(qtbot, tmp_path, monkeypatch):
+    db, tracks_dir = make_db(tmp_path, monkeypatch)
+    model = db.get_completer_model()
+    assert model.rowCount() == 2
+
+    fn = tracks_dir / 'op.2.yml'
+    fn.write_text(PIECE.format('id002', 'Piece 2'))
+    assert db.update_files([str(fn)]) == (['id002'], [], [])
+    assert db._pieces_by_composers[1234] == ['id001', 'id002']
+    assert model.rowCount() == 3
+    assert model.index(2).data() == 'Piece 2: Composer 1'
+
+    fn.write_text(PIECE.format('id002', 'Piece 2 (rev)'))
+    assert db.update_files([str(fn)]) == ([], ['id002'], [])
+    assert model.index(2).data() == 'Piece 2 (rev): Composer 1'
+
+    # unchanged file is not reported
+    assert db.update_files([str(fn)]) == ([], [], [])
+
+    os.remove(fn)
+    assert db.update_files([str(fn)]) == ([], [], ['id002'])
+    assert 'id002' not in db._pieces
+    assert model.rowCount() == 2
+
+
+def test_watcher_update(qtbot, tmp_path, monkeypatch):
+    db, tracks_dir = make_db(tmp_path, monkeypatch)
+    watcher = CatalogWatcher(db)
+    watcher.start()
+
+    (tracks_dir / 'op.2.yml').write_text(PIECE.format('id002', 'Piece 2'))
+    os.remove(tracks_dir / 'op.1.yml')
+    watcher.onDirectoryChanged(str(tracks_dir))
+    with qtbot.waitSignal(watcher.catalogChanged) as blocker:
+        watcher.update()
+    assert blocker.args == [['id002'], [], ['id001']]
+
+    new_dir = tracks_dir.parent / 'c2'
+    new_dir.mkdir()
+    (new_dir / 'op.3.yml').write_text(PIECE.format('id003', 'Piece 3'))
+    watcher.onDirectoryChanged(str(tracks_dir.parent))
+    with qtbot.waitSignal(watcher.catalogChanged) as blocker:
+        watcher.update()
+    assert blocker.args == [['id003'], [], []]
+
+    watcher.stop()
+
+
+def test_watcher_modified_file(qtbot, tmp_path, monkeypatch):
+    db, tracks_dir = make_db(tmp_path, monkeypatch)
+    watcher = CatalogWatcher(db)
+    watcher.start()
+    assert watcher._watcher.files() == []
+
+    # saved by an editor: written to a temporary file and renamed
+    tmp = tracks_dir / 'op.1.yml~'
+    tmp.write_text(PIECE.format('id001', 'Piece 1 (rev)'))
+    os.utime(tmp, ns=(0, 0))
+    os.replace(tmp, tracks_dir / 'op.1.yml')
+    (tracks_dir / 'op.2.yml').write_text(PIECE.format('id002', 'Piece 2'))
+    watcher.onDirectoryChanged(str(tracks_dir))
+    with patch.object(db, 'update_files', wraps=db.update_files) as update:
+        with qtbot.waitSignal(watcher.catalogChanged) as blocker:
+            watcher.update()
+    assert blocker.args == [['id002'], ['id001'], []]
+    update.assert_called_once_with([
+        str(tracks_dir / 'op.1.yml'), str(tracks_dir / 'op.2.yml')
+    ])
+
+    # nothing changed, nothing is re-read
+    watcher.onDirectoryChanged(str(tracks_dir))
+    with patch.object(db, 'update_files', return_value=([], [], [])) as \
+            update:
+        watcher.update()
+    update.assert_called_once_with([])
+
+    watcher.stop()
+
+
+def test_preferences_catalog_changed(qtbot, tmp_path, monkeypatch):
+    db, tracks_dir = make_db(tmp_path, monkeypatch)
+    dlg = PreferencesWindow(db)
+    qtbot.addWidget(dlg)
+    composer_item = dlg._composer_items[1234]
+    assert composer_item.rowCount() == 1
+
+    fn = tracks_dir / 'op.2.yml'
+    fn.write_text(PIECE.format('id002', 'Piece 2'))
+    dlg.onCatalogChanged(*db.update_files([str(fn)]))
+    assert composer_item.rowCount() == 2
+    assert composer_item.child(1).text() == 'Piece 2'
+
+    fn.write_text(PIECE.format('id002', 'Piece 2 (rev)'))
+    dlg.onCatalogChanged(*db.update_files([str(fn)]))
+    assert composer_item.child(1).text() == 'Piece 2 (rev)'
+
+    os.remove(fn)
+    dlg.onCatalogChanged(*db.update_files([str(fn)]))
+    assert composer_item.rowCount() == 1
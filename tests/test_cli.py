@@ -0,0 +1,180 @@
+import os
+import sys
+import subprocess
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from concertista import cli
+from concertista.DB import DB
+from concertista.durations import TrackDurations
+from concertista.history import History
+
+dir = Path(__file__).parent
+DVORAK = '6n7nd5iceYpXVwcx8VPpxF'
+
+
+@pytest.fixture
+def db():
+    db = DB(cache_dir=False)
+    db.load()
+    return db
+
+
+def test_find_composer(db):
+    assert cli.find_composer(db, DVORAK) == DVORAK
+    assert cli.find_composer(db, 'antonín dvořák') == DVORAK
+    assert cli.find_composer(db, 'dvorak') == DVORAK
+    assert cli.find_composer(db, 'dvorjak') == DVORAK
+    assert cli.find_composer(db, 'nobody') is None
+
+
+def test_find_piece(db):
+    piece_id = next(iter(db.get_pieces()))
+    assert cli.find_piece(db, piece_id) == piece_id
+    assert cli.find_piece(db, 'nothing like this') is None
+
+
+def test_find_device():
+    spotify = MagicMock()
+    spotify.devices.return_value = {'devices': [
+        {'id': 'd1', 'name': 'Kitchen', 'is_active': False},
+        {'id': 'd2', 'name': 'Laptop', 'is_active': True}
+    ]}
+    assert cli.find_device(spotify, None) == 'd2'
+    assert cli.find_device(spotify, 'kitchen') == 'd1'
+    assert cli.find_device(spotify, 'd1') == 'd1'
+    with pytest.raises(SystemExit):
+        cli.find_device(spotify, 'Car')
+
+
+def test_station_dry_run(db, capsys):
+    with patch('concertista.cli.create_db', return_value=db):
+        assert cli.main(
+            ['station', '--composer', 'dvorak', '--dry-run']) == 0
+
+    uris = capsys.readouterr().out.split()
+    assert len(uris) > 0
+    tracks = set()
+    for id in db.get_composer_pieces(DVORAK):
+        tracks.update(db.get_piece(id)['tracks'])
+    for uri in uris:
+        assert uri.startswith('spotify:track:')
+        assert uri[len('spotify:track:'):] in tracks
+
+
+def test_station(db):
+    spotify = MagicMock()
+    spotify.devices.return_value = {'devices': [
+        {'id': 'd1', 'name': 'Kitchen', 'is_active': False}
+    ]}
+    with patch('concertista.cli.create_db', return_value=db), \
+            patch('concertista.cli.connect', return_value=spotify):
+        assert cli.main(['station', '--device', 'Kitchen']) == 0
+
+    spotify.start_playback.assert_called_once()
+    assert spotify.start_playback.call_args[1]['device_id'] == 'd1'
+
+
+def test_station_endless(db):
+    spotify = MagicMock()
+    spotify.devices.return_value = {'devices': [
+        {'id': 'd1', 'name': 'Kitchen', 'is_active': True}
+    ]}
+    spotify.current_playback.side_effect = [None, {
+        'item': {'uri': 'other'},
+        'context': {'uri': 'spotify:album:x'}
+    }]
+    with patch('concertista.cli.create_db', return_value=db), \
+            patch('concertista.cli.connect', return_value=spotify), \
+            patch('concertista.cli.time.sleep') as sleep:
+        assert cli.main(['station', '--endless']) == 0
+
+    spotify.start_playback.assert_called_once()
+    sleep.assert_called_once()
+
+
+def test_station_hours(db, capsys):
+    with patch('concertista.cli.create_db', return_value=db):
+        cli.main(['station', '--hours', '1', '--dry-run'])
+    short = capsys.readouterr().out.split()
+    with patch('concertista.cli.create_db', return_value=db):
+        cli.main(['station', '--hours', '100', '--dry-run'])
+    long = capsys.readouterr().out.split()
+    assert 0 < len(short) < len(long)
+
+
+def test_durations(db, capsys):
+    spotify = MagicMock()
+    spotify.tracks.return_value = {'tracks': []}
+    db._track_durations = TrackDurations()
+    with patch('concertista.cli.create_db', return_value=db), \
+            patch('concertista.cli.connect', return_value=spotify):
+        assert cli.main(['durations']) == 0
+    assert spotify.tracks.call_count > 0
+    assert len(db.get_track_durations().missing(db.get_track_ids())) == 0
+
+    with patch('concertista.cli.create_db', return_value=db), \
+            patch('concertista.cli.connect') as connect:
+        assert cli.main(['durations']) == 0
+    connect.assert_not_called()
+
+
+def test_station_history(db, tmp_path):
+    spotify = MagicMock()
+    spotify.devices.return_value = {'devices': [
+        {'id': 'd1', 'name': 'Kitchen', 'is_active': True}
+    ]}
+    with patch('concertista.cli.create_db', return_value=db), \
+            patch('concertista.cli.connect', return_value=spotify), \
+            patch('concertista.consts.CACHE_DIR', str(tmp_path)):
+        cli.main(['station', '--horizon', '3'])
+        cli.main(['station', '--horizon', '3', '--dry-run'])
+
+    played = History(str(tmp_path))
+    played.load()
+    assert len(played) == 3
+
+
+def test_piece_ids(db):
+    def ids(argv):
+        return sorted(cli.piece_ids(db, cli.parser().parse_args(
+            ['station'] + argv)))
+
+    dvorak = sorted(db.get_composer_pieces(DVORAK))
+    assert ids(['--composer', 'dvorak']) == dvorak
+    assert ids([]) == sorted(db.get_piece_ids())
+    assert ids(['--exclude-composer', 'dvorak']) == sorted(
+        set(db.get_piece_ids()) - set(dvorak))
+
+    short = ids(['--composer', 'dvorak', '--max-tracks', '2'])
+    assert all(len(db.get_piece(id)['tracks']) <= 2 for id in short)
+    assert set(short) < set(dvorak)
+
+    piece = db.get_piece(dvorak[0])
+    assert dvorak[0] in ids(['--album', piece['album_id']])
+    other = next(id for id in db.get_piece_ids() if id not in dvorak)
+    assert ids(['--composer', 'dvorak', '--piece', other]) == sorted(
+        dvorak + [other])
+
+
+def test_unknown_composer(db):
+    with patch('concertista.cli.create_db', return_value=db), \
+            pytest.raises(SystemExit):
+        cli.main(['station', '--composer', 'nobody'])
+
+
+def test_no_qt(tmp_path):
+    env = dict(os.environ)
+    env['HOME'] = str(tmp_path)
+    env.pop('CONCERTISTA_DB', None)
+    script = (
+        "import sys\n"
+        "from concertista import cli\n"
+        "cli.main(['station', '--composer', 'dvorak', '--dry-run'])\n"
+        "assert not [m for m in sys.modules if m.startswith('PyQt5')]\n")
+    result = subprocess.run(
+        [sys.executable, '-c', script], env=env, stdout=subprocess.PIPE,
+        cwd=str(dir.parent))
+    assert result.returncode == 0
+    assert result.stdout.startswith(b'spotify:track:')
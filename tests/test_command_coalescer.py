@@ -0,0 +1,62 @@
+import threading
+from concertista.CommandCoalescer import CommandCoalescer
+
+
+def test_latest_wins(qtbot, worker):
+    release = threading.Event()
+    spotify = worker.spotify()
+    spotify.volume.side_effect = lambda *args, **kwargs: release.wait(5)
+    coalescer = CommandCoalescer(worker, 'volume')
+    for value in range(10):
+        coalescer.send('dev', value, device_id='dev')
+    # the first value is sent right away, the rest is coalesced
+    qtbot.waitUntil(lambda: spotify.volume.call_count == 1)
+    coalescer.flush()
+    assert spotify.volume.call_count == 1
+
+    release.set()
+    qtbot.waitUntil(coalescer.isIdle)
+    assert spotify.volume.call_count == 2
+    spotify.volume.assert_called_with(9, device_id='dev')
+
+
+def test_interval(qtbot, worker):
+    spotify = worker.spotify()
+    coalescer = CommandCoalescer(worker, 'volume')
+    coalescer._timer.setInterval(60000)
+    coalescer.send('dev', 1)
+    qtbot.waitUntil(lambda: spotify.volume.call_count == 1)
+    coalescer.send('dev', 2)
+    coalescer.send('dev', 3)
+    qtbot.wait(50)
+    assert spotify.volume.call_count == 1
+
+    coalescer.flush()
+    qtbot.waitUntil(coalescer.isIdle)
+    assert spotify.volume.call_count == 2
+    spotify.volume.assert_called_with(3)
+
+
+def test_keys(qtbot, worker):
+    spotify = worker.spotify()
+    coalescer = CommandCoalescer(worker, 'volume')
+    coalescer.send('a', 1, device_id='a')
+    coalescer.send('b', 2, device_id='b')
+    qtbot.waitUntil(coalescer.isIdle)
+    assert spotify.volume.call_count == 2
+
+
+def test_failed(qtbot, worker):
+    worker.spotify().volume.side_effect = RuntimeError("rate limit")
+    coalescer = CommandCoalescer(worker, 'volume')
+    with qtbot.waitSignal(coalescer.failed, timeout=1000):
+        coalescer.send('dev', 1)
+    assert coalescer.isIdle()
+
+
+def test_cancel(qtbot, worker):
+    coalescer = CommandCoalescer(worker, 'volume')
+    coalescer.send('dev', 1)
+    coalescer.send('dev', 2)
+    coalescer.cancel()
+    assert coalescer.isIdle()
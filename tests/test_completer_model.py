@@ -0,0 +1,110 @@
+from PyQt5 import QtCore, QtGui
+from concertista.CompleterModel import CompleterModel
+from concertista.records import Composer, Piece
+
+
+def make_model():
+    composers = {
+        'c1': Composer('c1', 'Composer 1'),
+        'c2': Composer('c2', 'Composer 2')
+    }
+    pieces = {
+        'p1': Piece('p1', 'c1', 'Piece 1'),
+        'p2': Piece('p2', 'c2', 'Piece 2')
+    }
+    return composers, pieces, CompleterModel(composers, pieces)
+
+
+def test_data(qtmodeltester):
+    composers, pieces, model = make_model()
+    qtmodeltester.check(model)
+
+    assert model.rowCount() == 4
+    idx = model.index(0)
+    assert idx.data() == 'Composer 1'
+    assert idx.data(QtCore.Qt.EditRole) == 'Composer 1'
+    assert isinstance(idx.data(QtCore.Qt.DecorationRole), QtGui.QIcon)
+    assert idx.data(QtCore.Qt.SizeHintRole) == QtCore.QSize(20, 20)
+    assert idx.data(CompleterModel.ItemRole) == \
+        {'type': 'composer', 'id': 'c1'}
+
+    idx = model.index(3)
+    assert idx.data() == 'Piece 2: Composer 2'
+    assert idx.data(CompleterModel.ItemRole) == {'type': 'piece', 'id': 'p2'}
+
+
+def test_update_pieces(qtmodeltester):
+    composers, pieces, model = make_model()
+    assert model.index(2).data() == 'Piece 1: Composer 1'
+
+    del pieces['p1']
+    pieces['p2'] = Piece('p2', 'c2', 'Piece 2 (rev)')
+    pieces['p3'] = Piece('p3', 'c1', 'Piece 3')
+    model.updatePieces(['p3'], ['p2'], ['p1'])
+
+    qtmodeltester.check(model)
+    assert model.rowCount() == 4
+    assert model.index(2).data() == 'Piece 2 (rev): Composer 2'
+    assert model.index(3).data() == 'Piece 3: Composer 1'
+
+
+def test_update_pieces_remove_many(qtmodeltester):
+    composers, pieces, model = make_model()
+    for i in range(3, 10):
+        pieces['p{}'.format(i)] = Piece('p{}'.format(i), 'c1', str(i))
+    model.updatePieces(['p{}'.format(i) for i in range(3, 10)], [], [])
+    assert model.index(2).data() == 'Piece 1: Composer 1'
+
+    for id in ['p1', 'p5', 'p9']:
+        del pieces[id]
+    pieces['p6'] = Piece('p6', 'c1', '6 (rev)')
+    model.updatePieces([], ['p6'], ['p9', 'p1', 'p5'])
+
+    qtmodeltester.check(model)
+    texts = [model.index(row).data() for row in range(2, model.rowCount())]
+    assert texts == ['Piece 2: Composer 2', '3: Composer 1', '4: Composer 1',
+                     '6 (rev): Composer 1', '7: Composer 1', '8: Composer 1']
+
+
+def test_update_pieces_before_access(qtmodeltester):
+    composers, pieces, model = make_model()
+
+    pieces['p3'] = Piece('p3', 'c1', 'Piece 3')
+    model.updatePieces(['p3'], [], [])
+
+    qtmodeltester.check(model)
+    assert model.rowCount() == 5
+    assert model.index(4).data() == 'Piece 3: Composer 1'
+
+
+def test_lookup():
+    composers, pieces, model = make_model()
+
+    assert model.lookup('Composer 2') == {'type': 'composer', 'id': 'c2'}
+    assert model.lookup('Piece 1: Composer 1') == {'type': 'piece', 'id': 'p1'}
+    assert model.lookup('Piece 1') is None
+    assert model.lookup('piece 1: composer 1') is None
+
+
+def test_lookup_not_unique():
+    composers, pieces, model = make_model()
+    pieces['p3'] = Piece('p3', 'c1', 'Piece 1')
+    model.updatePieces(['p3'], [], [])
+
+    assert model.lookup('Piece 1: Composer 1') is None
+
+
+def test_lookup_after_update():
+    composers, pieces, model = make_model()
+    assert model.lookup('Piece 2: Composer 2') == {'type': 'piece', 'id': 'p2'}
+
+    del pieces['p1']
+    pieces['p2'] = Piece('p2', 'c2', 'Piece 2 (rev)')
+    pieces['p3'] = Piece('p3', 'c1', 'Piece 3')
+    model.updatePieces(['p3'], ['p2'], ['p1'])
+
+    assert model.lookup('Piece 1: Composer 1') is None
+    assert model.lookup('Piece 2: Composer 2') is None
+    assert model.lookup('Piece 2 (rev): Composer 2') == \
+        {'type': 'piece', 'id': 'p2'}
+    assert model.lookup('Piece 3: Composer 1') == {'type': 'piece', 'id': 'p3'}
@@ -1,33 +1,42 @@
 import os
+import shutil
 from pathlib import Path
+from unittest.mock import patch
 
+from concertista import weights
 from concertista.assets import Assets
 from concertista.DB import DB
 
 dir = Path(__file__).parent
 
 
-def test_db_init(qtbot):
-    db = DB()
+def test_db_init(qtbot, tmp_path):
+    db = DB(cache_dir=str(tmp_path))
     assert db._composers == {}
     assert db._pieces == {}
     assert db._pieces_by_composers == {}
     assert db._completer_model is None
 
 
-def test_load_empty_db(qtbot):
+def test_default_cache_dir(qtbot, cache_dir):
+    # read when the database is created, so it can be redirected in tests
+    assert DB()._cache_dir == cache_dir
+    assert DB(cache_dir=False)._cache_dir is None
+
+
+def test_load_empty_db(qtbot, tmp_path):
     Assets().music_dir = os.path.join(dir, 'assets', 'music-empty')
-    db = DB()
+    db = DB(cache_dir=str(tmp_path))
     db.load()
     assert db._composers == {}
     assert db._pieces == {}
     assert db._pieces_by_composers == {}
-    assert db._completer_model is not None
+    assert db.get_completer_model() is not None
 
 
-def test_load_simple_db(qtbot):
+def test_load_simple_db(qtbot, tmp_path):
     Assets().music_dir = os.path.join(dir, 'assets', 'music')
-    db = DB()
+    db = DB(cache_dir=str(tmp_path))
     db.load()
 
     assert 1234 in db._composers
@@ -46,3 +55,310 @@ def test_load_simple_db(qtbot):
     assert tracks[0] == 123
     assert tracks[1] == 456
     assert tracks[2] == 789
+
+
+def test_load_from_snapshot(qtbot, tmp_path):
+    Assets().music_dir = os.path.join(dir, 'assets', 'music')
+    cache_dir = tmp_path / 'cache'
+    db = DB(cache_dir=str(cache_dir))
+    db.load()
+    assert len(os.listdir(cache_dir)) == 1
+
+    with patch('concertista.ingest.read_piece') as read_piece:
+        db = DB(cache_dir=str(cache_dir))
+        db.load()
+        read_piece.assert_not_called()
+
+    assert db._composers[1234]['name'] == 'Composer 1'
+    assert db._pieces['id001']['name'] == 'Piece 1'
+    assert db._pieces_by_composers[1234] == ['id001']
+
+
+def test_snapshot_reloads_changed_files(qtbot, tmp_path):
+    music_dir = tmp_path / 'music'
+    shutil.copytree(os.path.join(dir, 'assets', 'music'), music_dir)
+    Assets().music_dir = str(music_dir)
+    cache_dir = str(tmp_path / 'cache')
+    db = DB(cache_dir=cache_dir)
+    db.load()
+
+    (music_dir / 'tracks' / 'c1' / 'op.1.yml').write_text(
+        "album_id: a987\n"
+        "composer_id: 1234\n"
+        "id: id001\n"
+        "name: Piece 1 (rev)\n"
+        "tracks:\n"
+        "- 123\n")
+    (music_dir / 'tracks' / 'c1' / 'op.2.yml').write_text(
+        "album_id: a988\n"
+        "composer_id: 1234\n"
+        "id: id002\n"
+        "name: Piece 2\n"
+        "tracks:\n"
+        "- 321\n")
+
+    db = DB(cache_dir=cache_dir)
+    db.load()
+    assert db._pieces['id001']['name'] == 'Piece 1 (rev)'
+    assert db._pieces['id002']['name'] == 'Piece 2'
+    assert sorted(db._pieces_by_composers[1234]) == ['id001', 'id002']
+
+    os.remove(music_dir / 'tracks' / 'c1' / 'op.1.yml')
+
+    db = DB(cache_dir=cache_dir)
+    db.load()
+    assert 'id001' not in db._pieces
+    assert db._pieces_by_composers[1234] == ['id002']
+
+
+def _write_pieces(tracks_dir, composer_id, n):
+    for i in range(n):
+        (tracks_dir / "p{:03d}.yml".format(i)).write_text(
+            "composer_id: {}\n"
+            "id: p{:03d}\n"
+            "name: Piece {}\n"
+            "tracks:\n"
+            "- {}\n".format(composer_id, i, i, i))
+
+
+@patch('concertista.ingest.MIN_PARALLEL_FILES', 1)
+@patch('concertista.ingest.BATCH_SIZE', 3)
+def test_parallel_ingest(qtbot, tmp_path, capsys):
+    music_dir = tmp_path / 'music'
+    shutil.copytree(os.path.join(dir, 'assets', 'music'), music_dir)
+    tracks_dir = music_dir / 'tracks' / 'c2'
+    tracks_dir.mkdir()
+    _write_pieces(tracks_dir, 1234, 10)
+    (tracks_dir / 'bad.yml').write_text("id: [1, 2\n")
+    Assets().music_dir = str(music_dir)
+
+    db = DB(cache_dir=False)
+    db.workers = 2
+    db.load()
+
+    assert "Error loading file: bad.yml" in capsys.readouterr().out
+    assert len(db._pieces) == 11
+    assert db._pieces_by_composers[1234] == \
+        ['id001'] + ["p{:03d}".format(i) for i in range(10)]
+
+
+def make_sharded_music_dir(tmp_path):
+    music_dir = tmp_path / 'music'
+    shutil.copytree(os.path.join(dir, 'assets', 'music'), music_dir)
+    with open(music_dir / 'composers.yml', 'a') as f:
+        f.write('- id: 5678\n'
+                '  name: "Composer 2"\n')
+    tracks_dir = music_dir / 'tracks' / 'c2'
+    tracks_dir.mkdir()
+    _write_pieces(tracks_dir, 5678, 3)
+    return music_dir
+
+
+def test_lazy_load(qtbot, tmp_path, monkeypatch):
+    music_dir = make_sharded_music_dir(tmp_path)
+    monkeypatch.setattr(Assets(), 'music_dir', str(music_dir))
+
+    db = DB(cache_dir=False, lazy=True)
+    db.load()
+    assert list(db._composers.keys()) == [1234, 5678]
+    assert db._pieces == {}
+    assert db.is_composer_loaded(1234) is False
+
+    assert db.get_composer_pieces(5678) == ['p000', 'p001', 'p002']
+    assert db.is_composer_loaded(5678) is True
+    assert db.is_composer_loaded(1234) is False
+    assert len(db._pieces) == 3
+
+    assert db.get_piece('id001')['name'] == 'Piece 1'
+    assert db.is_composer_loaded(1234) is True
+    assert db.get_piece('unknown') is None
+    assert len(db.get_pieces()) == 4
+    assert db.get_completer_model().rowCount() == 6
+
+
+def test_lazy_search(qtbot, tmp_path, monkeypatch):
+    music_dir = make_sharded_music_dir(tmp_path)
+    monkeypatch.setattr(Assets(), 'music_dir', str(music_dir))
+    db = DB(cache_dir=False, lazy=True)
+    db.load()
+    db.get_composer_pieces(5678)
+
+    # pieces of composers that were not browsed are found as well
+    results = db.search('composer 1')
+    assert results[0] == {'type': 'composer', 'id': 1234}
+    assert {'type': 'piece', 'id': 'id001'} in results
+    assert db.get_completer_model().lookup('Piece 1: Composer 1') == {
+        'type': 'piece', 'id': 'id001'}
+
+
+def test_lazy_update_files_new_shard(qtbot, tmp_path, monkeypatch):
+    music_dir = make_sharded_music_dir(tmp_path)
+    monkeypatch.setattr(Assets(), 'music_dir', str(music_dir))
+    db = DB(cache_dir=False, lazy=True)
+    db.load()
+    db.get_composer_pieces(5678)
+
+    # new directory of a loaded composer is read right away
+    loaded_dir = music_dir / 'tracks' / 'c2b'
+    loaded_dir.mkdir()
+    (loaded_dir / 'x.yml').write_text(
+        'composer_id: 5678\nid: x1\nname: X\ntracks:\n- 1\n')
+    # new directory of a composer that was not loaded yet waits for it
+    lazy_dir = music_dir / 'tracks' / 'c1b'
+    lazy_dir.mkdir()
+    (lazy_dir / 'y.yml').write_text(
+        'composer_id: 1234\nid: y1\nname: Y\ntracks:\n- 2\n')
+    assert db.update_files(
+        [str(loaded_dir / 'x.yml'), str(lazy_dir / 'y.yml')]) == \
+        (['x1'], [], [])
+    assert 'y1' not in db._pieces
+    assert sorted(db.get_composer_pieces(1234)) == ['id001', 'y1']
+
+
+def test_lazy_preferences(qtbot, tmp_path, monkeypatch):
+    from PyQt5 import QtCore
+    from concertista.PreferencesWindow import PreferencesWindow
+
+    music_dir = make_sharded_music_dir(tmp_path)
+    monkeypatch.setattr(Assets(), 'music_dir', str(music_dir))
+    db = DB(cache_dir=False, lazy=True)
+    db.load()
+
+    dlg = PreferencesWindow(db)
+    qtbot.addWidget(dlg)
+    ci = dlg._composer_items[5678]
+    assert ci.rowCount() == 1
+    assert db._pieces == {}
+
+    ci.setCheckState(QtCore.Qt.Checked)
+    assert ci.rowCount() == 3
+    assert sorted(dlg.user_selection.keys()) == ['p000', 'p001', 'p002']
+    assert db.is_composer_loaded(1234) is False
+
+
+def test_search(qtbot, tmp_path, monkeypatch):
+    music_dir = tmp_path / 'music'
+    shutil.copytree(os.path.join(dir, 'assets', 'music'), music_dir)
+    monkeypatch.setattr(Assets(), 'music_dir', str(music_dir))
+    db = DB(cache_dir=False)
+    db.load()
+
+    assert db.search('composer 1') == [
+        {'type': 'composer', 'id': 1234},
+        {'type': 'piece', 'id': 'id001'}
+    ]
+
+    fn = music_dir / 'tracks' / 'c1' / 'op.1.yml'
+    fn.write_text(
+        "composer_id: 1234\n"
+        "id: id001\n"
+        "name: Sérénade\n"
+        "tracks:\n"
+        "- 123\n")
+    db.update_files([str(fn)])
+    assert db.search('serenade') == [{'type': 'piece', 'id': 'id001'}]
+    assert db.search('piece 1') == []
+
+
+def test_get_piece_ids(qtbot, tmp_path, monkeypatch):
+    music_dir = tmp_path / 'music'
+    shutil.copytree(os.path.join(dir, 'assets', 'music'), music_dir)
+    monkeypatch.setattr(Assets(), 'music_dir', str(music_dir))
+    db = DB(cache_dir=False)
+    db.load()
+
+    ids = db.get_piece_ids()
+    assert ids == list(db.get_pieces().keys())
+    assert db.get_piece_ids() is ids
+
+    fn = music_dir / 'tracks' / 'c1' / 'op.2.yml'
+    fn.write_text(
+        "composer_id: 1234\n"
+        "id: id002\n"
+        "name: Piece 2\n"
+        "tracks:\n"
+        "- 123\n")
+    db.update_files([str(fn)])
+    assert sorted(db.get_piece_ids()) == ['id001', 'id002']
+
+
+def test_get_track_ids(qtbot):
+    Assets().music_dir = os.path.join(dir, 'assets', 'music')
+    db = DB(cache_dir=False)
+    db.load()
+
+    track_ids = db.get_track_ids()
+    assert len(track_ids) == sum(
+        len(p['tracks']) for p in db.get_pieces().values())
+    assert db.get_track_ids(['id001', 'unknown']) == \
+        db.get_piece('id001')['tracks']
+
+
+def test_get_track_durations(qtbot, tmp_path):
+    db = DB(cache_dir=str(tmp_path))
+    track_durations = db.get_track_durations()
+    assert db.get_track_durations() is track_durations
+    track_durations.set('1', 1000)
+    track_durations.save()
+
+    db = DB(cache_dir=str(tmp_path))
+    assert db.get_track_durations().get('1') == 1000
+
+
+def test_get_weights(qtbot):
+    Assets().music_dir = os.path.join(dir, 'assets', 'music')
+    db = DB(cache_dir=False)
+    db.load()
+
+    table = db.get_weights(weights.TRACKS)
+    assert len(table) == len(db.get_pieces())
+    assert db.get_weights(weights.TRACKS) is table
+
+    composer_id = next(iter(db.get_composers()))
+    composer_table = db.get_weights(weights.TRACKS, composer_id)
+    assert composer_table.piece_ids == \
+        list(db.get_composer_pieces(composer_id))
+
+    db.set_composer_weights({composer_id: 2.0})
+    assert db.get_weights(weights.TRACKS) is not table
+    assert db.get_composer_weights() == {composer_id: 2.0}
+
+    table = db.get_weights(weights.DURATION)
+    db.get_track_durations().set('x', 1)
+    assert db.get_weights(weights.DURATION) is not table
+
+    piece_ids = db.get_piece_ids()[:1]
+    assert db.get_weights(weights.UNIFORM, piece_ids=piece_ids).piece_ids == \
+        piece_ids
+
+
+def test_get_query_index(qtbot, tmp_path, monkeypatch):
+    music_dir = tmp_path / 'music'
+    shutil.copytree(os.path.join(dir, 'assets', 'music'), music_dir)
+    monkeypatch.setattr(Assets(), 'music_dir', str(music_dir))
+    db = DB(cache_dir=False)
+    db.load()
+
+    index = db.get_query_index()
+    assert db.get_query_index() is index
+    assert sorted(index.ids(index.all())) == sorted(db.get_piece_ids())
+
+    fn = music_dir / 'tracks' / 'c1' / 'op.2.yml'
+    fn.write_text(
+        "composer_id: 1234\n"
+        "id: id002\n"
+        "name: Piece 2\n"
+        "tracks:\n"
+        "- 123\n")
+    db.update_files([str(fn)])
+    index = db.get_query_index()
+    assert 'id002' in index.ids(index.all())
+
+
+def test_prepare_search(qtbot, tmp_path):
+    Assets().music_dir = os.path.join(dir, 'assets', 'music')
+    db = DB(cache_dir=str(tmp_path))
+    db.load()
+    db.prepare_search()
+    assert db._search_index is not None
+    assert db.get_completer_model()._text_index is not None
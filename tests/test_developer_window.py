@@ -0,0 +1,51 @@
+import pytest
+from unittest.mock import patch
+from PyQt5 import QtCore
+from concertista.DeveloperWindow import DeveloperWindow
+
+
+@pytest.fixture
+def dev_window(qtbot, worker):
+    with patch('concertista.DeveloperWindow.DeveloperWindow.readSettings'):
+        wnd = DeveloperWindow()
+    qtbot.addWidget(wnd)
+    wnd.setupSpotify(worker, 'US')
+    yield wnd
+
+
+def add_album(wnd):
+    wnd.onAlbumsFound({'albums': {'items': [
+        {'id': 'a1', 'name': 'Album', 'artists': [{'name': 'Artist'}]}
+    ]}})
+    return wnd._album_list.topLevelItem(0)
+
+
+def test_album_tracks(qtbot, dev_window):
+    spotify = dev_window._spotify_worker.spotify()
+    spotify.album_tracks.return_value = {'items': [
+        {'track_number': 1, 'name': 'Allegro'}
+    ]}
+    item = add_album(dev_window)
+    dev_window.onAlbumExpanded(item)
+    # searching for composers does not cancel loading the tracks
+    dev_window.onSearchComposer()
+    qtbot.waitUntil(lambda: item.child(0).data(0, QtCore.Qt.UserRole)
+                    is not False)
+    assert item.childCount() == 1
+    assert item.child(0).text(0) == " 1. Allegro"
+
+
+def test_album_tracks_failed(qtbot, dev_window):
+    spotify = dev_window._spotify_worker.spotify()
+    spotify.album_tracks.side_effect = RuntimeError("offline")
+    item = add_album(dev_window)
+    dev_window.onAlbumExpanded(item)
+    qtbot.waitUntil(
+        lambda: item.child(0).data(0, QtCore.Qt.UserRole) is None)
+    assert dev_window.statusBar().currentMessage() == "Error: offline"
+
+    # can be expanded again
+    spotify.album_tracks.side_effect = None
+    spotify.album_tracks.return_value = {'items': []}
+    dev_window.onAlbumExpanded(item)
+    qtbot.waitUntil(lambda: spotify.album_tracks.call_count == 2)
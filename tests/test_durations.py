@@ -0,0 +1,110 @@
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from concertista import durations
+from concertista.durations import TrackDurations
+
+
+def make_spotify():
+    def tracks(ids, market=None):
+        return {'tracks': [
+            None if id.startswith('x') else
+            {'id': id, 'duration_ms': 1000 * len(id)} for id in ids
+        ]}
+    spotify = MagicMock()
+    spotify.tracks.side_effect = tracks
+    return spotify
+
+
+def test_fetch_batches(tmp_path):
+    track_ids = ['t{}'.format(i) for i in range(120)]
+    track_durations = TrackDurations(str(tmp_path))
+    spotify = make_spotify()
+
+    assert track_durations.fetch(spotify, track_ids + track_ids[:5]) == 120
+    assert spotify.tracks.call_count == 3
+    for call in spotify.tracks.call_args_list:
+        assert len(call[0][0]) <= durations.BATCH_SIZE
+    assert track_durations.get('t1') == 2000
+    assert len(track_durations) == 120
+
+    # nothing to look up
+    assert track_durations.fetch(spotify, track_ids) == 0
+    assert spotify.tracks.call_count == 3
+
+
+def test_fetch_saves_progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(durations, 'SAVE_EVERY', 2)
+    track_ids = ['t{}'.format(i) for i in range(5 * durations.BATCH_SIZE)]
+    track_durations = TrackDurations(str(tmp_path))
+    spotify = make_spotify()
+    tracks = spotify.tracks.side_effect
+    calls = []
+
+    def fail_fourth(batch, market=None):
+        calls.append(batch)
+        if len(calls) == 4:
+            raise ConnectionError()
+        return tracks(batch, market=market)
+
+    spotify.tracks.side_effect = fail_fourth
+    with patch.object(track_durations, 'save',
+                      wraps=track_durations.save) as save:
+        with pytest.raises(ConnectionError):
+            track_durations.fetch(spotify, track_ids)
+    # after the second batch and when the fourth one failed
+    assert save.call_count == 2
+
+    track_durations = TrackDurations(str(tmp_path))
+    track_durations.load()
+    assert len(track_durations) == 3 * durations.BATCH_SIZE
+
+    # the next lookup continues where the last one stopped
+    spotify = make_spotify()
+    assert track_durations.fetch(spotify, track_ids) == \
+        2 * durations.BATCH_SIZE
+
+
+def test_fetch_unknown_track():
+    track_durations = TrackDurations()
+    track_durations.fetch(make_spotify(), ['x1', 't1'])
+    assert track_durations.get('x1') == 0
+    assert track_durations.missing(['x1', 't1', 't2']) == ['t2']
+
+
+def test_fetch_linked_track():
+    spotify = MagicMock()
+    spotify.tracks.return_value = {'tracks': [
+        {'id': 'other', 'duration_ms': 5, 'linked_from': {'id': 't1'}}
+    ]}
+    track_durations = TrackDurations()
+    track_durations.fetch(spotify, ['t1'], market='CZ')
+    assert track_durations.get('t1') == 5
+    spotify.tracks.assert_called_once_with(['t1'], market='CZ')
+
+
+def test_save_load(tmp_path):
+    track_durations = TrackDurations(str(tmp_path))
+    track_durations.fetch(make_spotify(), ['t1', 't22'])
+    assert os.path.exists(track_durations.file_name())
+
+    track_durations = TrackDurations(str(tmp_path))
+    track_durations.load()
+    assert track_durations.get('t1') == 2000
+    assert track_durations.get('t22') == 3000
+
+
+def test_load_broken_file(tmp_path):
+    (tmp_path / durations.FILE_NAME).write_text("[1, 2")
+    track_durations = TrackDurations(str(tmp_path))
+    track_durations.load()
+    assert len(track_durations) == 0
+
+
+def test_piece_duration():
+    track_durations = TrackDurations()
+    track_durations.set('1', 100)
+    piece = {'tracks': ['1', '2']}
+    assert track_durations.piece_duration(piece) == \
+        100 + durations.DEFAULT_DURATION_MS
+    assert track_durations.piece_duration(piece, 0) == 100
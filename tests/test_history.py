@@ -0,0 +1,70 @@
+import os
+from concertista import history
+from concertista.history import History
+
+
+def test_add():
+    h = History(horizon=3)
+    for id in ['a', 'b', 'c']:
+        h.add(id)
+    assert 'a' in h
+    assert len(h) == 3
+
+    h.add('d')
+    assert 'a' not in h
+    assert list(h) == ['b', 'c', 'd']
+
+    # playing a piece again makes it the most recent one
+    h.add('b')
+    h.add('e')
+    assert list(h) == ['d', 'b', 'e']
+
+
+def test_horizon():
+    h = History(horizon=5)
+    for id in range(5):
+        h.add(id)
+    h.horizon = 2
+    assert list(h) == [3, 4]
+
+    h.horizon = 0
+    h.add(5)
+    assert len(h) == 0
+
+
+def test_save_load(tmp_path):
+    h = History(str(tmp_path), horizon=10)
+    h.add('a')
+    h.add('b')
+    h.save()
+    assert os.path.exists(h.file_name())
+
+    h = History(str(tmp_path), horizon=1)
+    h.load()
+    assert list(h) == ['b']
+
+
+def test_save_unmodified(tmp_path):
+    h = History(str(tmp_path))
+    h.save()
+    assert not os.path.exists(h.file_name())
+    h.add('a')
+    h.save()
+    os.remove(h.file_name())
+    h.save()
+    assert not os.path.exists(h.file_name())
+
+
+def test_load_broken_file(tmp_path):
+    (tmp_path / history.FILE_NAME).write_text("{")
+    h = History(str(tmp_path))
+    h.load()
+    assert len(h) == 0
+
+
+def test_in_memory():
+    h = History()
+    h.add('a')
+    h.save()
+    h.load()
+    assert list(h) == ['a']
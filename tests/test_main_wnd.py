@@ -1,14 +1,15 @@
 from unittest.mock import MagicMock, patch
-from PyQt5 import QtCore
+from PyQt5 import QtCore, QtGui
+from concertista import weights
 from concertista.PreferencesWindow import PreferencesWindow
 
 
-@patch('concertista.DB.DB.get_pieces')
+@patch('concertista.DB.DB.get_piece')
 def test_randomize_pieces(pcs_mock, main_window):
-    pcs_mock.return_value = {
+    pcs_mock.side_effect = {
         'a': {'tracks': ['1', '2']},
         'b': {'tracks': ['3', '4']}
-    }
+    }.get
 
     piece_ids = ['b']
     uris = main_window.randomizePieces(piece_ids)
@@ -16,31 +17,57 @@ def test_randomize_pieces(pcs_mock, main_window):
     assert uris[1] == 'spotify:track:4'
 
 
-def test_on_new_station_all_lib(main_window):
+def test_on_new_station_all_lib(qtbot, main_window):
     spotify = MagicMock()
     main_window._active_device_id = 1
-    main_window._spotify = spotify
+    main_window._spotify_worker.setSpotify(spotify)
     main_window.onNewStation()
 
+    qtbot.waitUntil(lambda: spotify.start_playback.called)
     spotify.start_playback.assert_called_once()
 
 
 @patch('concertista.MainWindow.MainWindow.randomizePieces')
-def test_on_new_station_subset_lib(rnd_pcs_mock, main_window):
+def test_on_new_station_subset_lib(rnd_pcs_mock, qtbot, main_window):
     rnd_pcs_mock.return_value = ['a:b:c']
 
     spotify = MagicMock()
     main_window._active_device_id = 1
-    main_window._spotify = spotify
+    main_window._spotify_worker.setSpotify(spotify)
     main_window._preferences_window = MagicMock()
-    main_window._preferences_window.user_selection = {'a': '1'}
+    piece_id = main_window._db.get_piece_ids()[0]
+    main_window._preferences_window.user_selection = {piece_id: True}
+    main_window._preferences_window.endless_station.isChecked.return_value = \
+        False
     main_window._preferences_window.music_library.checkedId.return_value = \
         PreferencesWindow.MUSIC_LIBRARY_PORTION
     main_window.onNewStation()
 
+    qtbot.waitUntil(lambda: spotify.start_playback.called)
     spotify.start_playback.assert_called_once()
 
 
+def test_on_new_station_endless(qtbot, main_window):
+    spotify = MagicMock()
+    main_window._active_device_id = 1
+    main_window._spotify_worker.setSpotify(spotify)
+    main_window._preferences_window.endless_station.setChecked(True)
+    main_window.onNewStation()
+    feeder = main_window._station_feeder
+    qtbot.waitUntil(lambda: feeder._started)
+
+    spotify.start_playback.assert_called_once()
+    assert len(spotify.start_playback.call_args[1]['uris']) > 0
+    assert feeder.isActive()
+
+    main_window.onNewStation()
+    assert not feeder.isActive()
+
+    main_window.stopStationFeeder()
+    main_window._preferences_window.endless_station.setChecked(False)
+    assert main_window._station_feeder is None
+
+
 @patch('concertista.MainWindow.MainWindow.reportUnknownDeviceId')
 def test_on_new_station_unk_dev(report_mock, main_window):
     main_window._active_device_id = None
@@ -56,17 +83,20 @@ def test_on_network_reply_localhost(main_window):
 
 
 @patch('spotipy.Spotify.current_playback')
-def test_update_currently_playing_play(cpb, main_window):
+def test_update_currently_playing_play(cpb, qtbot, main_window):
     spotify = MagicMock()
     spotify.current_playback.return_value = {
         'is_playing': True
     }
-    main_window._spotify = spotify
-    main_window.updateCurrentlyPlaying()
+    main_window._spotify_worker.setSpotify(spotify)
+    poller = main_window._playback_poller
+    poller.start()
+    qtbot.waitUntil(lambda: poller.playback() is not None)
+    assert main_window._play_pause.text() == "Pause"
 
 
-@patch('spotipy.Spotify.current_playback')
-def test_update_currently_playing_pause(cpb, main_window):
+@patch('concertista.AlbumArtCache.AlbumArtCache.fetch')
+def test_update_currently_playing_pause(fetch, qtbot, main_window):
     spotify = MagicMock()
     spotify.current_playback.return_value = {
         'is_playing': False,
@@ -83,24 +113,30 @@ def test_update_currently_playing_pause(cpb, main_window):
             }
         }
     }
-    main_window._spotify = spotify
-    main_window._nam = MagicMock()
+    main_window._spotify_worker.setSpotify(spotify)
+    main_window._playback_poller.start()
     main_window.updateCurrentlyPlaying()
 
-    main_window._nam.get.assert_called_once()
+    qtbot.waitUntil(lambda: fetch.called)
+    assert main_window._current_artists == ['artist1', 'artist2']
 
+    # the same album does not fetch the cover again
+    main_window._playback_state.update({
+        'is_playing': True,
+        'item': dict(spotify.current_playback.return_value['item'],
+                     name='item2')
+    })
+    fetch.assert_called_once_with('URL')
 
-@patch('PyQt5.QtWidgets.QLabel.setPixmap')
-@patch('PyQt5.QtGui.QImage')
-@patch('PyQt5.QtGui.QPixmap.fromImage')
-def test_on_network_reply(pix, qimg, set_pix, main_window):
-    reply = MagicMock()
-    reply.url().host.return_value = '1.2.3.4'
-    main_window.onNetworkReply(reply)
 
-    pix.assert_called_once()
-    qimg.assert_called_once()
-    set_pix.assert_called_once()
+@patch('PyQt5.QtWidgets.QLabel.setPixmap')
+def test_on_cover_ready(set_pix, main_window):
+    pixmap = QtGui.QPixmap(8, 8)
+    main_window._cover_url = 'a'
+    main_window.onCoverReady('b', pixmap)
+    set_pix.assert_not_called()
+    main_window.onCoverReady('a', pixmap)
+    set_pix.assert_called_once_with(pixmap)
 
 
 @patch('PyQt5.QtWidgets.QMessageBox.exec')
@@ -116,9 +152,9 @@ def test_on_station_search(main_window):
 
 
 @patch('concertista.MainWindow.MainWindow.randomizePieces')
-def test_on_station_search_play_piece(rnd_pcs, main_window):
+def test_on_station_search_play_piece(rnd_pcs, qtbot, main_window):
     spotify = MagicMock()
-    main_window._spotify = spotify
+    main_window._spotify_worker.setSpotify(spotify)
 
     rnd_pcs.return_value = ['a:b:c']
 
@@ -130,13 +166,14 @@ def test_on_station_search_play_piece(rnd_pcs, main_window):
     }
     main_window.onStationSearchPlay()
 
+    qtbot.waitUntil(lambda: spotify.start_playback.called)
     spotify.start_playback.assert_called_once_with(device_id=1, uris=['a:b:c'])
 
 
 @patch('concertista.MainWindow.MainWindow.randomizePieces')
-def test_on_station_search_play_composer(rnd_pcs, main_window):
+def test_on_station_search_play_composer(rnd_pcs, qtbot, main_window):
     spotify = MagicMock()
-    main_window._spotify = spotify
+    main_window._spotify_worker.setSpotify(spotify)
 
     rnd_pcs.return_value = ['a:b:c']
 
@@ -148,6 +185,7 @@ def test_on_station_search_play_composer(rnd_pcs, main_window):
     }
     main_window.onStationSearchPlay()
 
+    qtbot.waitUntil(lambda: spotify.start_playback.called)
     spotify.start_playback.assert_called_once_with(device_id=1, uris=['a:b:c'])
 
 
@@ -168,42 +206,53 @@ def test_on_developer(read_set, setup, show, main_window):
     show.assert_called_once()
 
 
-def test_on_pause(main_window):
+def test_on_pause(qtbot, main_window):
     spotify = MagicMock()
-    spotify.current_playback.return_value = {
-        'is_playing': True,
-    }
-    main_window._spotify = spotify
+    main_window._spotify_worker.setSpotify(spotify)
+    main_window._playback_state.update({'is_playing': True, 'item': None})
+    assert main_window._play_pause.text() == "Pause"
     main_window.onPlayPause()
-    spotify.pause_playback.assert_called_once()
+    # applied before Spotify answers
+    assert main_window._play_pause.text() == "Play"
+    qtbot.waitUntil(lambda: spotify.pause_playback.called)
+    spotify.current_playback.assert_not_called()
 
 
-def test_on_play(main_window):
+def test_on_play(qtbot, main_window):
     spotify = MagicMock()
-    spotify.current_playback.return_value = {
-        'is_playing': False,
-    }
-    main_window._spotify = spotify
+    main_window._spotify_worker.setSpotify(spotify)
     main_window.onPlayPause()
-    spotify.start_playback.assert_called_once()
+    assert main_window._play_pause.text() == "Pause"
+    qtbot.waitUntil(lambda: spotify.start_playback.called)
+    spotify.current_playback.assert_not_called()
 
 
-@patch('PyQt5.QtCore.QTimer.singleShot')
-def test_on_next(tmr, main_window):
+def test_on_play_failed(qtbot, main_window):
     spotify = MagicMock()
-    main_window._spotify = spotify
+    spotify.start_playback.side_effect = RuntimeError("no device")
+    main_window._spotify_worker.setSpotify(spotify)
+    main_window.onPlayPause()
+    qtbot.waitUntil(
+        lambda: not main_window._playback_state.hasPendingChanges())
+    assert main_window._play_pause.text() == "Play"
+
+
+@patch('concertista.PlaybackPoller.PlaybackPoller.refresh')
+def test_on_next(refresh, qtbot, main_window):
+    spotify = MagicMock()
+    main_window._spotify_worker.setSpotify(spotify)
     main_window.onNext()
+    qtbot.waitUntil(lambda: refresh.called)
     spotify.next_track.assert_called_once()
-    tmr.assert_called_once()
 
 
-@patch('PyQt5.QtCore.QTimer.singleShot')
-def test_on_previous(tmr, main_window):
+@patch('concertista.PlaybackPoller.PlaybackPoller.refresh')
+def test_on_previous(refresh, qtbot, main_window):
     spotify = MagicMock()
-    main_window._spotify = spotify
+    main_window._spotify_worker.setSpotify(spotify)
     main_window.onPrevious()
+    qtbot.waitUntil(lambda: refresh.called)
     spotify.previous_track.assert_called_once()
-    tmr.assert_called_once()
 
 
 def test_on_volume_up(main_window):
@@ -222,28 +271,44 @@ def test_on_volume_down(main_window):
     main_window._volume_slider.setValue.assert_called_once()
 
 
-def test_on_volume_changed(main_window):
+def test_on_volume_changed(qtbot, main_window):
     spotify = MagicMock()
-    main_window._spotify = spotify
+    main_window._spotify_worker.setSpotify(spotify)
     main_window.onVolumeChanged(2)
+    qtbot.waitUntil(lambda: spotify.volume.called)
     spotify.volume.assert_called_once()
     assert main_window._volume == 2
 
 
+def test_on_volume_drag(qtbot, main_window):
+    spotify = MagicMock()
+    main_window._spotify_worker.setSpotify(spotify)
+    main_window._active_device_id = 1
+    main_window._volume = 0
+    main_window._volume_slider.setEnabled(True)
+    for i in range(5):
+        main_window.onVolumeUp()
+    main_window._volume_slider.sliderReleased.emit()
+    qtbot.waitUntil(main_window._volume_coalescer.isIdle)
+    assert spotify.volume.call_count <= 2
+    spotify.volume.assert_called_with(
+        5 * main_window.VOLUME_PAGE_STEP, device_id=1)
+
+
 @patch('concertista.AboutDialog.AboutDialog.show')
 def test_on_about(show, main_window):
     main_window.onAbout()
     show.assert_called_once()
 
 
-def test_on_current_device_changed(main_window):
+def test_on_current_device_changed(qtbot, main_window):
     spotify = MagicMock()
     main_window._active_device_id = 1
-    main_window._spotify = spotify
+    main_window._spotify_worker.setSpotify(spotify)
 
     main_window.onCurrentDeviceChanged(1)
 
-    spotify.transfer_playback.assert_called_once()
+    qtbot.waitUntil(lambda: spotify.transfer_playback.called)
 
 
 @patch('concertista.MainWindow.MainWindow.showMinimized')
@@ -316,6 +381,34 @@ def test_read_settings_initial(set_geometry, restore_mock, main_window):
     set_geometry.assert_called_once()
 
 
+@patch('concertista.server.ServerThread.start')
+def test_start_server(start, main_window):
+    nam = MagicMock()
+    main_window._nam = nam
+    main_window.startServer()
+    start.assert_called_once()
+    nam.get.assert_not_called()
+
+    main_window._server_thread.listening.emit()
+    nam.get.assert_called_once()
+
+    main_window.startServer()
+    start.assert_called_once()
+    assert nam.get.call_count == 2
+
+
+def test_server_thread_listening(qtbot):
+    from concertista import server
+    thread = server.ServerThread()
+    srv = MagicMock()
+    with patch('concertista.server.create_server', return_value=srv) as cs:
+        srv.run.side_effect = lambda: cs.assert_called_once()
+        with qtbot.waitSignal(thread.listening, timeout=1000):
+            thread.start()
+        thread.wait()
+    srv.run.assert_called_once()
+
+
 def test_connect_to_spotify(main_window):
     nam = MagicMock()
     main_window._nam = nam
@@ -323,8 +416,10 @@ def test_connect_to_spotify(main_window):
     nam.get.assert_called_once()
 
 
-def test_setup_spotify(main_window):
+@patch('concertista.MainWindow.MainWindow.updateTrackDurations')
+def test_setup_spotify(upd_durations, qtbot, main_window):
     spotify = MagicMock()
+    spotify.current_playback.return_value = None
     spotify.devices.return_value = {
         'devices': [
             {'id': 1, 'volume_percent': 10, 'is_active': True, 'name': 'a'},
@@ -332,3 +427,63 @@ def test_setup_spotify(main_window):
         ]
     }
     main_window.setupSpotify(spotify)
+
+    qtbot.waitUntil(main_window._play_pause_button.isEnabled)
+    upd_durations.assert_called_once()
+    assert main_window._playback_poller.isActive()
+    assert main_window._active_device_id == 1
+    assert main_window._volume == 10
+    assert main_window._device_combo_box.count() == 2
+
+
+def test_update_track_durations(qtbot, main_window):
+    spotify = MagicMock()
+    spotify.tracks.return_value = {'tracks': []}
+    track_durations = MagicMock()
+    track_durations.missing.return_value = ['1', '2']
+    main_window._spotify_worker.setSpotify(spotify)
+    main_window._db = MagicMock()
+    main_window._db.get_track_durations.return_value = track_durations
+    main_window.updateTrackDurations()
+
+    request = main_window._durations_request
+    qtbot.waitUntil(lambda: not request.isPending())
+    track_durations.fetch.assert_called_once_with(spotify, ['1', '2'], 'US')
+
+
+def test_update_track_durations_known(main_window):
+    main_window._db = MagicMock()
+    main_window._db.get_track_durations().missing.return_value = []
+    main_window.updateTrackDurations()
+    assert main_window._durations_request is None
+
+
+def test_station_history(main_window):
+    spotify = MagicMock()
+    main_window._active_device_id = 1
+    main_window._spotify_worker.setSpotify(spotify)
+    main_window._history.clear()
+    main_window._preferences_window.repeat_horizon.setValue(3)
+    assert main_window._history.horizon == 3
+
+    main_window.playStation(main_window._db.get_piece_ids())
+    assert 0 < len(main_window._history) <= 3
+
+
+def test_station_weights(main_window):
+    prefs = main_window._preferences_window
+    prefs.station_sampling.setCurrentIndex(0)
+    main_window._db.set_composer_weights({})
+    assert main_window.stationWeights() is None
+
+    index = prefs.station_sampling.findData(weights.TRACKS)
+    prefs.station_sampling.setCurrentIndex(index)
+    table = main_window.stationWeights()
+    assert len(table) == len(main_window._db.get_piece_ids())
+    prefs.station_sampling.setCurrentIndex(0)
+
+
+def test_cache_dir(cache_dir, main_window):
+    assert main_window._cache_dir == cache_dir
+    assert main_window._history.file_name().startswith(cache_dir)
+    assert main_window._album_art.file_name('URL').startswith(cache_dir)
@@ -0,0 +1,45 @@
+from concertista import playback
+
+
+def make_playback(is_playing=True, progress=1000, duration=10000):
+    return {
+        'is_playing': is_playing,
+        'progress_ms': progress,
+        'item': {'uri': 'u', 'duration_ms': duration}
+    }
+
+
+def test_is_playing():
+    assert playback.is_playing(make_playback())
+    assert not playback.is_playing(make_playback(is_playing=False))
+    assert not playback.is_playing(None)
+    assert not playback.is_playing({'is_playing': True, 'item': None})
+
+
+def test_remaining():
+    assert playback.remaining_ms(make_playback()) == 9000
+    assert playback.remaining_ms(make_playback(progress=20000)) == 0
+    assert playback.remaining_ms({'item': {}, 'progress_ms': 0}) is None
+
+
+def test_track_boundary():
+    schedule = playback.Schedule()
+    delay = schedule.next_delay(make_playback())
+    assert delay == 9000 + playback.BOUNDARY_DELAY_MS
+    delay = schedule.next_delay(make_playback(progress=10000))
+    assert delay == playback.MIN_DELAY_MS
+    delay = schedule.next_delay(make_playback(duration=3600000))
+    assert delay == playback.MAX_PLAYING_DELAY_MS
+
+
+def test_backoff():
+    schedule = playback.Schedule()
+    delays = [schedule.next_delay(None) for i in range(10)]
+    assert delays[0] == playback.IDLE_DELAY_MS
+    assert delays[1] == 2 * playback.IDLE_DELAY_MS
+    assert delays[-1] == playback.MAX_IDLE_DELAY_MS
+
+    # playing resets the backoff
+    schedule.next_delay(make_playback())
+    assert schedule.next_delay(make_playback(is_playing=False)) == \
+        playback.IDLE_DELAY_MS
@@ -0,0 +1,55 @@
+from concertista import playback
+from concertista.PlaybackPoller import PlaybackPoller
+
+
+def test_poll_playing(qtbot, worker):
+    cpb = {
+        'is_playing': True,
+        'progress_ms': 5000,
+        'item': {'uri': 'u', 'duration_ms': 20000}
+    }
+    worker.spotify().current_playback.return_value = cpb
+    poller = PlaybackPoller(worker)
+    with qtbot.waitSignal(poller.playbackUpdated, timeout=1000) as blocker:
+        poller.start()
+    assert blocker.args == [cpb]
+    assert poller.playback() is cpb
+    assert poller.progressMs() >= 5000
+    # next check right after the track ends
+    assert poller._timer.isActive()
+    assert poller._timer.interval() == 15000 + playback.BOUNDARY_DELAY_MS
+
+    poller.stop()
+    assert not poller._timer.isActive()
+
+
+def test_poll_idle(qtbot, worker):
+    worker.spotify().current_playback.return_value = None
+    poller = PlaybackPoller(worker)
+    with qtbot.waitSignal(poller.playbackUpdated, timeout=1000):
+        poller.start()
+    assert poller.playback() is None
+    assert poller.progressMs() is None
+    assert poller._timer.interval() == playback.IDLE_DELAY_MS
+    with qtbot.waitSignal(poller.playbackUpdated, timeout=1000):
+        poller.poll()
+    assert poller._timer.interval() == 2 * playback.IDLE_DELAY_MS
+
+    poller.refresh(100)
+    assert poller._timer.interval() == 100
+    poller.stop()
+
+
+def test_poll_failed(qtbot, worker):
+    worker.spotify().current_playback.side_effect = RuntimeError("offline")
+    poller = PlaybackPoller(worker)
+    with qtbot.waitSignal(poller.failed, timeout=1000):
+        poller.start()
+    assert poller._timer.interval() == playback.IDLE_DELAY_MS
+    poller.stop()
+
+
+def test_refresh_inactive(worker):
+    poller = PlaybackPoller(worker)
+    poller.refresh()
+    assert not poller._timer.isActive()
@@ -0,0 +1,61 @@
+from unittest.mock import MagicMock
+from concertista.PlaybackState import PlaybackState
+
+
+def make_playback(is_playing, device_id='d1', uri='u1'):
+    return {
+        'is_playing': is_playing,
+        'device': {'id': device_id},
+        'item': {'uri': uri}
+    }
+
+
+def test_update(qtbot):
+    state = PlaybackState()
+    changed = MagicMock()
+    state.changed.connect(changed)
+    state.update(make_playback(True))
+    assert state.isPlaying()
+    assert state.deviceId() == 'd1'
+    assert state.item() == {'uri': 'u1'}
+    assert changed.call_count == 1
+
+    state.update(make_playback(True))
+    assert changed.call_count == 1
+
+    state.update(None)
+    assert not state.isPlaying()
+    assert state.item() is None
+    assert state.deviceId() == 'd1'
+
+
+def test_optimistic(qtbot):
+    state = PlaybackState()
+    state.update(make_playback(True))
+    change = state.apply(is_playing=False)
+    assert not state.isPlaying()
+    assert state.hasPendingChanges()
+
+    # taken before Spotify paused
+    state.update(make_playback(True, uri='u2'))
+    assert not state.isPlaying()
+    assert state.item() == {'uri': 'u2'}
+
+    state.confirm(change)
+    assert not state.hasPendingChanges()
+    state.update(make_playback(False))
+    assert not state.isPlaying()
+
+
+def test_revert(qtbot):
+    state = PlaybackState()
+    state.update(make_playback(True))
+    change = state.apply(is_playing=False, device_id='d2')
+    assert state.deviceId() == 'd2'
+    state.revert(change)
+    assert state.isPlaying()
+    assert state.deviceId() == 'd1'
+    # reverting twice does nothing
+    state.apply(is_playing=False)
+    state.revert(change)
+    assert not state.isPlaying()
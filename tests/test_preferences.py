@@ -57,8 +57,16 @@ def test_read_settings_initial(restore_mock, pref_dlg):
             return 0
         elif arg == 'user_selection':
             return []
+        elif arg == 'station_hours':
+            return 8
+        elif arg == 'repeat_horizon':
+            return 200
         elif arg == 'show_develop_menu':
             return False
+        elif arg == 'endless_station':
+            return False
+        elif arg == 'watch_library':
+            return False
 
     pref_dlg._settings = MagicMock()
     pref_dlg._settings.value = val
@@ -76,8 +84,16 @@ def test_read_settings_partial_lib(pref_dlg):
             return 0
         elif arg == 'user_selection':
             return [0, 1]
+        elif arg == 'station_hours':
+            return 8
+        elif arg == 'repeat_horizon':
+            return 200
         elif arg == 'show_develop_menu':
             return False
+        elif arg == 'endless_station':
+            return False
+        elif arg == 'watch_library':
+            return False
 
     pref_dlg._library_model = MagicMock()
     pref_dlg._library_model.match.return_value = [1]
@@ -165,3 +181,15 @@ def test_libray_model_item_changed_root2(pref_dlg):
     pref_dlg.onLibraryModelItemChanged(item)
 
     assert pref_dlg.user_selection['1'] is True
+
+
+def test_composer_weight(pref_dlg):
+    composer = {'id': 'c1', 'name': 'Composer'}
+    pref_dlg._appendComposerItem(composer)
+    item = pref_dlg._weight_items['c1']
+    assert item.data(QtCore.Qt.EditRole) == 1.0
+
+    item.setData(2.5, QtCore.Qt.EditRole)
+    assert pref_dlg.composer_weights == {'c1': 2.5}
+    item.setData(1.0, QtCore.Qt.EditRole)
+    assert pref_dlg.composer_weights == {}
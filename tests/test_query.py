@@ -0,0 +1,46 @@
+from concertista import query
+
+
+def test_positions():
+    for bits in [0, 1, 0b1011, 1 << 1000 | 1 << 3, (1 << 200) - 1]:
+        pos = list(query.positions(bits))
+        assert query.bits_from_positions(pos) == bits
+        assert query.count(bits) == len(pos)
+        assert pos == sorted(pos)
+
+
+def test_composer(query_index):
+    index = query_index
+    assert len(index) == 4
+    assert sorted(index.ids(index.composer('c1'))) == ['a', 'c']
+    assert index.ids(index.composer('c2')) == ['b']
+    assert index.composer('unknown') == 0
+    assert sorted(index.ids(index.all())) == ['a', 'b', 'c', 'd']
+
+
+def test_album(query_index):
+    index = query_index
+    assert sorted(index.ids(index.album('al1'))) == ['a', 'b']
+    assert index.album('unknown') == 0
+
+
+def test_tracks(query_index):
+    index = query_index
+    assert sorted(index.ids(index.tracks(2))) == ['b', 'c', 'd']
+    assert sorted(index.ids(index.tracks(1, 2))) == ['a', 'b', 'd']
+    assert index.ids(index.tracks(4)) == []
+
+
+def test_set_operations(query_index):
+    index = query_index
+    bits = index.composer('c1') | index.album('al1')
+    assert sorted(index.ids(bits)) == ['a', 'b', 'c']
+    bits &= index.tracks(2)
+    assert sorted(index.ids(bits)) == ['b', 'c']
+    bits &= ~index.composer('c2')
+    assert index.ids(bits) == ['c']
+
+
+def test_pieces(query_index):
+    index = query_index
+    assert sorted(index.ids(index.pieces(['d', 'a', 'x']))) == ['a', 'd']
@@ -0,0 +1,87 @@
+import pickle
+import pytest
+
+from concertista.records import (
+    Composer, Piece, intern_id, pack_track_ids, unpack_track_ids)
+
+TRACKS = ['6M0BRmLK0l2E3rwHEnylis', '0JS40KYHq7UjOmtqGyKV5T']
+
+
+def test_pack_track_ids():
+    packed = pack_track_ids(TRACKS)
+    assert isinstance(packed, bytes)
+    assert len(packed) == 32
+    assert unpack_track_ids(packed) == TRACKS
+
+    # leading zeros are kept
+    assert unpack_track_ids(pack_track_ids(['0' * 21 + '1'])) == \
+        ['0' * 21 + '1']
+
+
+def test_pack_other_ids():
+    packed = pack_track_ids([123, 456])
+    assert packed == (123, 456)
+    assert unpack_track_ids(packed) == [123, 456]
+
+    # not base62, or too large for 128 bits
+    for id in ['6M0BRmLK0l2E3rwHEnyli-', 'Z' * 22]:
+        assert pack_track_ids(TRACKS + [id]) == tuple(TRACKS + [id])
+
+
+def test_intern_id():
+    a = ''.join(['2wOqMjp9TyAB', 'vtHdOSOTUS'])
+    b = ''.join(['2wOqMjp9TyABvtHd', 'OSOTUS'])
+    assert a is not b
+    assert intern_id(a) is intern_id(b)
+    assert intern_id(1234) == 1234
+
+
+def test_piece():
+    piece = Piece.from_dict({
+        'id': 'p1',
+        'composer_id': 'c1',
+        'album_id': 'a1',
+        'name': 'Piece',
+        'tracks': TRACKS
+    })
+    assert piece['id'] == 'p1'
+    assert piece['composer_id'] == 'c1'
+    assert piece['album_id'] == 'a1'
+    assert piece['name'] == 'Piece'
+    assert piece['tracks'] == TRACKS
+    assert piece.num_tracks() == 2
+    assert list(piece.track_uris()) == [
+        'spotify:track:6M0BRmLK0l2E3rwHEnylis',
+        'spotify:track:0JS40KYHq7UjOmtqGyKV5T'
+    ]
+    assert 'tracks' in piece
+    assert 'foo' not in piece
+    assert dict(piece)['name'] == 'Piece'
+    with pytest.raises(KeyError):
+        piece['foo']
+    assert not hasattr(piece, '__dict__')
+
+
+def test_piece_without_album():
+    piece = Piece('p1', 'c1', 'Piece')
+    assert 'album_id' not in piece
+    assert piece.get('album_id') is None
+    assert piece['tracks'] == []
+
+
+def test_pickle():
+    piece = Piece('p1', 'c1', 'Piece', 'a1', TRACKS)
+    composer = Composer('c1', 'Composer')
+    p2, c2 = pickle.loads(pickle.dumps((piece, composer)))
+    assert p2 == piece
+    assert c2 == composer
+    assert c2['name'] == 'Composer'
+
+
+def test_hash():
+    piece = Piece('p1', 'c1', 'Piece', 'a1', TRACKS)
+    composer = Composer('c1', 'Composer')
+    same = Piece('p1', 'c1', 'Piece', 'a1', TRACKS)
+    assert hash(piece) == hash(same)
+    assert {piece, same, composer} == {piece, composer}
+    assert {composer: 1}[Composer('c1', 'Composer')] == 1
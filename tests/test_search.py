@@ -0,0 +1,125 @@
+from concertista.search import SearchIndex, Speller, edit_distance, fold
+
+
+def make_index():
+    index = SearchIndex()
+    index.add("composer", "dvorak", "Antonín Dvořák")
+    index.add("composer", "bach", "Johann Sebastian Bach")
+    index.add("piece", "p1", "Symphony No. 9: Antonín Dvořák")
+    index.add("piece", "p2", "Cello Suite No. 1: Johann Sebastian Bach")
+    index.add("piece", "p3", "Symphony No. 8: Antonín Dvořák")
+    index.add("piece", "p4", "Dvořák Variations: Someone Else")
+    return index
+
+
+def test_fold():
+    assert fold("Antonín Dvořák") == "antonin dvorak"
+    assert fold("Øystein Sommerfeldt") == "oystein sommerfeldt"
+    assert fold("Witold Lutosławski") == "witold lutoslawski"
+    assert fold("BACH") == "bach"
+
+
+def test_search_ranking():
+    index = make_index()
+
+    assert index.search("dvorak") == [
+        {"type": "composer", "id": "dvorak"},
+        {"type": "piece", "id": "p4"},
+        {"type": "piece", "id": "p1"},
+        {"type": "piece", "id": "p3"}
+    ]
+
+
+def test_search_words():
+    index = make_index()
+
+    assert index.search("symphony dvořák 9") == [{"type": "piece", "id": "p1"}]
+    assert index.search("SEBASTIAN") == [
+        {"type": "composer", "id": "bach"},
+        {"type": "piece", "id": "p2"}
+    ]
+    assert index.search("mozart") == []
+    assert index.search("  ") == []
+
+
+def test_search_short():
+    index = make_index()
+
+    # prefixes first
+    assert index.search("sy") == [
+        {"type": "piece", "id": "p3"},
+        {"type": "piece", "id": "p1"}
+    ]
+    # words shorter than a trigram still match inside the text
+    assert index.search("9") == [{"type": "piece", "id": "p1"}]
+    assert index.search("el") == [
+        {"type": "piece", "id": "p2"},
+        {"type": "piece", "id": "p4"}
+    ]
+    assert index.search("no 8") == [{"type": "piece", "id": "p3"}]
+
+
+def test_search_limit():
+    index = make_index()
+
+    assert index.search("symphony", limit=1) == [{"type": "piece", "id": "p3"}]
+
+
+def test_update():
+    index = make_index()
+    assert len(index.search("symphony")) == 2
+
+    index.remove("piece", "p1")
+    index.add("piece", "p3", "Slavonic Dances: Antonín Dvořák")
+    index.add("piece", "p5", "Symphony No. 5: Antonín Dvořák")
+
+    assert len(index) == 6
+    assert index.search("symphony") == [{"type": "piece", "id": "p5"}]
+    assert index.search("slavonic") == [{"type": "piece", "id": "p3"}]
+
+
+def test_edit_distance():
+    assert edit_distance("bach", "bach", 2) == 0
+    assert edit_distance("bahc", "bach", 2) == 1
+    assert edit_distance("rachmaninov", "rachmaninoff", 2) == 2
+    assert edit_distance("bach", "mozart", 2) == 3
+
+
+def test_speller():
+    speller = Speller()
+    for word in ["tchaikovsky", "rachmaninoff", "shostakovich", "bach"]:
+        speller.add(word)
+
+    assert speller.lookup("chaikovsky") == [(1, "tchaikovsky")]
+    assert speller.lookup("rachmaninov") == [(2, "rachmaninoff")]
+    assert speller.lookup("shostakovitch") == [(1, "shostakovich")]
+    # short words have to match exactly
+    assert speller.lookup("bah") == []
+    assert speller.lookup("bach") == [(0, "bach")]
+
+
+def test_fuzzy_search():
+    index = SearchIndex()
+    index.add("composer", "tchaikovsky", "Pyotr Ilyich Tchaikovsky", 2)
+    index.add("composer", "chaikin", "Nikolai Chaikin", 1)
+    index.add("piece", "p1", "Swan Lake: Pyotr Ilyich Tchaikovsky", 2)
+    index.add("piece", "p2", "Symphony No. 6: Pyotr Ilyich Tchaikovsky", 2)
+    index.add("piece", "p3", "Accordion Concerto: Nikolai Chaikin", 1)
+
+    assert index.fuzzy_search("chaikovsky") == [
+        {"type": "composer", "id": "tchaikovsky"},
+        {"type": "piece", "id": "p1"},
+        {"type": "piece", "id": "p2"}
+    ]
+    assert index.fuzzy_search("simphony tchaikovski") == [
+        {"type": "piece", "id": "p2"}
+    ]
+    # exact words rank before misspelled ones, then by popularity
+    assert index.fuzzy_search("chaikin") == [
+        {"type": "composer", "id": "chaikin"},
+        {"type": "piece", "id": "p3"}
+    ]
+    assert index.fuzzy_search("mozart") == []
+
+    index.add("piece", "p4", "Concerto in D: Wolfgang Amadeus Mozart", 1)
+    assert index.fuzzy_search("motzart") == [{"type": "piece", "id": "p4"}]
@@ -0,0 +1,92 @@
+import threading
+from unittest.mock import MagicMock
+from concertista.SpotifyWorker import SpotifyWorker
+
+
+def test_call(qtbot, worker):
+    worker.spotify().me.return_value = {'id': 'me'}
+    request = worker.call('me')
+    assert request.isPending()
+    with qtbot.waitSignal(request.finished, timeout=1000) as blocker:
+        pass
+    assert blocker.args == [{'id': 'me'}]
+    assert not request.isPending()
+    assert worker.pendingRequests() == []
+
+
+def test_call_args(qtbot, worker):
+    request = worker.call('volume', 10, device_id='dev')
+    qtbot.waitUntil(lambda: not request.isPending())
+    worker.spotify().volume.assert_called_once_with(10, device_id='dev')
+
+
+def test_run(qtbot, worker):
+    def func(spotify, a, b=0):
+        return a + b
+    request = worker.run(func, 1, b=2)
+    with qtbot.waitSignal(request.finished, timeout=1000) as blocker:
+        pass
+    assert blocker.args == [3]
+
+
+def test_failed(qtbot, worker):
+    worker.spotify().devices.side_effect = RuntimeError("offline")
+    request = worker.call('devices')
+    with qtbot.waitSignal(request.failed, timeout=1000) as blocker:
+        pass
+    assert isinstance(blocker.args[0], RuntimeError)
+
+
+def test_timeout(qtbot, worker):
+    release = threading.Event()
+    request = worker.run(lambda spotify: release.wait(5))
+    request.setTimeout(10)
+    with qtbot.waitSignal(request.failed, timeout=1000) as blocker:
+        pass
+    assert isinstance(blocker.args[0], TimeoutError)
+    assert not request.isPending()
+
+    # the late result is dropped
+    finished = MagicMock()
+    request.finished.connect(finished)
+    release.set()
+    qtbot.waitUntil(lambda: worker.pendingRequests() == [])
+    finished.assert_not_called()
+
+
+def test_cancel(qtbot, worker):
+    release = threading.Event()
+    # keep all threads busy, so the last request waits in the queue
+    busy = [worker.run(lambda spotify: release.wait(5))
+            for i in range(SpotifyWorker.MAX_THREADS)]
+    request = worker.call('me')
+    request.cancel()
+    assert not request.isPending()
+    assert request not in worker.pendingRequests()
+
+    worker.cancelAll()
+    assert not any(r.isPending() for r in busy)
+    release.set()
+    worker.waitForDone()
+    worker.spotify().me.assert_not_called()
+
+
+def test_calls_mixin(qtbot, worker):
+    from concertista.SpotifyWorker import SpotifyCallsMixin
+
+    class Calls(SpotifyCallsMixin):
+        def __init__(self):
+            self._spotify_worker = worker
+            self._requests = {}
+
+    release = threading.Event()
+    worker.spotify().search.side_effect = lambda *a, **kw: release.wait(5)
+    calls = Calls()
+    search = calls.spotifyCall('search', 'search', 'bach')
+    tracks = calls.spotifyCall('tracks', 'album_tracks', 'a1')
+    calls.cancelRequests('search')
+    assert not search.isPending()
+    assert tracks.isPending()
+    calls.cancelRequests()
+    assert not tracks.isPending()
+    release.set()
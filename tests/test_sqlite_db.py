@@ -0,0 +1,146 @@
+import os
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+from concertista.assets import Assets
+from concertista.SQLiteDB import SQLiteDB
+
+dir = Path(__file__).parent
+
+
+def make_music_dir(tmp_path, monkeypatch):
+    music_dir = tmp_path / 'music'
+    shutil.copytree(os.path.join(dir, 'assets', 'music'), music_dir)
+    (music_dir / 'composers.yml').write_text(
+        '- id: 1234\n'
+        '  name: "Composer 1"\n'
+        '- id: c2\n'
+        '  name: "Antonín Dvořák"\n')
+    (music_dir / 'tracks' / 'c1' / 'op.2.yml').write_text(
+        'album_id: a988\n'
+        'composer_id: c2\n'
+        'id: id002\n'
+        'name: Symphony No. 9\n'
+        'tracks:\n'
+        '- t1\n'
+        '- t2\n')
+    monkeypatch.setattr(Assets(), 'music_dir', str(music_dir))
+    return music_dir
+
+
+def test_load(qtbot, tmp_path, monkeypatch):
+    make_music_dir(tmp_path, monkeypatch)
+    db = SQLiteDB(cache_dir=False)
+    db.load()
+
+    assert list(db.get_composers().keys()) == [1234, 'c2']
+    assert db.get_composers()['c2']['name'] == 'Antonín Dvořák'
+
+    pieces = db.get_pieces()
+    assert len(pieces) == 2
+    assert 'id001' in pieces
+    assert 'id999' not in pieces
+    assert sorted(pieces.keys()) == ['id001', 'id002']
+    p001 = pieces['id001']
+    assert p001['album_id'] == 'a987'
+    assert p001['composer_id'] == 1234
+    assert p001['name'] == 'Piece 1'
+    assert p001['tracks'] == [123, 456, 789]
+
+    assert db.get_composer_pieces(1234) == ['id001']
+    assert db.get_composer_pieces('c2') == ['id002']
+    assert db.get_completer_model().rowCount() == 4
+
+
+def test_default_cache_dir(qtbot, cache_dir):
+    assert SQLiteDB()._cache_dir == cache_dir
+
+
+def test_search(qtbot, tmp_path, monkeypatch):
+    make_music_dir(tmp_path, monkeypatch)
+    db = SQLiteDB(cache_dir=False)
+    db.load()
+
+    assert db.search('dvorak') == [
+        {'type': 'composer', 'id': 'c2'},
+        {'type': 'piece', 'id': 'id002'}
+    ]
+    assert db.search('symph') == [{'type': 'piece', 'id': 'id002'}]
+    assert db.search('piece 1') == [{'type': 'piece', 'id': 'id001'}]
+    assert db.search('  ') == []
+
+
+def test_prepare_search(qtbot, tmp_path, monkeypatch):
+    make_music_dir(tmp_path, monkeypatch)
+    db = SQLiteDB(cache_dir=False)
+    db.load()
+
+    with patch('concertista.SQLiteDB._PieceTable.__getitem__') as getitem:
+        db.prepare_search()
+        model = db.get_completer_model()
+        assert model.lookup('Symphony No. 9: Antonín Dvořák') == {
+            'type': 'piece', 'id': 'id002'}
+        assert model.lookup('Antonín Dvořák') == {
+            'type': 'composer', 'id': 'c2'}
+        assert model.lookup('Symphony No. 9') is None
+        assert model.lookup(': ') is None
+    getitem.assert_not_called()
+    assert db._search_index is None
+
+
+def test_completer_lookup_without_search(qtbot, tmp_path, monkeypatch):
+    make_music_dir(tmp_path, monkeypatch)
+    db = SQLiteDB(cache_dir=False)
+    db.load()
+    db._has_search = False
+
+    model = db.get_completer_model()
+    assert model.lookup('Piece 1: Composer 1') == {
+        'type': 'piece', 'id': 'id001'}
+    assert model.lookup('Piece 1') is None
+
+
+def test_fuzzy_search(qtbot, tmp_path, monkeypatch):
+    make_music_dir(tmp_path, monkeypatch)
+    db = SQLiteDB(cache_dir=False)
+    db.load()
+
+    assert db.fuzzy_search('dvorjak') == [
+        {'type': 'composer', 'id': 'c2'},
+        {'type': 'piece', 'id': 'id002'}
+    ]
+    assert db.fuzzy_search('simphony dvorak') == [
+        {'type': 'piece', 'id': 'id002'}
+    ]
+    assert db.fuzzy_search('mozart') == []
+
+
+def test_incremental_import(qtbot, tmp_path, monkeypatch):
+    music_dir = make_music_dir(tmp_path, monkeypatch)
+    cache_dir = str(tmp_path / 'cache')
+    db = SQLiteDB(cache_dir=cache_dir)
+    db.load()
+
+    with patch('concertista.ingest.read_piece') as read_piece:
+        db = SQLiteDB(cache_dir=cache_dir)
+        db.load()
+        read_piece.assert_not_called()
+    assert len(db.get_pieces()) == 2
+
+    fn = music_dir / 'tracks' / 'c1' / 'op.2.yml'
+    fn.write_text(
+        'composer_id: c2\n'
+        'id: id002\n'
+        'name: New World Symphony\n'
+        'tracks:\n'
+        '- t3\n')
+    assert db.update_files([str(fn)]) == ([], ['id002'], [])
+    assert db.get_pieces()['id002']['tracks'] == ['t3']
+    assert db.search('world') == [{'type': 'piece', 'id': 'id002'}]
+
+    os.remove(music_dir / 'tracks' / 'c1' / 'op.1.yml')
+    db = SQLiteDB(cache_dir=cache_dir)
+    db.load()
+    assert list(db.get_pieces().keys()) == ['id002']
+    assert db.get_composer_pieces(1234) == []
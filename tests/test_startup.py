@@ -0,0 +1,57 @@
+import os
+import sys
+import subprocess
+
+# modules that must not be imported before the main window is shown
+DEFERRED_MODULES = [
+    'flask',
+    'waitress',
+    'dotenv',
+    'spotipy',
+    'concertista.server',
+    'concertista.DeveloperWindow',
+    'concertista.DeveloperAlbumsWindow',
+    'concertista.PieceNameDialog'
+]
+
+# upper bound on the number of modules imported with the main window; a
+# count is stable where a time limit would depend on the machine
+MAX_STARTUP_MODULES = 250
+
+
+def import_times(module):
+    """
+    Import `module` in a new interpreter with `-X importtime`. Returns
+    {module name: cumulative time in us}.
+    """
+    env = dict(os.environ)
+    env.pop('CONCERTISTA_TRACE', None)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if not fields[1].strip().isdigit():
+            # header
+            continue
+        times[fields[2].strip()] = int(fields[1])
+    return times
+
+
+def test_startup_imports():
+    times = import_times('concertista.MainWindow')
+
+    for module in DEFERRED_MODULES:
+        assert module not in times
+    assert len(times) <= MAX_STARTUP_MODULES
+
+
+def test_main_module_is_light():
+    # catalog worker processes re-import __main__ on spawn platforms
+    times = import_times('concertista.__main__')
+
+    assert 'PyQt5' not in times
+    assert 'concertista.MainWindow' not in times
@@ -0,0 +1,231 @@
+import random
+from unittest.mock import MagicMock
+from concertista import station
+from concertista.history import History
+from concertista.weights import WeightTable
+
+
+def test_shuffled_is_permutation():
+    items = list(range(100))
+    result = list(station.shuffled(items, random.Random(1)))
+    assert sorted(result) == items
+    assert result != items
+
+
+def test_shuffled_is_lazy():
+    # would not finish if the whole population was shuffled
+    population = range(10 ** 12)
+    it = station.shuffled(population, random.Random(2))
+    taken = [next(it) for _ in range(1000)]
+    assert len(set(taken)) == 1000
+
+
+def test_shuffled_is_uniform():
+    rng = random.Random(3)
+    counts = {}
+    for _ in range(6000):
+        first = tuple(station.shuffled('abc', rng))
+        counts[first] = counts.get(first, 0) + 1
+    assert len(counts) == 6
+    assert all(800 < c < 1200 for c in counts.values())
+
+
+def test_tracks(fake_db):
+    db = fake_db
+    uris = list(station.tracks(db, ['a', 'b', 'c', 'x'], random.Random(4)))
+    assert sorted(uris) == ['spotify:track:{}'.format(i) for i in '123456']
+
+
+def test_tracks_repeat(fake_db):
+    db = fake_db
+    it = station.tracks(db, ['a'], random.Random(5), repeat=True)
+    assert [next(it) for _ in range(3)] == ['spotify:track:1'] * 3
+
+    # nothing to play, must not loop forever
+    assert list(station.tracks(db, ['x'], repeat=True)) == []
+
+
+def test_randomize_pieces(fake_db):
+    db = fake_db
+    uris = station.randomize_pieces(
+        db, ['a', 'b', 'c'], max_tracks=2, rng=random.Random(6))
+    # pieces are not split
+    assert 2 <= len(uris) <= 4
+    assert station.randomize_pieces(db, []) == []
+
+
+def test_randomize_pieces_duration(fake_db):
+    db = fake_db
+    for track in '123456':
+        db.get_track_durations().set(track, 60 * 1000)
+
+    # a piece is never split
+    uris = station.randomize_pieces(
+        db, ['a', 'b', 'c'], rng=random.Random(1), max_duration=60)
+    assert 1 <= len(uris) <= 3
+    uris = station.randomize_pieces(
+        db, ['a', 'b', 'c'], rng=random.Random(1), max_duration=4 * 60)
+    assert len(uris) >= 4
+    uris = station.randomize_pieces(
+        db, ['a', 'b', 'c'], rng=random.Random(1), max_duration=3600)
+    assert len(uris) == 6
+
+
+def test_randomize_pieces_unknown_duration(fake_db):
+    db = fake_db
+    # unknown tracks count as 5 minutes, so one piece is enough
+    uris = station.randomize_pieces(
+        db, ['a', 'c'], rng=random.Random(1), max_duration=60)
+    assert len(uris) in (1, 3)
+
+
+def test_pieces_history(fake_db):
+    db = fake_db
+    history = History()
+    history.add('a')
+    history.add('b')
+    result = [p.id for p in station.pieces(
+        db, ['a', 'b', 'c'], random.Random(2), history=history)]
+    assert result[0] == 'c'
+    assert sorted(result) == ['a', 'b', 'c']
+    assert len(history) == 3
+
+
+def test_pieces_history_repeat(fake_db):
+    db = fake_db
+    history = History(horizon=2)
+    it = station.pieces(
+        db, ['a', 'b', 'c'], random.Random(3), repeat=True, history=history)
+    result = [next(it).id for _ in range(30)]
+    for i in range(0, len(result), 3):
+        assert sorted(result[i:i + 3]) == ['a', 'b', 'c']
+
+
+def test_randomize_pieces_history(fake_db):
+    db = fake_db
+    history = History()
+    first = station.randomize_pieces(
+        db, ['a', 'b', 'c'], max_tracks=1, history=history)
+    second = station.randomize_pieces(
+        db, ['a', 'b', 'c'], max_tracks=1, history=history)
+    assert first[0] not in second
+
+
+def test_pieces_weights(fake_db):
+    db = fake_db
+    table = WeightTable(['a', 'b', 'c'], [0, 1, 1])
+    result = [p.id for p in station.pieces(
+        db, None, random.Random(1), weights=table)]
+    assert sorted(result) == ['b', 'c']
+
+    uris = station.randomize_pieces(
+        db, None, rng=random.Random(1), weights=table)
+    assert sorted(uris) == [
+        'spotify:track:{}'.format(t) for t in '23456']
+
+
+def playback(uri):
+    return {'is_playing': True, 'item': {'uri': uri}}
+
+
+def test_feeder_start():
+    spotify = MagicMock()
+    uris = ['u{}'.format(i) for i in range(100)]
+    feeder = station.Feeder(spotify, 'dev', uris, initial=3, lookahead=4)
+    assert feeder.start()
+    spotify.start_playback.assert_called_once_with(
+        device_id='dev', uris=['u0', 'u1', 'u2'])
+    assert feeder.active
+
+
+def test_feeder_empty():
+    spotify = MagicMock()
+    feeder = station.Feeder(spotify, 'dev', [])
+    assert not feeder.start()
+    spotify.start_playback.assert_not_called()
+
+
+def test_feeder_waits_for_last_initial_track():
+    spotify = MagicMock()
+    uris = ['u{}'.format(i) for i in range(100)]
+    feeder = station.Feeder(spotify, 'dev', uris, initial=3, lookahead=4)
+    feeder.start()
+
+    assert feeder.update(playback('u1'))
+    spotify.add_to_queue.assert_not_called()
+
+    assert feeder.update(playback('u2'))
+    queued = [c[0][0] for c in spotify.add_to_queue.call_args_list]
+    assert queued == ['u3', 'u4', 'u5', 'u6']
+
+
+def test_feeder_keeps_lookahead():
+    spotify = MagicMock()
+    uris = ['u{}'.format(i) for i in range(100)]
+    feeder = station.Feeder(spotify, 'dev', uris, initial=1, lookahead=4)
+    feeder.start()
+    feeder.update(playback('u0'))
+    assert spotify.add_to_queue.call_count == 4
+
+    spotify.add_to_queue.reset_mock()
+    assert feeder.update(playback('u2'))
+    queued = [c[0][0] for c in spotify.add_to_queue.call_args_list]
+    assert queued == ['u5', 'u6']
+
+
+def test_feeder_linked_track():
+    spotify = MagicMock()
+    feeder = station.Feeder(spotify, 'dev', ['u0', 'u1', 'u2'], initial=1,
+                            lookahead=1)
+    feeder.start()
+    cpb = {'item': {'uri': 'other', 'linked_from': {'uri': 'u0'}}}
+    assert feeder.update(cpb)
+
+
+def test_feeder_other_music():
+    spotify = MagicMock()
+    feeder = station.Feeder(spotify, 'dev', ['u0', 'u1'], initial=1)
+    feeder.start()
+    cpb = playback('something else')
+    cpb['context'] = {'uri': 'spotify:album:x'}
+    assert not feeder.update(cpb)
+    assert not feeder.active
+    assert feeder.update(None) is False
+
+
+def test_feeder_previous():
+    spotify = MagicMock()
+    uris = ['u{}'.format(i) for i in range(100)]
+    feeder = station.Feeder(spotify, 'dev', uris, initial=2, lookahead=4)
+    feeder.start()
+    feeder.update(playback('u1'))
+    assert spotify.add_to_queue.call_count == 4
+
+    # Previous from the first track goes to what played before the station
+    spotify.add_to_queue.reset_mock()
+    assert feeder.update(playback('earlier'))
+    assert feeder.active
+    spotify.add_to_queue.assert_not_called()
+
+    assert feeder.update(playback('u3'))
+    queued = [c[0][0] for c in spotify.add_to_queue.call_args_list]
+    assert queued == ['u6', 'u7']
+
+
+def test_feeder_runs_out():
+    spotify = MagicMock()
+    feeder = station.Feeder(spotify, 'dev', ['u0', 'u1'], initial=1)
+    feeder.start()
+    assert not feeder.update(playback('u0'))
+    spotify.add_to_queue.assert_called_once_with('u1', device_id='dev')
+
+
+def test_feeder_endless_station(fake_db):
+    spotify = MagicMock()
+    db = fake_db
+    uris = station.tracks(db, ['a', 'b'], random.Random(1), repeat=True)
+    feeder = station.Feeder(spotify, 'dev', uris, initial=1, lookahead=20)
+    feeder.start()
+    uri = spotify.start_playback.call_args[1]['uris'][0]
+    assert feeder.update(playback(uri))
+    assert spotify.add_to_queue.call_count == 20
@@ -0,0 +1,80 @@
+import threading
+from concertista.PlaybackPoller import PlaybackPoller
+from concertista.StationFeeder import StationFeeder
+
+
+def make_feeder(worker, uris):
+    poller = PlaybackPoller(worker, worker)
+    return StationFeeder(worker, poller, 'dev', uris, worker)
+
+
+def test_start(qtbot, worker):
+    spotify = worker.spotify()
+    feeder = make_feeder(worker, ['u0', 'u1', 'u2'])
+    feeder.start()
+    qtbot.waitUntil(lambda: feeder._started)
+
+    spotify.start_playback.assert_called_once()
+    assert feeder.isActive()
+
+    feeder.stop()
+    assert not feeder.isActive()
+    assert not feeder._started
+
+
+def test_start_empty(qtbot, worker):
+    feeder = make_feeder(worker, [])
+    with qtbot.waitSignal(feeder.finished, timeout=1000):
+        feeder.start()
+    assert not feeder._started
+
+
+def test_start_failed(qtbot, worker):
+    spotify = worker.spotify()
+    spotify.start_playback.side_effect = RuntimeError("no device")
+    feeder = make_feeder(worker, ['u0', 'u1'])
+    with qtbot.waitSignal(feeder.finished, timeout=1000):
+        feeder.start()
+    assert not feeder.isActive()
+
+
+def test_playback_updated(qtbot, worker):
+    spotify = worker.spotify()
+    uris = ['u{}'.format(i) for i in range(20)]
+    feeder = make_feeder(worker, uris)
+    feeder.start()
+    qtbot.waitUntil(lambda: feeder._started)
+    feeder.setDeviceId('dev2')
+
+    poller = feeder._playback_poller
+    poller.playbackUpdated.emit({'item': {'uri': 'u3'}})
+    # arrives while the first update is running
+    poller.playbackUpdated.emit({'item': {'uri': 'u4'}})
+    qtbot.waitUntil(lambda: not feeder._has_playback and
+                    not feeder._request.isPending())
+    assert spotify.add_to_queue.call_count > 0
+    assert spotify.add_to_queue.call_args[1]['device_id'] == 'dev2'
+
+    with qtbot.waitSignal(feeder.finished, timeout=1000):
+        poller.playbackUpdated.emit({
+            'item': {'uri': 'x'},
+            'context': {'uri': 'spotify:album:x'}
+        })
+    assert not feeder._started
+
+
+def test_draws_in_gui_thread(qtbot, worker):
+    threads = set()
+
+    def uris():
+        for i in range(20):
+            threads.add(threading.current_thread())
+            yield 'u{}'.format(i)
+
+    spotify = worker.spotify()
+    feeder = make_feeder(worker, uris())
+    feeder.start()
+    qtbot.waitUntil(lambda: feeder._started)
+    feeder._playback_poller.playbackUpdated.emit({'item': {'uri': 'u4'}})
+    qtbot.waitUntil(lambda: spotify.add_to_queue.called)
+    assert threads == {threading.main_thread()}
@@ -9,17 +9,25 @@ def test_station_search_dlg(main_window):
     assert isinstance(dlg, StationSearchDialog)
 
 
+def test_prepare_on_show(main_window):
+    db = MagicMock()
+    dlg = StationSearchDialog(db, main_window)
+    db.prepare_search.assert_not_called()
+    dlg.show()
+    db.prepare_search.assert_called_once()
+    dlg.hide()
+
+
 def test_search_non_existent(main_window):
     """
     Search for non-existent item
     """
     db = MagicMock()
-
-    completer = MagicMock()
-    completer.model().findItems.return_value = []
+    db.get_completer_model().lookup.return_value = None
+    db.search.return_value = []
+    db.fuzzy_search.return_value = []
 
     dlg = StationSearchDialog(db, main_window)
-    dlg._completer = completer
 
     dlg.onSearchTextChanged('asdf')
 
@@ -27,26 +35,60 @@ def test_search_non_existent(main_window):
     assert dlg.db_item is None
 
 
-def test_search_for_existing(main_window):
+def test_search_for_existing(qtbot, main_window):
     """
     Search for existening item
     """
     db = MagicMock()
+    db.get_completer_model().lookup.return_value = 'qwer'
     dlg = StationSearchDialog(db, main_window)
 
-    item = MagicMock()
-    item.data.return_value = 'qwer'
-
-    completer = MagicMock()
-    completer.model().findItems.return_value = [item]
-    dlg._completer = completer
-
     dlg.onSearchTextChanged('asdf')
 
-    assert dlg._play_button.isEnabled() is True
+    qtbot.waitUntil(lambda: dlg._play_button.isEnabled())
     assert dlg.db_item == 'qwer'
 
 
+def test_search_results(main_window):
+    """
+    Search results are shown in the completer
+    """
+    db = MagicMock()
+    db.get_completer_model().lookup.return_value = None
+    db.get_completer_model().text.return_value = 'Antonín Dvořák'
+    db.search.return_value = [{'type': 'composer', 'id': 'dvorak'}]
+    dlg = StationSearchDialog(db, main_window)
+
+    dlg.search.setText('dvorak')
+    dlg.updateWidgets()
+
+    db.search.assert_called_with('dvorak', StationSearchDialog.MAX_RESULTS)
+    model = dlg._completer.model()
+    assert model.rowCount() == 1
+    assert model.index(0, 0).data() == 'Antonín Dvořák'
+    assert model.index(0, 0).data(model.ItemRole) == \
+        {'type': 'composer', 'id': 'dvorak'}
+    assert dlg._play_button.isEnabled() is False
+
+
+def test_fuzzy_search_results(main_window):
+    """
+    Fuzzy search is used when nothing matches exactly
+    """
+    db = MagicMock()
+    db.get_completer_model().lookup.return_value = None
+    db.search.return_value = []
+    db.fuzzy_search.return_value = [{'type': 'composer', 'id': 'dvorak'}]
+    dlg = StationSearchDialog(db, main_window)
+
+    dlg.search.setText('dvorjak')
+    dlg.updateWidgets()
+
+    db.fuzzy_search.assert_called_with(
+        'dvorjak', StationSearchDialog.MAX_RESULTS)
+    assert dlg._completer.model().rowCount() == 1
+
+
 @patch('concertista.StationSearchDialog.StationSearchDialog.accept')
 def test_play(accept_mock, main_window):
     db = MagicMock()
@@ -0,0 +1,88 @@
+import sys
+import zipfile
+import importlib
+import json
+import time
+from concertista import tracing
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.delenv(tracing.ENV_VAR, raising=False)
+    argv = ['concertista', '--foo']
+    assert tracing.setup(argv) is False
+    assert argv == ['concertista', '--foo']
+    assert tracing.enabled() is False
+    with tracing.span("nothing"):
+        pass
+    tracing.instant("nothing")
+    tracing.finish()
+
+
+def test_trace(monkeypatch, tmp_path):
+    monkeypatch.delenv(tracing.ENV_VAR, raising=False)
+    fn = str(tmp_path / 'trace.json')
+    argv = ['concertista', '--trace=' + fn, '--foo']
+    assert tracing.setup(argv) is True
+    assert argv == ['concertista', '--foo']
+
+    @tracing.traced
+    def work():
+        time.sleep(0.01)
+        return 42
+
+    try:
+        with tracing.span("startup"):
+            assert work() == 42
+        tracing.instant("ready")
+        sys.modules.pop('json.tool', None)
+        import json.tool  # noqa: F401
+    finally:
+        tracing.finish()
+    assert tracing.enabled() is False
+
+    with open(fn) as f:
+        trace = json.load(f)
+    events = {e['name']: e for e in trace['traceEvents']}
+    assert events['startup']['ph'] == 'X'
+    assert events['startup']['cat'] == 'phase'
+    work_event = events['test_trace.<locals>.work']
+    assert events['startup']['dur'] >= work_event['dur']
+    assert 'cpu_ms' in events['startup']['args']
+    assert events['ready']['ph'] == 'i'
+    assert events['json.tool']['cat'] == 'import'
+    assert 'self_ms' in events['json.tool']['args']
+
+
+def test_shared_loader(monkeypatch, tmp_path):
+    monkeypatch.delenv(tracing.ENV_VAR, raising=False)
+    fn = str(tmp_path / 'trace.json')
+    # modules in a zip archive are loaded by one shared zipimporter
+    with zipfile.ZipFile(tmp_path / 'mods.zip', 'w') as zf:
+        for i in range(3):
+            zf.writestr('zmod{}.py'.format(i), 'X = {}\n'.format(i))
+    monkeypatch.syspath_prepend(str(tmp_path / 'mods.zip'))
+    assert tracing.setup(['concertista', '--trace=' + fn]) is True
+    try:
+        for i in range(3):
+            name = 'zmod{}'.format(i)
+            assert importlib.import_module(name).X == i
+            monkeypatch.delitem(sys.modules, name)
+    finally:
+        tracing.finish()
+
+    with open(fn) as f:
+        trace = json.load(f)
+    names = [e['name'] for e in trace['traceEvents']
+             if e['name'].startswith('zmod')]
+    assert names == ['zmod0', 'zmod1', 'zmod2']
+
+
+def test_trace_from_env(monkeypatch, tmp_path):
+    fn = str(tmp_path / 'trace.json')
+    monkeypatch.setenv(tracing.ENV_VAR, fn)
+    try:
+        assert tracing.setup(['concertista']) is True
+    finally:
+        tracing.finish()
+    with open(fn) as f:
+        assert json.load(f)['traceEvents'] == []
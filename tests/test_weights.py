@@ -0,0 +1,57 @@
+import random
+from collections import Counter
+from concertista import weights
+from concertista.durations import TrackDurations
+from concertista.records import Piece
+from concertista.weights import WeightTable
+
+
+def test_piece_weight():
+    piece = Piece('a', 'c1', 'A', tracks=['1', '2'])
+    assert weights.piece_weight(piece, weights.UNIFORM) == 1
+    assert weights.piece_weight(piece, weights.TRACKS) == 2
+
+    track_durations = TrackDurations()
+    track_durations.set('1', 10)
+    track_durations.set('2', 20)
+    assert weights.piece_weight(
+        piece, weights.DURATION, track_durations) == 30
+
+
+def test_build(fake_db):
+    table = WeightTable.build(
+        fake_db, ['a', 'b', 'x', 'c'], weights.TRACKS, {'c2': 0.5})
+    assert table.piece_ids == ['a', 'b', 'c']
+    assert list(table.cumulative) == [1, 2, 5]
+    assert table.total == 5
+    assert table.weight(0) == 1
+    assert table.weight(1) == 1
+    assert table.weight(2) == 3
+
+
+def test_draw():
+    table = WeightTable(['a', 'b', 'c'], [1, 0, 3])
+    rng = random.Random(1)
+    counts = Counter(table.draw(rng) for _ in range(4000))
+    assert counts['b'] == 0
+    assert 2500 < counts['c'] < 3500
+
+    assert WeightTable([], []).draw() is None
+    assert WeightTable(['a'], [0]).draw() is None
+
+
+def test_sample():
+    table = WeightTable(['a', 'b', 'c', 'd'], [1, 0, 3, 100])
+    result = list(table.sample(random.Random(1)))
+    assert sorted(result) == ['a', 'c', 'd']
+
+    firsts = Counter(
+        next(table.sample(random.Random(i))) for i in range(500))
+    assert firsts['d'] > 450
+
+
+def test_sample_many():
+    n = 10000
+    table = WeightTable(range(n), [i % 7 + 1 for i in range(n)])
+    result = list(table.sample(random.Random(2)))
+    assert sorted(result) == list(range(n))